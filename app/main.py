@@ -1,12 +1,68 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.analyze import router as analyze_router
+from app.routes.jobs import router as jobs_router
+from app.services.job_service import job_manager
+from app.services.pipeline_service import warm_up_pipeline, stop_pipeline
+from app.services.resilience_service import RETRYABLE_STATUS
+from app.services.metrics_service import metrics, CONTENT_TYPE
+from app.services.upload_service import RequestSizeLimitMiddleware
 from config import settings
 
+logger = logging.getLogger(__name__)
+
+
+def _is_permanent(error: BaseException) -> bool:
+    # A bad API key or an unknown model answers 4xx; retrying cannot fix it
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in RETRYABLE_STATUS
+
+
+async def _warm_up(app: FastAPI):
+    # Retried with backoff: a network blip at boot must not leave the instance unready forever.
+    # Permanent errors and WARMUP_MAX_ATTEMPTS failures give up, and /ready reports why.
+    delay = 1.0
+    for attempt in range(1, settings.WARMUP_MAX_ATTEMPTS + 1):
+        try:
+            app.state.warmup = await warm_up_pipeline()
+            app.state.ready = True
+            logger.info("Warm-up complete: %s", app.state.warmup)
+            return
+        except Exception as e:
+            permanent = _is_permanent(e)
+            app.state.warmup = {"error": str(e), "attempts": attempt, "permanent": permanent}
+            if permanent or attempt == settings.WARMUP_MAX_ATTEMPTS:
+                app.state.warmup["failed"] = True
+                logger.error("Warm-up failed after %d attempt(s), giving up: %s", attempt, e)
+                return
+            logger.warning("Warm-up failed, retrying in %.0fs: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background workers pick up queued (and interrupted) jobs from the job store
+    await job_manager.start()
+    app.state.ready = not settings.WARMUP_ENABLED
+    app.state.warmup = None
+    warmup = asyncio.create_task(_warm_up(app)) if settings.WARMUP_ENABLED else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    await job_manager.stop()
+    await stop_pipeline()
+
+
 app = FastAPI(
     title=settings.APP_NAME,
     description="Forensic Analysis API for Document and Image Forgery Detection",
-    version="1.1.0"
+    version="1.1.0",
+    lifespan=lifespan
 )
 
 # Add CORS so a web browser can call your API
@@ -17,6 +73,10 @@ app = FastAPI(
 #    allow_headers=["*"],
 #)
 
+# Oversize uploads are refused from the request stream, before the multipart parser
+# spools them (added first, so it sits inside CORS and its 413s get CORS headers)
+app.add_middleware(RequestSizeLimitMiddleware)
+
 # Add CORS middleware BEFORE routes
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +88,7 @@ app.add_middleware(
 
 
 app.include_router(analyze_router, prefix="/api", tags=["Forensics"])
+app.include_router(jobs_router, prefix="/api", tags=["Jobs"])
 
 @app.get("/", tags=["Health"])
 def health_check():
@@ -36,3 +97,22 @@ def health_check():
         "engine": "GPT-4o-Mini-Vision",
         "service": settings.APP_NAME
     }
+
+
+@app.get("/ready", tags=["Health"])
+def readiness_check():
+    """
+    Readiness probe: 503 until warm-up has opened the Gemini connections and
+    started the OCR workers, so load balancers hold traffic until then.
+    "warmup_failed" means it gave up (see warmup.error) and needs attention.
+    """
+    if not getattr(app.state, "ready", False):
+        warmup = getattr(app.state, "warmup", None)
+        status = "warmup_failed" if (warmup or {}).get("failed") else "warming_up"
+        return JSONResponse(status_code=503, content={"status": status, "warmup": warmup})
+    return {"status": "ready", "warmup": app.state.warmup}
+
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
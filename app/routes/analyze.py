@@ -1,49 +1,224 @@
+import asyncio
+import json
+from typing import List
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.file_service import (
-    extract_text_from_bytes, 
-    extract_metadata
-)
-from app.services.prompt_service import build_forgery_prompt
-from app.services.llm_service import call_gemini_forensics
-# Note: We now import the modified enforce_phase_discipline
-from app.services.response_service import parse_llm_response, enforce_phase_discipline
+from fastapi.responses import StreamingResponse
+# Note: the whole metadata -> OCR -> Gemini -> discipline chain lives in the pipeline service
+from app.services.pipeline_service import analyze_content, analyze_content_events
+from app.services.cache_service import result_cache
+from app.services.llm_service import token_usage
+from app.services.transport_service import llm_transport
+from app.services.cascade_service import model_cascade
+from app.services.phash_service import phash_index
+from app.services.resilience_service import gemini_resilience, CircuitOpenError, LLMTimeoutError
+from app.services.quota_service import gemini_quota, BATCH
+from app.services.response_service import ForgeryAnalysis
+from app.services.upload_service import ingest_upload, IngestedUpload, UploadTooLargeError
+from app.services.metrics_service import requests_total, in_flight, upload_bytes, error_outcome
+from config import settings
 
 router = APIRouter()
 
+
+def _analysis_response(filename: str, analysis_obj: ForgeryAnalysis) -> dict:
+    final_result = analysis_obj.model_dump()
+    return {
+        "filename": filename,
+        "document_type": final_result.get("document_type") or "Unknown",
+        "analysis": final_result
+    }
+
+
+async def _ingest(file: UploadFile, endpoint: str) -> IngestedUpload:
+    """
+    Chunked, size-bounded read of one upload (413 over MAX_UPLOAD_BYTES, 400 if empty).
+    """
+    try:
+        upload = await ingest_upload(file)
+    except UploadTooLargeError as e:
+        requests_total.inc(endpoint, "too_large")
+        raise HTTPException(status_code=413, detail=str(e))
+    if upload.size == 0:
+        upload.close()
+        requests_total.inc(endpoint, "empty")
+        raise HTTPException(status_code=400, detail="File is empty")
+    upload_bytes.inc(endpoint, amount=upload.size)
+    return upload
+
+
 @router.post("/analyze-document")
 async def analyze_document(file: UploadFile = File(...)):
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="File is empty")
+    with in_flight.track("analyze"), await _ingest(file, "analyze") as upload:
+        try:
+            # OCR/metadata run on the CPU pool and Gemini on the async client,
+            # so this request no longer blocks the event loop for everyone else.
+            analysis_obj = await analyze_content(upload.content, upload.content_type, upload.sha256)
+            requests_total.inc("analyze", "ok")
+            return _analysis_response(upload.filename, analysis_obj)
 
-    # 1. Gather Metadata and OCR text
-    metadata = extract_metadata(content, file.content_type)
-    document_text = extract_text_from_bytes(content, file.content_type)
+        except CircuitOpenError as e:
+            requests_total.inc("analyze", "circuit_open")
+            raise HTTPException(status_code=503, detail=str(e),
+                                headers={"Retry-After": str(int(e.retry_after))})
+        except LLMTimeoutError as e:
+            requests_total.inc("analyze", "timeout")
+            raise HTTPException(status_code=504, detail=str(e))
+        except Exception as e:
+            requests_total.inc("analyze", "failed")
+            raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-    # 2. Build the forensic prompt with Temporal Sync rules
-    prompt = build_forgery_prompt(document_text, metadata)
 
-    try:
-        # 3. Call Gemini (Native bytes for visual/logical analysis)
-        raw_llm_response = call_gemini_forensics(prompt, content, file.content_type)
-        
-        # 4. Parse JSON
-        analysis_obj = parse_llm_response(raw_llm_response)
-        
-        # 5. NEW: Apply Forensic Discipline with "Hard-Stop" Text Override
-        # We pass document_text to catch the April/Mei trap manually
-        analysis_obj = enforce_phase_discipline(analysis_obj, document_text)
-        
-        # 6. Final confidence verification
-        analysis_obj = analysis_obj.verify_confidence(threshold=90)
-        
-        final_result = analysis_obj.model_dump()
-
-        return {
-            "filename": file.filename,
-            "document_type": final_result.get("document_type", "Unknown"),
-            "analysis": final_result 
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
\ No newline at end of file
+class _UploadStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that owns an ingested upload and closes it however the
+    response ends. The body generator cannot do it: it never runs if the
+    client disconnects before the response starts, and Starlette skips
+    background tasks on a disconnect.
+    """
+
+    def __init__(self, upload: IngestedUpload, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload = upload
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.upload.close()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/analyze-document/stream")
+async def analyze_document_stream(file: UploadFile = File(...)):
+    """
+    Server-sent-events variant of /analyze-document. Emits metadata, ocr,
+    rules, near_duplicates (prior documents that look alike, and whether
+    one's verdict was reused), llm_started, llm_partial (raw Gemini
+    output), llm_field (each top-level answer field once Gemini has finished
+    writing it), llm_escalated (the fast model's answer was ambiguous; a
+    second llm_started follows for the primary model), override and finally
+    result (same payload as /analyze-document), or a single error event.
+    Cache hits and uploads already being analysed skip straight to result,
+    after cache_hit or coalesced.
+    """
+    upload = await _ingest(file, "stream")
+
+    async def stream_events():
+        yield _sse("accepted", {"filename": upload.filename, "bytes": upload.size})
+        try:
+            with in_flight.track("stream"):
+                async for event, data in analyze_content_events(upload.content, upload.content_type, upload.sha256):
+                    if event == "result":
+                        data = _analysis_response(upload.filename, data)
+                    yield _sse(event, data)
+            requests_total.inc("stream", "ok")
+        except Exception as e:
+            requests_total.inc("stream", error_outcome(e))
+            yield _sse("error", {"detail": f"Analysis failed: {str(e)}"})
+
+    return _UploadStreamingResponse(
+        upload,
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/analyze-batch")
+async def analyze_batch(files: List[UploadFile] = File(...)):
+    """
+    Analyses many documents from one multipart request and streams one NDJSON
+    line per document as soon as it finishes (completion order, not upload order;
+    use "index" to match lines to files).
+    """
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files: {len(files)} (max {settings.BATCH_MAX_FILES})"
+        )
+
+    # Ingest everything before the response starts; the multipart files are
+    # closed once the endpoint returns.
+    uploads = []
+    for index, file in enumerate(files):
+        try:
+            upload = await ingest_upload(file)
+            upload_bytes.inc("batch", amount=upload.size)
+            uploads.append((index, file.filename, upload, None))
+        except UploadTooLargeError as e:
+            uploads.append((index, file.filename, None, str(e)))
+
+    # Copies of the same bytes within the batch are analysed once; each copy still gets its own line
+    runs, first_copies = [], {}
+    for index, filename, upload, error in uploads:
+        if upload is not None and upload.size and upload.sha256 in first_copies:
+            first_copies[upload.sha256].append((index, filename))
+            continue
+        copies = [(index, filename)]
+        if upload is not None and upload.size:
+            first_copies[upload.sha256] = copies
+        runs.append((upload, error, copies))
+
+    async def run_one(slots, upload, error, copies):
+        if error or upload.size == 0:
+            requests_total.inc("batch", "too_large" if error else "empty")
+            return [{"index": index, "filename": filename, "status": "error", "detail": error or "File is empty"}
+                    for index, filename in copies]
+        async with slots:
+            try:
+                with in_flight.track("batch"):
+                    analysis_obj = await analyze_content(upload.content, upload.content_type, upload.sha256,
+                                                         priority=BATCH)
+            except Exception as e:
+                requests_total.inc("batch", error_outcome(e), amount=len(copies))
+                return [{"index": index, "filename": filename, "status": "error",
+                         "detail": f"Analysis failed: {str(e)}"} for index, filename in copies]
+        requests_total.inc("batch", "ok", amount=len(copies))
+        return [{"index": index, "status": "ok", **_analysis_response(filename, analysis_obj)}
+                for index, filename in copies]
+
+    async def stream_results():
+        slots = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+        tasks = [asyncio.create_task(run_one(slots, *run)) for run in runs]
+        try:
+            for next_results in asyncio.as_completed(tasks):
+                for result in await next_results:
+                    yield json.dumps(result) + "\n"
+        finally:
+            # Client went away mid-batch: stop the remaining analyses
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for _, _, upload, _ in uploads:
+                if upload is not None:
+                    upload.close()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
+
+@router.get("/phash/stats")
+def phash_stats():
+    if phash_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **phash_index.stats()}
+
+
+@router.get("/llm/usage")
+def llm_usage():
+    return {
+        **token_usage.snapshot(),
+        "resilience": gemini_resilience.snapshot(),
+        "quota": gemini_quota.snapshot(),
+        "transport": llm_transport.snapshot(),
+        "cascade": model_cascade.snapshot(),
+    }
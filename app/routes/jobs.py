@@ -0,0 +1,43 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from app.routes.analyze import _analysis_response, _ingest
+from app.services.job_service import job_manager, DONE
+from app.services.response_service import ForgeryAnalysis
+
+router = APIRouter()
+
+
+@router.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """
+    Stores the upload and returns immediately; poll GET /api/jobs/{job_id}.
+    """
+    with await _ingest(file, "jobs") as upload:
+        job_id = await job_manager.submit(upload.filename, upload.content_type, upload.content)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/jobs/stats")
+def job_stats():
+    return job_manager.stats()
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_manager.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "filename": job["filename"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == DONE:
+        analysis_obj = ForgeryAnalysis.model_validate_json(job["result"])
+        response.update(_analysis_response(job["filename"], analysis_obj))
+    elif job["error"]:
+        response["error"] = job["error"]
+    return response
@@ -0,0 +1,496 @@
+import re
+import time
+from typing import Optional
+from app.services.lazy_imports import lazy_module
+from app.services.prompt_service import BANK_STATEMENT, PAYSLIP
+
+np = lazy_module("numpy")
+
+# Same tolerances the prompt gives the LLM (Rules D.1 / D.3, Phase 3.6)
+BALANCE_TOLERANCE = 1.00
+SIGNIFICANT_VARIANCE = 5.00
+PAYSLIP_TOLERANCE = 0.005
+# Net Pay mismatches found in OCR text stay below RULE_CONCLUSIVE_CONFIDENCE
+TEXT_TOTALS_CONFIDENCE = 85
+
+# Failing rows kept in a report; the count is always exact
+_MAX_REPORTED = 50
+
+_CURRENCY = r"(?:R|₹|Rs\.?|INR|ZAR)"
+# An amount always carries cents: bare integers in a statement are dates,
+# references and account numbers far more often than money
+_AMOUNT = rf"\(?-?{_CURRENCY}?\s?-?\d+(?:[, ]\d{{2,3}})*\.\d{{2}}\)?(?:\s?(?:Cr|CR|Dr|DR))?-?"
+_AMOUNT_TOKEN = re.compile(rf"^{_AMOUNT}$")
+# "3 400.00" is extracted as two words; these rejoin it
+_THOUSANDS_HEAD = re.compile(rf"^\(?-?{_CURRENCY}?-?\d{{1,3}}$")
+_THOUSANDS_TAIL = re.compile(r"^\d{3}(?:[, ]\d{3})*\.\d{2}\)?(?:Cr|CR|Dr|DR)?-?$")
+
+_DEBIT_HEADER = re.compile(r"^(?:debits?|withdrawals?|dr)$", re.IGNORECASE)
+_CREDIT_HEADER = re.compile(r"^(?:credits?|deposits?|cr)$", re.IGNORECASE)
+_AMOUNT_HEADER = re.compile(r"^amount$", re.IGNORECASE)
+_BALANCE_HEADER = re.compile(r"^balance$", re.IGNORECASE)
+# Summary lines inside the table area; the opening/closing figures are read from the text instead
+_SKIP_ROW = re.compile(r"^(?:total|sub-?total|page)\b|(?:opening|closing)\s+balance|(?:brought|carried)\s+forward", re.IGNORECASE)
+
+
+def parse_amount(token: str) -> Optional[float]:
+    """
+    "R 3,400.00", "₹1,20,000.50", "3 400.00", "(250.00)", "99.10 Dr" -> float.
+    Returns None for anything that is not an amount with cents.
+    """
+    token = token.strip()
+    if not _AMOUNT_TOKEN.match(token):
+        return None
+    negative = token.startswith("(") or "-" in token or token.upper().endswith("DR")
+    digits = re.sub(r"[^\d.]", "", re.sub(_CURRENCY, "", token.rstrip("CRDrcr ")))
+    try:
+        value = float(digits)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def _amount_after(label: str, text: str) -> Optional[float]:
+    match = re.search(rf"(?:{label})[^\d(-]{{0,40}}({_AMOUNT})", text, re.IGNORECASE)
+    return parse_amount(match.group(1)) if match else None
+
+
+# Payslip totals and the labels they are printed under
+_PAYSLIP_TOTALS = {
+    "earnings": re.compile(r"total\s+earnings|gross\s+(?:pay|salary|earnings)", re.IGNORECASE),
+    "deductions": re.compile(r"total\s+deductions", re.IGNORECASE),
+    "net": re.compile(r"net\s+(?:pay|salary)", re.IGNORECASE),
+}
+_ANY_TOTAL = re.compile("|".join(f"(?:{pattern.pattern})" for pattern in _PAYSLIP_TOTALS.values()), re.IGNORECASE)
+_AMOUNT_IN_TEXT = re.compile(rf"(?<![\w.,]){_AMOUNT}(?![\w.,])")
+
+
+def _page_lines(page) -> list:
+    """
+    Words of one PDF page grouped into visual lines, left to right, with
+    split thousands ("3" "400.00") rejoined. Each word is (x0, x1, text).
+    """
+    words = sorted(page.get_text("words"), key=lambda w: ((w[1] + w[3]) / 2, w[0]))
+    lines = []
+    current, current_y = [], None
+    for x0, y0, x1, y1, text, *_ in words:
+        middle = (y0 + y1) / 2
+        if current and abs(middle - current_y) > (y1 - y0) * 0.5:
+            lines.append(current)
+            current = []
+        if not current:
+            current_y = middle
+        current.append([x0, x1, text, y1 - y0])
+    if current:
+        lines.append(current)
+
+    merged_lines = []
+    for line in lines:
+        line.sort(key=lambda w: w[0])
+        merged = []
+        for word in line:
+            if (merged and _THOUSANDS_HEAD.match(merged[-1][2]) and _THOUSANDS_TAIL.match(word[2])
+                    and word[0] - merged[-1][1] < word[3] * 0.5):
+                merged[-1][1] = word[1]
+                merged[-1][2] = f"{merged[-1][2]} {word[2]}"
+            else:
+                merged.append(word)
+        merged_lines.append([(x0, x1, text) for x0, x1, text, _ in merged])
+    return merged_lines
+
+
+def _ledger_columns(line: list) -> Optional[dict]:
+    """
+    Column anchors (header word centre and right edge) when `line` is a
+    transaction table header.
+    """
+    columns = {}
+    for x0, x1, text in line:
+        word = text.strip(":")
+        for name, pattern in (("debit", _DEBIT_HEADER), ("credit", _CREDIT_HEADER),
+                              ("amount", _AMOUNT_HEADER), ("balance", _BALANCE_HEADER)):
+            if name not in columns and pattern.match(word):
+                columns[name] = ((x0 + x1) / 2, x1)
+    if "balance" in columns and ({"debit", "credit"} <= columns.keys() or "amount" in columns):
+        return columns
+    return None
+
+
+def extract_ledger(pdf) -> list:
+    """
+    Transaction rows from a statement PDF, read positionally: the header line
+    (Debit / Credit / Balance, or Amount / Balance) fixes the columns and every
+    amount below it goes to the nearest column. Continuation pages without a
+    header reuse the previous page's columns.
+
+    Returns [{"page", "description", "debit", "credit", "balance"}], NaN where empty.
+    """
+    rows = []
+    columns = None
+    for page_number, page in enumerate(pdf, start=1):
+        in_table = columns is not None
+        for line in _page_lines(page):
+            header = _ledger_columns(line)
+            if header:
+                columns, in_table = header, True
+                continue
+            if not in_table:
+                continue
+
+            row = {"page": page_number, "debit": np.nan, "credit": np.nan, "balance": np.nan}
+            description = []
+            for x0, x1, text in line:
+                value = parse_amount(text)
+                if value is None:
+                    description.append(text)
+                    continue
+                # Left-aligned amounts line up with the header centre, right-aligned ones with its right edge
+                centre = (x0 + x1) / 2
+                column = min(columns, key=lambda name: min(abs(centre - columns[name][0]), abs(x1 - columns[name][1])))
+                if column == "amount":
+                    column = "credit" if value >= 0 else "debit"
+                row[column] = abs(value) if column != "balance" else value
+            row["description"] = " ".join(description)
+            if np.isnan([row["debit"], row["credit"], row["balance"]]).all() or _SKIP_ROW.search(row["description"]):
+                continue
+            rows.append(row)
+    return rows
+
+
+def _running_balance_failures(debits, credits, balances, opening, tolerance, first_of_run: bool = False):
+    """
+    Vectorised D.1 check. Rows without a printed balance are folded into the
+    next row that has one, so only the printed balances are compared.
+    Returns (row indexes, expected, reported) of every failing row, or with
+    `first_of_run` only the first of each run of consecutive failures: a
+    misprinted balance also breaks the row after it, which is checked
+    against the wrong figure.
+    """
+    cumulative = np.cumsum(np.nan_to_num(credits) - np.nan_to_num(debits))
+    printed = np.flatnonzero(~np.isnan(balances))
+    anchors, flows, indexes = balances[printed], cumulative[printed], printed
+    if opening is not None:
+        anchors = np.concatenate(([opening], anchors))
+        flows = np.concatenate(([0.0], flows))
+        indexes = np.concatenate(([-1], indexes))
+    expected = anchors[:-1] + np.diff(flows)
+    reported = anchors[1:]
+    failing = np.abs(reported - expected) > tolerance
+    if first_of_run:
+        failing &= ~np.concatenate(([False], failing[:-1]))
+    return indexes[1:][failing], expected[failing], reported[failing]
+
+
+def verify_ledger(rows: list, opening: float = None, closing: float = None,
+                  tolerance: float = BALANCE_TOLERANCE) -> dict:
+    """
+    Checks Previous + Credit - Debit = Balance on every row, and
+    Opening + Credits - Debits = Closing for the whole statement.
+    Statements printed newest-first are detected and checked in date order.
+    """
+    debits = np.array([row["debit"] for row in rows], dtype=float)
+    credits = np.array([row["credit"] for row in rows], dtype=float)
+    balances = np.array([row["balance"] for row in rows], dtype=float)
+
+    # The order is decided on every failing row; only the first of each run is reported
+    order = "ascending"
+    failed, expected, reported = _running_balance_failures(debits, credits, balances, opening, tolerance)
+    if len(failed):
+        reverse = _running_balance_failures(debits[::-1], credits[::-1], balances[::-1], opening, tolerance)
+        if len(reverse[0]) < len(failed):
+            order = "descending"
+            reverse = _running_balance_failures(debits[::-1], credits[::-1], balances[::-1], opening, tolerance,
+                                                first_of_run=True)
+            failed = np.where(reverse[0] >= 0, len(rows) - 1 - reverse[0], -1)
+            expected, reported = reverse[1], reverse[2]
+        else:
+            failed, expected, reported = _running_balance_failures(debits, credits, balances, opening, tolerance,
+                                                                   first_of_run=True)
+
+    failures = []
+    for index, should_be, printed in zip(failed[:_MAX_REPORTED], expected, reported):
+        row = rows[index] if index >= 0 else {"page": None, "description": "opening balance"}
+        failures.append({
+            "row": int(index) + 1,
+            "page": row["page"],
+            "description": row["description"],
+            "expected_balance": round(float(should_be), 2),
+            "reported_balance": round(float(printed), 2),
+            "difference": round(float(printed - should_be), 2),
+        })
+
+    reconciliation = None
+    if opening is not None and closing is not None:
+        computed = opening + np.nansum(credits) - np.nansum(debits)
+        variance = round(float(closing - computed), 2)
+        status = ("ok" if abs(variance) <= tolerance
+                  else "minor" if abs(variance) <= SIGNIFICANT_VARIANCE else "significant")
+        reconciliation = {
+            "opening": opening, "closing": closing,
+            "total_credits": round(float(np.nansum(credits)), 2),
+            "total_debits": round(float(np.nansum(debits)), 2),
+            "computed_closing": round(float(computed), 2),
+            "variance": variance, "status": status,
+        }
+
+    return {
+        "kind": BANK_STATEMENT,
+        "rows": len(rows),
+        "checked_balances": int(np.count_nonzero(~np.isnan(balances))),
+        "order": order,
+        "tolerance": tolerance,
+        "failure_count": len(failed),
+        "failures": failures,
+        "reconciliation": reconciliation,
+    }
+
+
+def _payslip_items(pdf) -> Optional[dict]:
+    """
+    Earnings and deduction line items, read positionally below the
+    "Earnings ... Deductions" header up to the totals line.
+    """
+    items = {"earnings": [], "deductions": []}
+    for page in pdf:
+        anchors = None
+        for line in _page_lines(page):
+            words = [text.lower().strip(":") for _, _, text in line]
+            if anchors is None:
+                if "earnings" in words and "deductions" in words:
+                    anchors = {words[i]: line[i][0] for i in range(len(line)) if words[i] in items}
+                continue
+            if any(word in ("total", "gross", "net") for word in words):
+                return items
+            label = []
+            for x0, x1, text in line:
+                value = parse_amount(text)
+                if value is None:
+                    label.append(text)
+                    continue
+                # Amounts sit right of their column header: take the nearest header to the left
+                owners = [name for name, x in anchors.items() if x <= x0]
+                column = max(owners, key=anchors.get) if owners else min(anchors, key=anchors.get)
+                items[column].append({"label": " ".join(label), "amount": value})
+                label = []
+        if anchors is not None:
+            return items
+    return None
+
+
+def _total_labels(line: list) -> list:
+    """
+    Payslip total labels on one visual line, left to right:
+    [(total, x0, x1, index of the first word after the label)].
+    """
+    words, starts = [], []
+    for _, _, text in line:
+        starts.append(sum(len(word) + 1 for word in words))
+        words.append(text)
+    joined = " ".join(words)
+    labels = []
+    for name, pattern in _PAYSLIP_TOTALS.items():
+        for match in pattern.finditer(joined):
+            first = max(i for i, start in enumerate(starts) if start <= match.start())
+            last = max(i for i, start in enumerate(starts) if start < match.end())
+            labels.append((name, line[first][0], line[last][1], last + 1))
+    return sorted(labels, key=lambda label: label[1])
+
+
+def _figures_below(labels: list, line: list) -> dict:
+    """
+    Amounts on the row under a header row of labels: {label position: amount},
+    each amount going to the label whose centre it is nearest.
+    """
+    figures = {}
+    for x0, x1, text in line:
+        amount = parse_amount(text)
+        if amount is None:
+            continue
+        centre = (x0 + x1) / 2
+        nearest = min(range(len(labels)), key=lambda i: abs((labels[i][1] + labels[i][2]) / 2 - centre))
+        figures.setdefault(nearest, amount)
+    return figures
+
+
+def _payslip_totals_by_layout(pdf) -> dict:
+    """
+    Total Earnings / Total Deductions / Net Pay read positionally: the first
+    amount right of the label (before the next label) on its own line, or,
+    when a header row of labels has its figures on the row below ("Gross Pay
+    Total Deductions  Net Pay"), the amount below nearest each label.
+    """
+    totals = {}
+    for page in pdf:
+        lines = _page_lines(page)
+        for number, line in enumerate(lines):
+            labels = _total_labels(line)
+            below = None
+            for position, (name, x0, x1, after) in enumerate(labels):
+                if name in totals:
+                    continue
+                stop = labels[position + 1][1] if position + 1 < len(labels) else float("inf")
+                value = next((parse_amount(text) for wx0, _, text in line[after:]
+                              if wx0 < stop and parse_amount(text) is not None), None)
+                if value is None:
+                    if below is None:
+                        below = _figures_below(labels, lines[number + 1] if number + 1 < len(lines) else [])
+                    value = below.get(position)
+                if value is not None:
+                    totals[name] = value
+        if len(totals) == len(_PAYSLIP_TOTALS):
+            break
+    return totals
+
+
+def _payslip_totals_from_text(text: str) -> dict:
+    """
+    The same totals from plain (OCR) text: a line of labels followed by a
+    line of as many amounts maps them in order; otherwise the first amount
+    after a label, unless another total's label comes first.
+    """
+    totals = {}
+    lines = [line for line in text.splitlines() if line.strip()]
+    for number, line in enumerate(lines[:-1]):
+        names = [name for match in _ANY_TOTAL.finditer(line)
+                 for name, pattern in _PAYSLIP_TOTALS.items() if pattern.fullmatch(match.group(0))]
+        if len(names) < 2 or _AMOUNT_IN_TEXT.search(line):
+            continue
+        amounts = [parse_amount(match.group(0)) for match in _AMOUNT_IN_TEXT.finditer(lines[number + 1])]
+        if len(amounts) == len(names):
+            for name, amount in zip(names, amounts):
+                totals.setdefault(name, amount)
+    for name, pattern in _PAYSLIP_TOTALS.items():
+        if name in totals:
+            continue
+        for match in pattern.finditer(text):
+            gap = re.match(rf"[^\d(-]{{0,40}}?({_AMOUNT})", text[match.end():])
+            if gap and not _ANY_TOTAL.search(text[match.end():match.end() + gap.start(1)]):
+                totals[name] = parse_amount(gap.group(1))
+                break
+    return totals
+
+
+def verify_payslip(text: str, pdf=None) -> Optional[dict]:
+    """
+    Phase 3.6 A-C: item sums against declared totals (PDFs only, needs word
+    positions) and Net Pay = Total Earnings - Total Deductions (any text).
+    Totals are read by position from PDFs; `source` says whether they came
+    from the page layout or from plain text.
+    """
+    totals = _payslip_totals_by_layout(pdf) if pdf is not None else {}
+    source = "layout"
+    if not totals:
+        totals, source = _payslip_totals_from_text(text), "text"
+    total_earnings, total_deductions, net_pay = (totals.get(name) for name in ("earnings", "deductions", "net"))
+    if total_earnings is None and total_deductions is None and net_pay is None:
+        return None
+
+    report = {"kind": PAYSLIP, "tolerance": PAYSLIP_TOLERANCE, "source": source}
+    if None not in (total_earnings, total_deductions, net_pay):
+        expected = round(total_earnings - total_deductions, 2)
+        report["net_pay"] = {"declared": net_pay, "expected": expected,
+                             "ok": abs(net_pay - expected) <= PAYSLIP_TOLERANCE}
+
+    items = _payslip_items(pdf) if pdf is not None else None
+    for name, declared in (("earnings", total_earnings), ("deductions", total_deductions)):
+        if items and items[name] and declared is not None:
+            total = round(float(np.sum([item["amount"] for item in items[name]])), 2)
+            report[name] = {"items": items[name], "sum": total, "declared": declared,
+                            "ok": abs(total - declared) <= PAYSLIP_TOLERANCE}
+    return report
+
+
+def verify_arithmetic(ctx, document_type: str) -> Optional[dict]:
+    """
+    Local arithmetic verification for bank statements and payslips.
+    Returns None for other document types or when no figures could be read.
+    """
+    started = time.perf_counter()
+    report = None
+    if document_type == BANK_STATEMENT and ctx.is_pdf:
+        rows = extract_ledger(ctx.pdf)
+        if rows:
+            opening = _amount_after(r"opening\s+balance|balance\s+brought\s+forward", ctx.text)
+            closing = _amount_after(r"closing\s+balance|balance\s+carried\s+forward", ctx.text)
+            report = verify_ledger(rows, opening, closing)
+    elif document_type == PAYSLIP:
+        report = verify_payslip(ctx.text, ctx.pdf if ctx.is_pdf else None)
+    if report is not None:
+        report["seconds"] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def arithmetic_findings(report: Optional[dict]) -> list:
+    """
+    Rule-engine style findings ({"rule", "reason", "confidence", "category"})
+    for every failed check in `report`.
+    """
+    if not report:
+        return []
+    findings = []
+
+    def add(rule, reason, confidence):
+        findings.append({"rule": rule, "reason": reason, "confidence": confidence, "category": "math"})
+
+    if report["kind"] == BANK_STATEMENT:
+        count = report["failure_count"]
+        if count:
+            first = report["failures"][0]
+            add("running_balance",
+                f"Balance Arithmetic (D.1): {count} of {report['checked_balances']} balances fail "
+                f"Previous + Credit - Debit = Balance (first: row {first['row']}, page {first['page']}, "
+                f"expected {first['expected_balance']:.2f}, reported {first['reported_balance']:.2f}).",
+                90 if count >= 3 else 60)
+        reconciliation = report["reconciliation"]
+        if reconciliation and reconciliation["status"] != "ok":
+            add("reconciliation",
+                f"Reconciliation (D.3): Opening + Credits - Debits = {reconciliation['computed_closing']:.2f}, "
+                f"Closing Balance is {reconciliation['closing']:.2f} (variance {reconciliation['variance']:.2f}).",
+                90 if reconciliation["status"] == "significant" else 60)
+    else:
+        net = report.get("net_pay")
+        if net and not net["ok"]:
+            add("net_pay",
+                f"Payslip Net Pay: Total Earnings - Total Deductions = {net['expected']:.2f}, "
+                f"but Net Pay is {net['declared']:.2f}.",
+                # Totals read from plain text may be misattributed; they are evidence, never conclusive
+                95 if report.get("source") == "layout" else TEXT_TOTALS_CONFIDENCE)
+        for name in ("earnings", "deductions"):
+            check = report.get(name)
+            if check and not check["ok"]:
+                add(f"total_{name}",
+                    f"Payslip {name.title()}: line items sum to {check['sum']:.2f}, "
+                    f"declared Total {name.title()} is {check['declared']:.2f}.", 90)
+    return findings
+
+
+def describe_arithmetic(report: Optional[dict]) -> list:
+    """
+    One-line summaries of the checks that were run, for the prompt.
+    """
+    if not report:
+        return []
+    if report["kind"] == BANK_STATEMENT:
+        lines = [
+            f"Running balances: {report['checked_balances']} printed balances over {report['rows']} rows "
+            f"({report['order']} order), {report['failure_count']} outside ±{report['tolerance']:.2f}."
+        ]
+        reconciliation = report["reconciliation"]
+        if reconciliation:
+            lines.append(
+                f"Reconciliation: Opening {reconciliation['opening']:.2f} + Credits {reconciliation['total_credits']:.2f} "
+                f"- Debits {reconciliation['total_debits']:.2f} = {reconciliation['computed_closing']:.2f} "
+                f"vs Closing {reconciliation['closing']:.2f} ({reconciliation['status']})."
+            )
+        return lines
+    lines = []
+    if "net_pay" in report:
+        net = report["net_pay"]
+        lines.append(f"Net Pay: expected {net['expected']:.2f}, declared {net['declared']:.2f} "
+                     f"({'ok' if net['ok'] else 'MISMATCH'}).")
+    for name in ("earnings", "deductions"):
+        if name in report:
+            check = report[name]
+            lines.append(f"{name.title()}: {len(check['items'])} items sum to {check['sum']:.2f}, "
+                         f"declared {check['declared']:.2f} ({'ok' if check['ok'] else 'MISMATCH'}).")
+    return lines
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.services.prompt_service import PROMPT_TEMPLATE_HASH
+from app.services.response_service import ForgeryAnalysis
+from config import settings
+
+
+def sha256_hex(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def make_cache_key(content_hash: str, model: str = None, prompt_hash: str = None) -> str:
+    """
+    Content-addressed key: same bytes + same model + same prompt rules = same verdict.
+    """
+    model = model or settings.GEMINI_MODEL
+    prompt_hash = prompt_hash or PROMPT_TEMPLATE_HASH
+    return hashlib.sha256(f"{content_hash}:{model}:{prompt_hash}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for final ForgeryAnalysis results.
+
+    Tier 1 is an in-memory LRU, tier 2 a SQLite table that survives restarts.
+    Entries expire after `ttl_seconds`; the disk tier also drops its least
+    recently used rows once it grows past `disk_max_bytes`.
+    Results are stored as JSON so callers always get a fresh object they can mutate.
+
+    Every method does blocking SQLite I/O; async callers run them off the
+    event loop. Disk hits only note their access time in memory, written
+    back in batches of `touch_batch` (and before any eviction), and the disk
+    tier's size is kept as a running total.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: int, memory_entries: int, disk_max_bytes: int,
+                 touch_batch: int = 64):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.touch_batch = touch_batch
+
+        self._memory = OrderedDict()  # key -> (expires_at, payload)
+        self._touched = {}  # key -> last access not yet written to disk
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results(last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_expires_at ON results(expires_at)")
+        self._db.commit()
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key: str) -> Optional[ForgeryAnalysis]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return ForgeryAnalysis.model_validate_json(payload)
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT payload, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            # Expired rows are left for the next write's eviction pass
+            if row is None or row[1] <= now:
+                self._stats["misses"] += 1
+                return None
+
+            payload, expires_at = row
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched()
+                self._db.commit()
+            self._remember(key, expires_at, payload)
+            self._stats["disk_hits"] += 1
+            return ForgeryAnalysis.model_validate_json(payload)
+
+    def set(self, key: str, analysis: ForgeryAnalysis):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        payload = analysis.model_dump_json()
+        with self._lock:
+            self._remember(key, expires_at, payload)
+            self._touched.pop(key, None)
+            replaced = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, payload, size, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), expires_at, now)
+            )
+            self._disk_bytes += len(payload) - (replaced[0] if replaced else 0)
+            self._stats["writes"] += 1
+            self._evict_disk(now)
+            self._db.commit()
+
+    def flush(self):
+        """
+        Writes pending access times to disk (shutdown, tests).
+        """
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+            self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            disk_entries, = self._db.execute("SELECT COUNT(*) FROM results").fetchone()
+            return {
+                **self._stats,
+                "hits": hits,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, expires_at: float, payload: str):
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany("UPDATE results SET last_access = ? WHERE key = ?",
+                                 [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+
+    def _evict_disk(self, now: float):
+        expired, expired_bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results WHERE expires_at <= ?", (now,)
+        ).fetchone()
+        if expired:
+            self._db.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+            self._disk_bytes -= expired_bytes
+            self._stats["evictions"] += expired
+
+        if self._disk_bytes <= self.disk_max_bytes:
+            return
+        # Drop least recently used rows until we are back under budget
+        self._flush_touched()
+        for key, size in self._db.execute(
+            "SELECT key, size FROM results ORDER BY last_access ASC"
+        ).fetchall():
+            if self._disk_bytes <= self.disk_max_bytes:
+                break
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            self._disk_bytes -= size
+            self._stats["evictions"] += 1
+
+
+result_cache = ResultCache(
+    db_path=settings.CACHE_DB_PATH,
+    ttl_seconds=settings.CACHE_TTL_SECONDS,
+    memory_entries=settings.CACHE_MEMORY_ENTRIES,
+    disk_max_bytes=settings.CACHE_DISK_MAX_BYTES,
+) if settings.CACHE_ENABLED else None
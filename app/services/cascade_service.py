@@ -0,0 +1,83 @@
+from app.services.response_service import ForgeryAnalysis, HARD_STOP_MARKER
+from config import settings
+
+# Which stage of the pipeline produced a verdict (ForgeryAnalysis.decision_tier)
+TIER_RULES = "rules"
+TIER_NEAR_DUPLICATE = "near_duplicate"
+TIER_FAST = "fast"
+TIER_PRIMARY = "primary"
+
+
+class ModelCascade:
+    """
+    Tiered Gemini models: the fast model answers first, and its answer stands
+    unless it is ambiguous, i.e. the classification is one to double-check
+    (SUSPICIOUS, FORGED, a parse ERROR) or the confidence falls in
+    [confidence_low, confidence_high). Ambiguous answers are re-asked of the
+    primary model with the same prompt, and its answer is final.
+
+    Disabled, the primary model is the only tier.
+    """
+
+    def __init__(self, enabled: bool, fast_model: str, primary_model: str,
+                 confidence_low: int, confidence_high: int, escalate_classifications):
+        self.enabled = enabled and fast_model != primary_model
+        self.fast_model = fast_model
+        self.primary_model = primary_model
+        self.confidence_low = confidence_low
+        self.confidence_high = confidence_high
+        self.escalate_classifications = frozenset(c.upper() for c in escalate_classifications) | {"ERROR"}
+
+    def tiers(self) -> list:
+        """
+        [(tier, model)] in the order they are tried.
+        """
+        if not self.enabled:
+            return [(TIER_PRIMARY, self.primary_model)]
+        return [(TIER_FAST, self.fast_model), (TIER_PRIMARY, self.primary_model)]
+
+    def models(self) -> list:
+        return [model for _, model in self.tiers()]
+
+    def escalation_reason(self, analysis: ForgeryAnalysis) -> str:
+        """
+        Why `analysis` should go to the next tier ("classification" or
+        "confidence"), or None to accept it.
+        """
+        # A verdict forced by the rule engine comes out the same whatever the model says
+        if analysis.summary.startswith(HARD_STOP_MARKER):
+            return None
+        if analysis.final_classification.upper() in self.escalate_classifications:
+            return "classification"
+        if self.confidence_low <= analysis.final_confidence < self.confidence_high:
+            return "confidence"
+        return None
+
+    def cache_signature(self) -> str:
+        """
+        Stands in for the model in result cache keys: a verdict reached
+        through the cascade is only reused under the same cascade settings.
+        """
+        if not self.enabled:
+            return self.primary_model
+        classifications = ",".join(sorted(self.escalate_classifications))
+        return (f"cascade:{self.fast_model}>{self.primary_model}:"
+                f"{self.confidence_low}-{self.confidence_high}:{classifications}")
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "models": self.models(),
+            "ambiguous_confidence": [self.confidence_low, self.confidence_high],
+            "escalate_classifications": sorted(self.escalate_classifications),
+        }
+
+
+model_cascade = ModelCascade(
+    enabled=settings.GEMINI_CASCADE,
+    fast_model=settings.GEMINI_FAST_MODEL,
+    primary_model=settings.GEMINI_MODEL,
+    confidence_low=settings.CASCADE_CONFIDENCE_LOW,
+    confidence_high=settings.CASCADE_CONFIDENCE_HIGH,
+    escalate_classifications=settings.CASCADE_ESCALATE_CLASSIFICATIONS,
+)
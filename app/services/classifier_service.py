@@ -0,0 +1,118 @@
+import re
+from app.services.prompt_service import (
+    BANK_STATEMENT,
+    IDENTITY,
+    PAYSLIP,
+    INVOICE,
+    UNKNOWN
+)
+
+# (pattern, weight) per document type. Strong, type-unique phrases weigh 3,
+# generic vocabulary that other types also use weighs 1.
+_SIGNALS = {
+    BANK_STATEMENT: [
+        (r"opening\s+balance", 3),
+        (r"closing\s+balance", 3),
+        (r"(?:bank|account)\s+statement", 3),
+        (r"statement\s+(?:period|date|of\s+account)", 2),
+        (r"\bIFSC\b", 2),
+        (r"\bMICR\b", 2),
+        (r"account\s+(?:no|number|holder)", 1),
+        (r"\bbalance\b", 1),
+        (r"\btransactions?\b", 1),
+        (r"\b(?:debit|credit)s?\b", 1),
+    ],
+    IDENTITY: [
+        (r"permanent\s+account\s+number", 3),
+        (r"income\s+tax\s+department", 3),
+        (r"\baadhaa?r\b", 3),
+        (r"driving\s+licen[cs]e", 3),
+        (r"election\s+commission|voter", 3),
+        (r"\bpassport\b", 3),
+        (r"identity\s+(?:card|document|number)|\bID\s+(?:card|no)", 2),
+        (r"\b[A-Z]{5}\d{4}[A-Z]\b", 2),           # PAN
+        (r"\b\d{4}\s\d{4}\s\d{4}\b", 2),          # Aadhaar grouping
+        (r"\b\d{13}\b", 1),                       # South African ID
+        (r"date\s+of\s+birth|\bDOB\b", 1),
+        (r"government\s+of|republic\s+of", 1),
+        (r"\b(?:valid(?:ity)?|expiry|date\s+of\s+issue)\b", 1),
+    ],
+    PAYSLIP: [
+        (r"pay\s*slip|salary\s+slip|pay\s+advice", 3),
+        (r"net\s+(?:pay|salary)", 3),
+        (r"total\s+earnings", 3),
+        (r"total\s+deductions", 3),
+        (r"gross\s+(?:pay|salary|earnings)", 2),
+        (r"\b(?:HRA|basic\s+salary|provident\s+fund|PAYE|UIF)\b", 2),
+        (r"employee\s+(?:id|code|no|number|name)", 1),
+        (r"\b(?:earnings|deductions|allowances?)\b", 1),
+    ],
+    INVOICE: [
+        (r"tax\s+invoice|\binvoice\s+(?:no|number|date)", 3),
+        (r"\bGSTIN\b|\bVAT\s+(?:no|number|reg)", 3),
+        (r"bill(?:ed)?\s+to|ship\s+to", 2),
+        (r"amount\s+due|balance\s+due", 2),
+        (r"\binvoice\b|\breceipt\b", 2),
+        (r"\b(?:qty|quantity|unit\s+price|subtotal|sub-total)\b", 1),
+        (r"\b(?:CGST|SGST|IGST|GST)\b", 1),
+    ],
+}
+
+
+def _compile_scanner():
+    """
+    One regex for every signal; the named group tells us which signal fired.
+    """
+    groups = {}
+    parts = []
+    for document_type, signals in _SIGNALS.items():
+        for index, (pattern, weight) in enumerate(signals):
+            name = f"{document_type}_{index}"
+            groups[name] = (document_type, weight)
+            parts.append(f"(?P<{name}>{pattern})")
+    return re.compile("|".join(parts), re.IGNORECASE), groups
+
+
+_SCANNER, _GROUPS = _compile_scanner()
+
+# Only the first pages matter for deciding what a document is
+_SCAN_CHARS = 20000
+MIN_SCORE = 3
+MIN_MARGIN = 2
+
+_CAMERA_TAGS = ("Make", "Model")
+
+
+def score_document(document_text: str, metadata: dict) -> dict:
+    """
+    Sums the weights of the distinct signals found for each document type.
+    """
+    scores = {document_type: 0 for document_type in _SIGNALS}
+    seen = set()
+    for match in _SCANNER.finditer(document_text[:_SCAN_CHARS]):
+        name = match.lastgroup
+        if name not in seen:
+            seen.add(name)
+            document_type, weight = _GROUPS[name]
+            scores[document_type] += weight
+
+    # Phone photos are almost always ID cards; statements and payslips arrive as PDFs
+    if metadata and any(tag in metadata for tag in _CAMERA_TAGS):
+        scores[IDENTITY] += 1
+    return scores
+
+
+def classify_document(document_text: str, metadata: dict) -> str:
+    """
+    Fast local pre-classifier used to route the prompt.
+    Returns one of BANK_STATEMENT / IDENTITY / PAYSLIP / INVOICE, or UNKNOWN
+    when the evidence is weak or ambiguous (UNKNOWN gets the full prompt).
+    """
+    if not document_text:
+        return UNKNOWN
+    scores = score_document(document_text, metadata)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best_type, best_score), (_, runner_up) = ranked[0], ranked[1]
+    if best_score < MIN_SCORE or best_score - runner_up < MIN_MARGIN:
+        return UNKNOWN
+    return best_type
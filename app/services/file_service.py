@@ -1,65 +1,395 @@
-import pdfplumber
-import pytesseract
-from PIL import Image
-from io import BytesIO
-from pdf2image import convert_from_bytes
-import fitz  # PyMuPDF
-from PIL import Image, ExifTags
+from __future__ import annotations
+
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from app.services.lazy_imports import lazy_module, preload_heavy_modules
+from config import settings
+
+# Heavy parsing libraries load on first use (or during warm-up), not at import
+pytesseract = lazy_module("pytesseract")
+fitz = lazy_module("fitz")  # PyMuPDF
+Image = lazy_module("PIL.Image")
+ExifTags = lazy_module("PIL.ExifTags")
+ImageChops = lazy_module("PIL.ImageChops")
+ImageFilter = lazy_module("PIL.ImageFilter")
+ImageOps = lazy_module("PIL.ImageOps")
+
+_ocr_pool = None
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    # Tesseract is CPU-bound and single-threaded per page, so scanned pages fan
+    # out over processes. "spawn" keeps children clear of the server's threads.
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ProcessPoolExecutor(
+            max_workers=settings.OCR_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _ocr_pool
+
+
+def _ocr_worker_ready() -> int:
+    # Loading fitz, PIL and pytesseract in the child is most of its start-up cost
+    preload_heavy_modules()
+    return multiprocessing.current_process().pid
+
+
+def warm_ocr_pool() -> int:
+    """
+    Starts the OCR worker processes now instead of on the first scanned page
+    (the pool spawns one per submitted task while none is idle).
+    """
+    pool = _get_ocr_pool()
+    futures = [pool.submit(_ocr_worker_ready) for _ in range(settings.OCR_WORKERS)]
+    for future in futures:
+        future.result()
+    return len(futures)
+
+
+def shutdown_ocr_pool():
+    global _ocr_pool
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown(cancel_futures=True)
+        _ocr_pool = None
+
+
+def warmup_document() -> bytes:
+    """
+    A one-page PDF that exercises text extraction, classification, rules and
+    arithmetic during warm-up.
+    """
+    with fitz.open() as doc:
+        page = doc.new_page()
+        lines = ["ACCOUNT STATEMENT", "Opening Balance R 1,000.00",
+                 "Date        Description        Debit        Credit        Balance",
+                 "2025-04-01  WARM-UP            100.00                      900.00",
+                 "Closing Balance R 900.00"]
+        for row, line in enumerate(lines):
+            page.insert_text((40, 60 + row * 16), line, fontsize=9)
+        return doc.tobytes()
+
+
+def _ocr_pdf_pages(content: bytes, page_indexes: list, dpi: int) -> list:
+    """
+    Process-pool worker: rasterizes and OCRs the given pages of one PDF.
+    """
+    results = []
+    with fitz.open(stream=content, filetype="pdf") as doc:
+        for index in page_indexes:
+            started = time.perf_counter()
+            entry = {"page": index + 1, "method": "ocr", "text": ""}
+            try:
+                pixmap = doc[index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+                image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+                entry["text"] = pytesseract.image_to_string(image).strip()
+            except Exception as e:
+                # One unreadable page must not sink the whole document
+                entry["error"] = str(e)
+            entry["seconds"] = round(time.perf_counter() - started, 4)
+            results.append(entry)
+    return results
+
+
+class _memoized_property:
+    """
+    Like functools.cached_property, but locked per instance: on Python < 3.12
+    cached_property holds one lock per class attribute, so computing `text`
+    for one upload would block `text` for every other upload in flight.
+    The value is stored in the instance __dict__ under the same name.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with instance._memo_lock:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.func(instance)
+            return instance.__dict__[self.name]
+
+
+class DocumentContext:
+    """
+    One upload, parsed once. `content` may be bytes or a memoryview over an
+    ingested upload; it is never copied as a whole except for the OCR pool.
+
+    The PDF is opened a single time with PyMuPDF (images a single time with PIL)
+    and text, metadata, page count and page rasters are derived from that handle
+    on first access and memoized for the rest of the request.
+    """
+
+    def __init__(self, content, content_type: str):
+        self.content = content
+        self.content_type = content_type or ""
+        # Re-entrant: properties build on each other (text -> page_texts -> pdf)
+        self._memo_lock = threading.RLock()
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.content_type == "application/pdf"
+
+    @property
+    def is_image(self) -> bool:
+        return self.content_type.startswith("image/")
+
+    @_memoized_property
+    def pdf(self):
+        return fitz.open(stream=self.content, filetype="pdf")
+
+    @_memoized_property
+    def image(self) -> Image.Image:
+        image = Image.open(BytesIO(self.content))
+        image.load()
+        return image
+
+    @_memoized_property
+    def page_count(self) -> int:
+        if self.is_pdf:
+            return self.pdf.page_count
+        if self.is_image:
+            return getattr(self.image, "n_frames", 1)
+        return 0
+
+    @_memoized_property
+    def page_texts(self) -> list:
+        """
+        Per-page text in page order: {"page", "text", "method", "seconds"}.
+
+        Pages with a text layer are read directly; pages without one (scans)
+        are rasterized and OCR'd in parallel on the OCR process pool.
+        """
+        if self.is_image:
+            started = time.perf_counter()
+            text = pytesseract.image_to_string(self.image).strip()
+            return [{"page": 1, "text": text, "method": "ocr",
+                     "seconds": round(time.perf_counter() - started, 4)}]
+        if not self.is_pdf:
+            return []
+
+        pages = []
+        scanned = []
+        for index, page in enumerate(self.pdf):
+            started = time.perf_counter()
+            page_text = (page.get_text("text") or "").strip()
+            if len(page_text) >= settings.OCR_MIN_TEXT_CHARS:
+                pages.append({"page": index + 1, "text": page_text, "method": "text_layer",
+                              "seconds": round(time.perf_counter() - started, 4)})
+            else:
+                pages.append(None)
+                scanned.append(index)
+
+        if scanned:
+            # Interleaved chunks, one per worker: balanced load, and the PDF
+            # bytes are shipped to each worker only once
+            workers = min(settings.OCR_WORKERS, len(scanned))
+            chunks = [scanned[i::workers] for i in range(workers)]
+            pool = _get_ocr_pool()
+            payload = self.content if isinstance(self.content, bytes) else bytes(self.content)
+            futures = [pool.submit(_ocr_pdf_pages, payload, chunk, settings.OCR_DPI) for chunk in chunks]
+            for future in futures:
+                for entry in future.result():
+                    pages[entry["page"] - 1] = entry
+        return pages
+
+    @_memoized_property
+    def text(self) -> str:
+        return "\n".join(page["text"] for page in self.page_texts if page["text"]).strip()
+
+    @_memoized_property
+    def metadata(self) -> dict:
+        meta_info = {}
+
+        if self.is_pdf:
+            meta_info = dict(self.pdf.metadata or {})  # author, creator, producer, etc.
+
+        elif self.is_image:
+            exif_data = self.image.getexif()
+            if exif_data:
+                for tag_id, value in exif_data.items():
+                    tag = ExifTags.TAGS.get(tag_id, tag_id)
+                    meta_info[tag] = str(value)
+
+        return meta_info
+
+    def page_image(self, index: int, dpi: int = None) -> Image.Image:
+        """
+        One page rendered at `dpi` (default RASTER_DPI_FORENSIC). Recently
+        rendered pages are kept in a small per-document LRU.
+        """
+        if self.is_image:
+            return self.image
+        dpi = dpi or settings.RASTER_DPI_FORENSIC
+        key = (index, dpi)
+        cache = self.__dict__.setdefault("_raster_cache", OrderedDict())
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        pixmap = self.pdf[index].get_pixmap(dpi=dpi)
+        image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        cache[key] = image
+        while len(cache) > settings.RASTER_CACHE_PAGES:
+            cache.popitem(last=False)
+        return image
+
+    def iter_page_rasters(self, dpi: int = None, pages: range = None, as_jpeg: bool = False, quality: int = 95):
+        """
+        Lazily yields (page number, PIL image or JPEG bytes), one page at a time,
+        so memory stays flat however long the document is. `pages` restricts
+        rendering to those 0-based page indexes.
+        """
+        indexes = range(self.page_count) if pages is None else pages
+        for index in indexes:
+            image = self.page_image(index, dpi)
+            yield index + 1, get_image_bytes(image.convert("RGB"), quality=quality) if as_jpeg else image
+
+    @_memoized_property
+    def llm_payload(self):
+        """
+        (bytes, mime type, report) to send to Gemini; see normalize_image_for_llm.
+        """
+        if not self.is_image:
+            return self.content, self.content_type, {"action": "original", "reason": "not an image"}
+        return normalize_image_for_llm(self.image, self.content, self.content_type, self.metadata)
+
+    def close(self):
+        self.__dict__.pop("_raster_cache", None)
+        if "pdf" in self.__dict__:
+            self.pdf.close()
+        if "image" in self.__dict__:
+            self.image.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 def extract_text_from_bytes(content: bytes, content_type: str) -> str:
     """
     Takes raw bytes directly so we don't have to worry about FastAPI file pointers.
     """
-    if content_type == "application/pdf":
-        text = ""
-        with pdfplumber.open(BytesIO(content)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text.strip()
+    with DocumentContext(content, content_type) as ctx:
+        return ctx.text
 
-    elif content_type.startswith("image/"):
-        image = Image.open(BytesIO(content))
-        return pytesseract.image_to_string(image).strip()
-    
-    return ""
-
-def convert_pdf_to_images(pdf_content: bytes):
+def iter_pdf_page_rasters(pdf_content, dpi: int = None, pages: range = None, as_jpeg: bool = False):
     """
-    Converts PDF pages into a list of PIL Image objects.
+    Renders and yields one page at a time via PyMuPDF; peak memory is one
+    page, not the whole document.
     """
-    # 300 DPI is standard for forensic-level detail
-    return convert_from_bytes(pdf_content, dpi=300)
+    with DocumentContext(pdf_content, "application/pdf") as ctx:
+        yield from ctx.iter_page_rasters(dpi=dpi, pages=pages, as_jpeg=as_jpeg)
 
-def get_image_bytes(image: Image.Image) -> bytes:
+def get_image_bytes(image: Image.Image, quality: int = 95) -> bytes:
     """
     Converts a PIL Image object back into JPEG bytes.
     """
     buf = BytesIO()
-    image.save(buf, format="JPEG", quality=95)
+    image.save(buf, format="JPEG", quality=quality)
     return buf.getvalue()
 
 
+# ELA cells need this much mean edge strength to count as textured, at least this many
+# must exist for a comparison, and typical error below the floor (1/8 grey level,
+# amplified) is treated as the floor so near-lossless resaves don't divide by zero
+_ELA_TEXTURE_FLOOR = 4
+_ELA_MIN_TEXTURED_CELLS = 8
+_ELA_ERROR_FLOOR = 2
+
+_EDITING_SOFTWARE = ("photoshop", "gimp", "canva", "picsart", "snapseed", "pixlr", "lightroom", "illustrator")
+
+
+def tamper_precheck(image: Image.Image, metadata: dict) -> list:
+    """
+    Cheap local signals that the pixels themselves may be evidence:
+    editing-software fingerprints in EXIF and, for JPEGs, an error-level-analysis
+    hot spot (one region recompressing very differently from the rest of the image).
+    """
+    flags = []
+    software = " ".join(str(metadata.get(tag, "")) for tag in ("Software", "ProcessingSoftware")).lower()
+    if any(name in software for name in _EDITING_SOFTWARE):
+        flags.append(f"editing software in EXIF: {software.strip()}")
+
+    # ELA only means something on a JPEG: lossless sources have no compression history to compare
+    if image.format != "JPEG":
+        return flags
+    # ELA has to run on the original pixel grid; downscaling first erases the signal
+    sample = image.convert("RGB")
+    recompressed = Image.open(BytesIO(get_image_bytes(sample, quality=90)))
+    error = ImageChops.difference(sample, recompressed).convert("L").point(lambda v: min(255, v * 16))
+    edges = sample.convert("L").filter(ImageFilter.FIND_EDGES)
+    # Mean (amplified) error and edge strength per cell of a 16x16 grid. Flat background
+    # recompresses to almost nothing, so the worst cell is compared with the typical
+    # textured cell (text, portrait, photo), not with the median cell
+    cells = list(error.resize((16, 16), Image.Resampling.BOX).tobytes())
+    texture = list(edges.resize((16, 16), Image.Resampling.BOX).tobytes())
+    texture_floor = max(sorted(texture)[len(texture) // 2], _ELA_TEXTURE_FLOOR)
+    textured = sorted(cell for cell, edge in zip(cells, texture) if edge >= texture_floor)
+    if len(textured) < _ELA_MIN_TEXTURED_CELLS:
+        return flags
+    typical = max(textured[len(textured) // 2], _ELA_ERROR_FLOOR)
+    if max(cells) / typical >= settings.LLM_IMAGE_ELA_RATIO:
+        flags.append(f"error-level hot spot ({max(cells) / typical:.1f}x typical textured region)")
+    return flags
+
+
+def normalize_image_for_llm(image: Image.Image, content, content_type: str, metadata: dict, mode: str = None):
+    """
+    Applies EXIF orientation, downscales to LLM_IMAGE_MAX_EDGE and re-encodes
+    as JPEG at LLM_IMAGE_QUALITY. Returns (bytes, mime type, report).
+
+    The original upload is sent instead when mode is "off", when "forensic"
+    mode's tamper pre-check fires, or when re-encoding would not make it smaller.
+    """
+    mode = mode or settings.LLM_IMAGE_MODE
+    started = time.perf_counter()
+    report = {"mode": mode, "original_bytes": len(content), "original_size": list(image.size)}
+
+    def keep_original(reason: str, **extra):
+        report.update(extra, action="original", reason=reason, sent_bytes=len(content), bytes_saved=0,
+                      seconds=round(time.perf_counter() - started, 4))
+        return content, content_type, report
+
+    if mode == "off":
+        return keep_original("normalization disabled")
+    if mode == "forensic":
+        flags = tamper_precheck(image, metadata)
+        if flags:
+            return keep_original("tamper pre-check", tamper_flags=flags)
+
+    normalized = ImageOps.exif_transpose(image).convert("RGB")
+    if max(normalized.size) > settings.LLM_IMAGE_MAX_EDGE:
+        normalized.thumbnail((settings.LLM_IMAGE_MAX_EDGE, settings.LLM_IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+    payload = get_image_bytes(normalized, quality=settings.LLM_IMAGE_QUALITY)
+    if len(payload) >= len(content):
+        return keep_original("already compact")
+
+    report.update(
+        action="normalized",
+        sent_bytes=len(payload),
+        bytes_saved=len(content) - len(payload),
+        sent_size=list(normalized.size),
+        seconds=round(time.perf_counter() - started, 4),
+    )
+    return payload, "image/jpeg", report
+
+
 
 def extract_metadata(content: bytes, content_type: str) -> dict:
     """
     Extracts hidden metadata tags from PDFs and Images.
     """
-    meta_info = {}
-
-    if content_type == "application/pdf":
-        with fitz.open(stream=content, filetype="pdf") as doc:
-            meta_info = doc.metadata  # Returns dict with author, creator, producer, etc.
-            
-    elif content_type.startswith("image/"):
-        image = Image.open(BytesIO(content))
-        exif_data = image.getexif()
-        if exif_data:
-            for tag_id, value in exif_data.items():
-                tag = ExifTags.TAGS.get(tag_id, tag_id)
-                meta_info[tag] = str(value)
-                
-    return meta_info
\ No newline at end of file
+    with DocumentContext(content, content_type) as ctx:
+        return ctx.metadata
@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+from app.services.pipeline_service import analyze_content, run_blocking
+from app.services.metrics_service import metrics, requests_total, in_flight, error_outcome
+from app.services.quota_service import BATCH
+from app.services.response_service import ForgeryAnalysis
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobStore:
+    """
+    SQLite-backed job table. Uploads are kept as files next to the database
+    until their job finishes, so queued work survives a restart.
+
+    Several worker processes may share the table: a job is claimed with one
+    conditional UPDATE, and a RUNNING job carries its owner and a heartbeat
+    so only jobs whose owner stopped renewing the lease are taken back.
+
+    Nothing touches the disk until open(), which JobManager.start() calls.
+    """
+
+    def __init__(self, db_path: str, upload_dir: str):
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self._lock = threading.Lock()
+        self._db = None
+
+    def open(self):
+        """
+        Creates the directories and the job table; safe to call again.
+        """
+        with self._lock:
+            if self._db is None:
+                self._db = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(self.upload_dir, exist_ok=True)
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " filename TEXT,"
+            " content_type TEXT,"
+            " upload_path TEXT,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " owner TEXT,"
+            " heartbeat_at REAL)"
+        )
+        columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at)")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs(status, finished_at)")
+        db.commit()
+        return db
+
+    def create(self, filename: str, content_type: str, content: bytes) -> str:
+        job_id = uuid.uuid4().hex
+        upload_path = os.path.join(self.upload_dir, job_id)
+        with open(upload_path, "wb") as f:
+            f.write(content)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, filename, content_type, upload_path, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, filename, content_type, upload_path, time.time())
+            )
+            self._db.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def claim(self, job_id: str, owner: str) -> Optional[dict]:
+        """
+        Marks a QUEUED job RUNNING under `owner` and returns it, or None when
+        it is gone or another worker got there first.
+        """
+        now = time.time()
+        with self._lock:
+            claimed = self._db.execute(
+                "UPDATE jobs SET status = ?, owner = ?, started_at = ?, heartbeat_at = ?"
+                " WHERE id = ? AND status = ?",
+                (RUNNING, owner, now, now, job_id, QUEUED)
+            ).rowcount
+            self._db.commit()
+            if not claimed:
+                return None
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row)
+
+    def heartbeat(self, owner: str):
+        """
+        Renews the lease on every job `owner` is running.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = ?", (time.time(), owner, RUNNING)
+            )
+            self._db.commit()
+
+    def release(self, owner: str):
+        """
+        Puts the jobs `owner` was running back on the queue (clean shutdown).
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, started_at = NULL, heartbeat_at = NULL"
+                " WHERE owner = ? AND status = ?", (QUEUED, owner, RUNNING)
+            )
+            self._db.commit()
+
+    def mark_done(self, job_id: str, analysis: ForgeryAnalysis):
+        self._update(job_id, status=DONE, result=analysis.model_dump_json(), finished_at=time.time())
+        self._discard_upload(job_id)
+
+    def mark_failed(self, job_id: str, error: str):
+        self._update(job_id, status=FAILED, error=error, finished_at=time.time())
+        self._discard_upload(job_id)
+
+    def requeue_interrupted(self, lease_seconds: float) -> list:
+        """
+        Jobs left RUNNING by a worker that has not renewed its lease for
+        `lease_seconds` (crashed or killed) go back to the queue.
+        Returns every queued job id, oldest first.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, started_at = NULL, heartbeat_at = NULL"
+                " WHERE status = ? AND COALESCE(heartbeat_at, started_at, 0) < ?",
+                (QUEUED, RUNNING, time.time() - lease_seconds)
+            )
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def purge_finished(self, retention_seconds: float) -> int:
+        """
+        Deletes DONE and FAILED jobs (and their stored results) that finished
+        more than `retention_seconds` ago. Returns how many went.
+        """
+        with self._lock:
+            purged = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, time.time() - retention_seconds)
+            ).rowcount
+            self._db.commit()
+        return purged
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def read_upload(self, job_id: str) -> bytes:
+        with open(os.path.join(self.upload_dir, job_id), "rb") as f:
+            return f.read()
+
+    def _discard_upload(self, job_id: str):
+        try:
+            os.remove(os.path.join(self.upload_dir, job_id))
+        except FileNotFoundError:
+            pass
+
+    def _update(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+
+class JobManager:
+    """
+    Feeds persisted jobs to a fixed pool of background workers that run the
+    normal analysis pipeline.
+
+    Each manager (one per process) renews the lease on its running jobs every
+    third of `lease_seconds`. The same tick re-queues jobs whose owner let the
+    lease lapse and purges finished jobs older than `retention_seconds`.
+    """
+
+    def __init__(self, store: JobStore, workers: int, lease_seconds: float, retention_seconds: float):
+        self.store = store
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self.owner = uuid.uuid4().hex
+        self._queue = None
+        self._queued = set()
+        self._tasks = []
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._started_at = None
+
+    async def start(self):
+        await run_blocking(self.store.open)
+        self._queue = asyncio.Queue()
+        self._queued = set()
+        self._enqueue(await run_blocking(self.store.requeue_interrupted, self.lease_seconds))
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._housekeeping()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Interrupted jobs go straight back to the queue rather than waiting out the lease
+        await run_blocking(self.store.release, self.owner)
+
+    async def submit(self, filename: str, content_type: str, content: bytes) -> str:
+        job_id = await run_blocking(self.store.create, filename, content_type, content)
+        self._enqueue([job_id])
+        return job_id
+
+    def _enqueue(self, job_ids: list):
+        for job_id in job_ids:
+            if job_id not in self._queued:
+                self._queued.add(job_id)
+                self._queue.put_nowait(job_id)
+
+    def queue_depth(self) -> int:
+        """
+        Jobs this process has queued that no worker has picked up yet.
+        """
+        return self._queue.qsize() if self._queue else 0
+
+    def stats(self) -> dict:
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "queue_depth": self.queue_depth(),
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "utilization": round(self._busy / self.workers, 3) if self.workers else 0.0,
+            "average_utilization": round(self._busy_seconds / (uptime * self.workers), 3) if uptime and self.workers else 0.0,
+            "jobs": self.store.counts(),
+        }
+
+    async def _housekeeping(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await run_blocking(self.store.heartbeat, self.owner)
+                self._enqueue(await run_blocking(self.store.requeue_interrupted, self.lease_seconds))
+                await run_blocking(self.store.purge_finished, self.retention_seconds)
+            except sqlite3.Error as e:
+                logger.warning("Job housekeeping failed: %s", e)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            self._busy += 1
+            started = time.monotonic()
+            try:
+                await self._run(job_id)
+            finally:
+                self._busy -= 1
+                self._busy_seconds += time.monotonic() - started
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await run_blocking(self.store.claim, job_id, self.owner)
+        if job is None:
+            return
+        try:
+            content = await run_blocking(self.store.read_upload, job_id)
+            with in_flight.track("jobs"):
+                analysis_obj = await analyze_content(content, job["content_type"], priority=BATCH)
+        except asyncio.CancelledError:
+            # Shutting down: stop() hands it back to the queue
+            raise
+        except Exception as e:
+            requests_total.inc("jobs", error_outcome(e))
+            await run_blocking(self.store.mark_failed, job_id, f"Analysis failed: {str(e)}")
+            return
+        requests_total.inc("jobs", "ok")
+        await run_blocking(self.store.mark_done, job_id, analysis_obj)
+
+
+job_manager = JobManager(
+    JobStore(settings.JOBS_DB_PATH, settings.JOBS_UPLOAD_DIR),
+    workers=settings.JOB_WORKERS,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    retention_seconds=settings.JOB_RETENTION_SECONDS,
+)
+
+metrics.callback_gauge(
+    "forensics_job_queue_depth",
+    "Background jobs waiting for a worker.",
+    lambda: {(): job_manager.queue_depth()}
+)
@@ -0,0 +1,66 @@
+import importlib
+import threading
+import time
+
+# Every third-party module the services import lazily; preload_heavy_modules
+# loads them all, which warm-up does before the instance reports ready.
+HEAVY_MODULES = []
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access, so
+    `fitz = lazy_module("fitz")` followed by `fitz.open(...)` only pays for
+    PyMuPDF when a stage actually opens a PDF.
+    """
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_name"])
+                    self.__dict__["_module"] = module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    for module in HEAVY_MODULES:
+        if module.__dict__["_name"] == name:
+            return module
+    module = LazyModule(name)
+    HEAVY_MODULES.append(module)
+    return module
+
+
+def preload_heavy_modules() -> dict:
+    """
+    Imports every lazy module now; returns seconds spent per module (0 for
+    those already loaded).
+    """
+    report = {}
+    for module in HEAVY_MODULES:
+        started = time.perf_counter()
+        module.load()
+        report[module.__dict__["_name"]] = round(time.perf_counter() - started, 4)
+    return report
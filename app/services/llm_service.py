@@ -1,50 +1,404 @@
-from google import genai
-from google.genai import types
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import time
+from app.services.lazy_imports import lazy_module
+from app.services.prompt_service import FORENSIC_SYSTEM_INSTRUCTION, SYSTEM_INSTRUCTIONS
+from app.services.resilience_service import gemini_resilience, LLMTimeoutError
+from app.services.quota_service import gemini_quota, estimate_tokens, INTERACTIVE
+from app.services.metrics_service import llm_request_bytes, llm_tokens
+from app.services.transport_service import llm_transport, request_fingerprint
 from config import settings
 
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
-
-def call_gemini_forensics(prompt: str, file_content: bytes, mime_type: str) -> str:
-    document_part = types.Part.from_bytes(data=file_content, mime_type=mime_type)
-
-    response_schema = {
-        "type": "OBJECT",
-        "properties": {
-            "visual_analysis": {
-                "type": "OBJECT",
-                "properties": {
-                    "is_tampered": {"type": "BOOLEAN"},
-                    "confidence_score": {"type": "INTEGER"},
-                    "specific_artifacts": {"type": "ARRAY", "items": {"type": "STRING"}},
-                    "quality_check": {"type": "STRING"}
-                },
-                "required": ["is_tampered", "confidence_score", "specific_artifacts", "quality_check"]
+# google-genai (and its pydantic models) takes longer to import than the rest of the app
+httpx = lazy_module("httpx")
+genai = lazy_module("google.genai")
+types = lazy_module("google.genai.types")
+
+# Built on first use (normally during warm-up) and closed by close_client from the app lifespan
+client = None
+_http_client = None
+
+
+def init_client() -> genai.Client:
+    """
+    Creates the shared Gemini client on a keep-alive connection pool sized to
+    our concurrency (GEMINI_HTTP_MAX_CONNECTIONS). Idempotent.
+    """
+    global client, _http_client
+    if client is None:
+        limits = httpx.Limits(
+            max_connections=settings.GEMINI_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GEMINI_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=settings.GEMINI_HTTP_KEEPALIVE_SECONDS,
+        )
+        # httpx defaults to a 5s read timeout; per-attempt deadlines live in resilience_service
+        timeout = httpx.Timeout(settings.GEMINI_TIMEOUT_SECONDS, connect=10.0)
+        _http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        client = genai.Client(
+            api_key=settings.GEMINI_API_KEY,
+            http_options=types.HttpOptions(
+                httpx_async_client=_http_client,
+                client_args={"limits": limits, "timeout": timeout},
+            )
+        )
+    return client
+
+
+def get_client() -> genai.Client:
+    return client if client is not None else init_client()
+
+
+async def close_client():
+    global client, _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    if client is not None and hasattr(client, "close"):
+        client.close()
+    client, _http_client = None, None
+    prompt_cache.invalidate()
+
+
+async def warm_up_client(models: list = None) -> dict:
+    """
+    Opens GEMINI_WARMUP_CONNECTIONS pooled connections (TLS included) with a
+    cheap model lookup, and creates the context caches for each of `models`
+    (default GEMINI_MODEL) when caching is on, so the first analysis does not
+    pay for either.
+    """
+    if llm_transport.offline:
+        return {"transport": llm_transport.mode}
+    models = models or [settings.GEMINI_MODEL]
+    started = time.perf_counter()
+    aio = get_client().aio
+    await asyncio.gather(*(
+        aio.models.get(model=models[0]) for _ in range(settings.GEMINI_WARMUP_CONNECTIONS)
+    ))
+    report = {"connections": settings.GEMINI_WARMUP_CONNECTIONS,
+              "connect_seconds": round(time.perf_counter() - started, 4)}
+    if settings.GEMINI_CONTEXT_CACHE:
+        started = time.perf_counter()
+        for model in models:
+            for instruction in set(SYSTEM_INSTRUCTIONS.values()):
+                await prompt_cache.get_handle(model, instruction)
+        report["context_caches"] = len(models) * len(set(SYSTEM_INSTRUCTIONS.values()))
+        report["context_cache_seconds"] = round(time.perf_counter() - started, 4)
+    return report
+
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "visual_analysis": {
+            "type": "OBJECT",
+            "properties": {
+                "is_tampered": {"type": "BOOLEAN"},
+                "confidence_score": {"type": "INTEGER"},
+                "specific_artifacts": {"type": "ARRAY", "items": {"type": "STRING"}},
+                "quality_check": {"type": "STRING"}
             },
-            "logical_analysis": {
-                "type": "OBJECT",
-                "properties": {
-                    "has_contradictions": {"type": "BOOLEAN"},
-                    "confidence_score": {"type": "INTEGER"},
-                    "math_errors": {"type": "ARRAY", "items": {"type": "STRING"}},
-                    "date_issues": {"type": "ARRAY", "items": {"type": "STRING"}}
-                },
-                "required": ["has_contradictions", "confidence_score", "math_errors", "date_issues"]
+            "required": ["is_tampered", "confidence_score", "specific_artifacts", "quality_check"]
+        },
+        "logical_analysis": {
+            "type": "OBJECT",
+            "properties": {
+                "has_contradictions": {"type": "BOOLEAN"},
+                "confidence_score": {"type": "INTEGER"},
+                "math_errors": {"type": "ARRAY", "items": {"type": "STRING"}},
+                "date_issues": {"type": "ARRAY", "items": {"type": "STRING"}}
             },
-            "classification": {"type": "STRING"},
-            "confidence": {"type": "INTEGER"},
-            "summary": {"type": "STRING"},
-            "reasoning": {"type": "STRING"}
+            "required": ["has_contradictions", "confidence_score", "math_errors", "date_issues"]
         },
-        "required": ["visual_analysis", "logical_analysis", "classification", "confidence", "summary"]
-    }
-
-    response = client.models.generate_content(
-        model=settings.GEMINI_MODEL,
-        contents=[document_part, prompt],
-        config=types.GenerateContentConfig(
-            temperature=0.1,
-            response_mime_type="application/json",
-            response_schema=response_schema,
+        "classification": {"type": "STRING"},
+        "confidence": {"type": "INTEGER"},
+        "summary": {"type": "STRING"},
+        "reasoning": {"type": "STRING"}
+    },
+    "required": ["visual_analysis", "logical_analysis", "classification", "confidence", "summary"],
+    # Gemini writes keys alphabetically unless told otherwise; evidence first, then the
+    # verdict, and the long reasoning last, so streaming consumers get the useful parts early
+    "propertyOrdering": ["visual_analysis", "logical_analysis", "classification", "confidence", "summary", "reasoning"]
+}
+
+
+
+class TokenUsageStats:
+    """
+    Running totals of what Gemini reports in usage_metadata, so the effect of
+    prompt changes (system instruction, context caching) is visible per request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.last = {}
+
+    def record(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        prompt_tokens = usage.prompt_token_count or 0
+        cached_tokens = usage.cached_content_token_count or 0
+        output_tokens = usage.candidates_token_count or 0
+        llm_tokens.inc("prompt", amount=prompt_tokens)
+        llm_tokens.inc("cached", amount=cached_tokens)
+        llm_tokens.inc("output", amount=output_tokens)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            self.output_tokens += output_tokens
+            self.last = {
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "uncached_prompt_tokens": prompt_tokens - cached_tokens,
+                "output_tokens": output_tokens,
+            }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            per_request = self.requests or 1
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "output_tokens": self.output_tokens,
+                "avg_prompt_tokens": round(self.prompt_tokens / per_request, 1),
+                "avg_uncached_prompt_tokens": round((self.prompt_tokens - self.cached_tokens) / per_request, 1),
+                "last": dict(self.last),
+            }
+
+
+token_usage = TokenUsageStats()
+
+
+class PromptCache:
+    """
+    Keeps a Gemini cached-content handle for each system instruction and
+    extends its TTL shortly before it expires, so the static rules are
+    uploaded once instead of with every document.
+    """
+
+    def __init__(self, ttl_seconds: int, refresh_margin_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._handles = {}  # (model, instruction hash) -> (cache name, expires_at)
+        self._lock = asyncio.Lock()
+
+    async def get_handle(self, model: str, instruction: str) -> str:
+        key = (model, hashlib.sha256(instruction.encode("utf-8")).hexdigest())
+        handle = self._handles.get(key)
+        if handle and handle[1] - time.time() > self.refresh_margin_seconds:
+            return handle[0]
+
+        async with self._lock:
+            handle = self._handles.get(key)
+            now = time.time()
+            if handle and handle[1] - now > self.refresh_margin_seconds:
+                return handle[0]
+
+            ttl = f"{self.ttl_seconds}s"
+            if handle and handle[1] > now:
+                try:
+                    await get_client().aio.caches.update(
+                        name=handle[0],
+                        config=types.UpdateCachedContentConfig(ttl=ttl)
+                    )
+                    self._handles[key] = (handle[0], now + self.ttl_seconds)
+                    return handle[0]
+                except Exception:
+                    pass  # Expired or deleted upstream; create a fresh one below
+
+            cached = await get_client().aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name="forensic-rules",
+                    system_instruction=instruction,
+                    ttl=ttl,
+                )
+            )
+            self._handles[key] = (cached.name, now + self.ttl_seconds)
+            return cached.name
+
+    def invalidate(self):
+        self._handles.clear()
+
+
+prompt_cache = PromptCache(
+    ttl_seconds=settings.GEMINI_CACHE_TTL_SECONDS,
+    refresh_margin_seconds=settings.GEMINI_CACHE_REFRESH_MARGIN_SECONDS,
+)
+
+
+def _record_request_bytes(file_content, prompt: str):
+    # Once per call; retries and hedges resend the same bytes
+    llm_request_bytes.inc("document", amount=len(file_content))
+    llm_request_bytes.inc("prompt", amount=len(prompt.encode("utf-8")))
+
+
+def _document_part(file_content, mime_type: str) -> types.Part:
+    # The SDK only takes real bytes; memoryviews from ingestion are copied here, once
+    if not isinstance(file_content, bytes):
+        file_content = bytes(file_content)
+    return types.Part.from_bytes(data=file_content, mime_type=mime_type)
+
+def _generation_config(system_instruction: str = None, cached_content: str = None,
+                       http_options: types.HttpOptions = None) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        http_options=http_options,
+        temperature=0.1,
+        response_mime_type="application/json",
+        response_schema=RESPONSE_SCHEMA,
+        system_instruction=None if cached_content else system_instruction,
+        cached_content=cached_content,
+    )
+
+def _request_fingerprint(file_content, prompt: str, system_instruction: str, model: str):
+    if not llm_transport.keyed:
+        return None
+    # Keyed on the system instruction itself, never on a context-cache handle that changes per run
+    config = _generation_config(system_instruction=system_instruction).model_dump(mode="json", exclude_none=True)
+    return request_fingerprint(file_content, prompt, model, config)
+
+async def _async_generation_config(model: str, system_instruction: str) -> types.GenerateContentConfig:
+    if settings.GEMINI_CONTEXT_CACHE and not llm_transport.offline:
+        try:
+            handle = await prompt_cache.get_handle(model, system_instruction)
+            return _generation_config(cached_content=handle)
+        except Exception:
+            # Caching is an optimisation only; never fail an analysis over it
+            pass
+    return _generation_config(system_instruction=system_instruction)
+
+def _billed_tokens(response) -> int:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0
+    return (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)
+
+async def _watch_quota(call):
+    try:
+        return await call
+    except Exception as e:
+        if getattr(e, "code", None) == 429:
+            gemini_quota.throttled()
+        raise
+
+def call_gemini_forensics(prompt: str, file_content: bytes, mime_type: str,
+                          system_instruction: str = FORENSIC_SYSTEM_INSTRUCTION, model: str = None) -> str:
+    model = model or settings.GEMINI_MODEL
+    document_part = _document_part(file_content, mime_type)
+    _record_request_bytes(file_content, prompt)
+    # The sync client cannot be cancelled from outside, so the deadline is its HTTP timeout
+    config = _generation_config(
+        system_instruction=system_instruction,
+        http_options=types.HttpOptions(timeout=int(settings.GEMINI_TIMEOUT_SECONDS * 1000))
+    )
+
+    fingerprint = _request_fingerprint(file_content, prompt, system_instruction, model)
+
+    response = gemini_resilience.call_sync(lambda: llm_transport.generate_sync(
+        fingerprint, model,
+        lambda: get_client().models.generate_content(
+            model=model,
+            contents=[document_part, prompt],
+            config=config
         )
+    ))
+    token_usage.record(response)
+    return response.text
+
+async def call_gemini_forensics_async(prompt: str, file_content: bytes, mime_type: str,
+                                      system_instruction: str = FORENSIC_SYSTEM_INSTRUCTION,
+                                      priority: int = INTERACTIVE, pages: int = 1, model: str = None) -> str:
+    """
+    Same call as call_gemini_forensics, but through the async client so the
+    event loop keeps serving other requests while Gemini is thinking.
+    The static rules go out as a system instruction, or as a cached-content
+    handle when GEMINI_CONTEXT_CACHE is on; only `prompt` is per-request.
+
+    Deadlines, retries, hedging and the circuit breaker come from
+    gemini_resilience (see resilience_service); every attempt is first
+    admitted by the RPM/TPM scheduler at `priority`, charged for `pages`.
+    `model` defaults to GEMINI_MODEL (see cascade_service for the fast tier).
+    """
+    model = model or settings.GEMINI_MODEL
+    document_part = _document_part(file_content, mime_type)
+    _record_request_bytes(file_content, prompt)
+    config = await _async_generation_config(model, system_instruction)
+    cost = estimate_tokens(prompt, system_instruction, pages)
+    fingerprint = _request_fingerprint(file_content, prompt, system_instruction, model)
+
+    response = await gemini_resilience.call(
+        lambda: _watch_quota(llm_transport.generate(
+            fingerprint, model,
+            lambda: get_client().aio.models.generate_content(
+                model=model,
+                contents=[document_part, prompt],
+                config=config
+            )
+        )),
+        before_attempt=lambda: gemini_quota.acquire(cost, priority)
+    )
+    token_usage.record(response)
+    gemini_quota.settle(cost, _billed_tokens(response))
+    return response.text
+
+
+async def stream_gemini_forensics_async(prompt: str, file_content: bytes, mime_type: str,
+                                        system_instruction: str = FORENSIC_SYSTEM_INSTRUCTION,
+                                        priority: int = INTERACTIVE, pages: int = 1, model: str = None):
+    """
+    Streaming variant of call_gemini_forensics_async: yields the response text
+    chunk by chunk as Gemini produces it.
+
+    The resilience policy covers opening the stream up to its first chunk;
+    once text has been yielded a failure can no longer be retried, so later
+    chunks only get an idle deadline.
+    """
+    model = model or settings.GEMINI_MODEL
+    document_part = _document_part(file_content, mime_type)
+    _record_request_bytes(file_content, prompt)
+    config = await _async_generation_config(model, system_instruction)
+    cost = estimate_tokens(prompt, system_instruction, pages)
+    fingerprint = _request_fingerprint(file_content, prompt, system_instruction, model)
+
+    async def open_stream():
+        stream = await _watch_quota(llm_transport.open_stream(
+            fingerprint, model,
+            lambda: get_client().aio.models.generate_content_stream(
+                model=model,
+                contents=[document_part, prompt],
+                config=config
+            )
+        ))
+        try:
+            return stream, await stream.__anext__()
+        except StopAsyncIteration:
+            return stream, None
+
+    stream, chunk = await gemini_resilience.call(
+        open_stream, before_attempt=lambda: gemini_quota.acquire(cost, priority)
     )
-    return response.text
\ No newline at end of file
+    last_chunk = None
+    while chunk is not None:
+        last_chunk = chunk
+        if chunk.text:
+            yield chunk.text
+        try:
+            chunk = await asyncio.wait_for(stream.__anext__(), settings.GEMINI_TIMEOUT_SECONDS)
+        except StopAsyncIteration:
+            chunk = None
+        except asyncio.TimeoutError as e:
+            raise LLMTimeoutError(f"Gemini stream stalled for {settings.GEMINI_TIMEOUT_SECONDS:.0f}s") from e
+    # Usage totals arrive on the final chunk
+    if last_chunk is not None:
+        token_usage.record(last_chunk)
+        gemini_quota.settle(cost, _billed_tokens(last_chunk))
@@ -0,0 +1,290 @@
+import bisect
+import threading
+import time
+from app.services.resilience_service import gemini_resilience, CircuitOpenError, LLMTimeoutError, CLOSED
+from app.services.quota_service import gemini_quota
+
+# Stage latencies span sub-millisecond rule scans to minute-long Gemini calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return labels
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value, *extra in self.samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, labels, *extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def track(self, *labels) -> "_InFlight":
+        """
+        `with gauge.track(...)`: +1 while the block runs.
+        """
+        return _InFlight(self, labels)
+
+
+class CallbackGauge(_Metric):
+    """
+    Gauge read at scrape time from `callback()`, which returns
+    {label values tuple: value}; for state that already lives elsewhere
+    (circuit breaker, quota queue) and would be wasteful to mirror.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> list:
+        return [(self.name, labels, value) for labels, value in sorted(self.callback().items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value: float):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket (non-cumulative) counts, then sum; cumulated at scrape time
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def time(self, *labels) -> "_Timer":
+        """
+        `with histogram.time(...)`: observes the block's duration in seconds.
+        """
+        return _Timer(self, labels)
+
+    def samples(self) -> list:
+        with self._lock:
+            entries = [(labels, list(entry)) for labels, entry in sorted(self._values.items())]
+        samples = []
+        for labels, entry in entries:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", labels, cumulative, f'le="{_format_value(bound)}"'))
+            samples.append((f"{self.name}_count", labels, cumulative))
+            samples.append((f"{self.name}_sum", labels, entry[-1]))
+        return samples
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(*self.labels, value=time.perf_counter() - self.started)
+
+
+class _InFlight:
+    __slots__ = ("gauge", "labels")
+
+    def __init__(self, gauge: Gauge, labels: tuple):
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self):
+        self.gauge.inc(*self.labels)
+        return self
+
+    def __exit__(self, *exc):
+        self.gauge.dec(*self.labels)
+
+
+def error_outcome(error: Exception) -> str:
+    """
+    The `outcome` label for a failed analysis.
+    """
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, LLMTimeoutError):
+        return "timeout"
+    return "failed"
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format. Recording is a
+    dict update under a lock, so instrumenting the hot path costs about a
+    microsecond per call. Each worker process keeps its own registry; scrape
+    every worker (or run one) to see the full picture.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def callback_gauge(self, name: str, documentation: str, callback, labelnames=()) -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, callback, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "forensics_stage_seconds",
+    "Time spent in each pipeline stage.",
+    ("stage",)
+)
+requests_total = metrics.counter(
+    "forensics_requests_total",
+    "Analysis requests by endpoint and outcome (ok or an error reason).",
+    ("endpoint", "outcome")
+)
+in_flight = metrics.gauge(
+    "forensics_in_flight_requests",
+    "Analysis requests currently being processed.",
+    ("endpoint",)
+)
+upload_bytes = metrics.counter(
+    "forensics_upload_bytes_total",
+    "Bytes received in uploads.",
+    ("endpoint",)
+)
+llm_request_bytes = metrics.counter(
+    "forensics_llm_request_bytes_total",
+    "Bytes sent to Gemini per part (the document payload and the prompt text).",
+    ("part",)
+)
+llm_tokens = metrics.counter(
+    "forensics_llm_tokens_total",
+    "Tokens reported by Gemini usage_metadata (prompt includes cached).",
+    ("kind",)
+)
+cache_lookups = metrics.counter(
+    "forensics_cache_lookups_total",
+    "Result cache lookups by result (hit or miss).",
+    ("result",)
+)
+results_total = metrics.counter(
+    "forensics_results_total",
+    "Completed analyses by final classification.",
+    ("classification",)
+)
+overrides_total = metrics.counter(
+    "forensics_overrides_total",
+    "Verdicts forced by deterministic checks, by source (rules short-circuit or hard_stop) and classification.",
+    ("source", "classification")
+)
+decisions_total = metrics.counter(
+    "forensics_decisions_total",
+    "Completed analyses by the tier that decided them (rules, fast or primary model).",
+    ("tier",)
+)
+escalations_total = metrics.counter(
+    "forensics_cascade_escalations_total",
+    "Fast-model answers re-asked of the primary model, by reason (classification or confidence).",
+    ("reason",)
+)
+flights_total = metrics.counter(
+    "forensics_flights_total",
+    "Analyses by single-flight role: leader (did the work) or follower (awaited an identical analysis in flight).",
+    ("role",)
+)
+circuit_open = metrics.callback_gauge(
+    "forensics_llm_circuit_open",
+    "1 while the Gemini circuit breaker is open or half-open.",
+    lambda: {(): 0 if gemini_resilience.breaker.state == CLOSED else 1}
+)
+quota_waiting = metrics.callback_gauge(
+    "forensics_quota_waiting_calls",
+    "Gemini calls queued for RPM/TPM quota, by priority.",
+    lambda: {(name,): count for name, count in gemini_quota.snapshot()["waiting"].items()},
+    ("priority",)
+)
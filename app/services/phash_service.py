@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from itertools import combinations
+from typing import Optional
+
+from app.services.lazy_imports import lazy_module
+from app.services.response_service import ForgeryAnalysis
+from config import settings
+
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
+
+HASH_BITS = 64
+# Multi-index hashing: the 64-bit pHash is split into this many 16-bit chunks, each indexed
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+
+# Near-duplicates of a document judged FORGED/SUSPICIOUS are evidence for the prompt, not proof
+TEMPLATE_REUSE_CLASSIFICATIONS = ("FORGED", "SUSPICIOUS")
+TEMPLATE_REUSE_CONFIDENCE = 70
+# Verdicts a re-encoded copy inherits outright; any other (ORIGINAL) also needs identical
+# metadata and a clean screening, since an edited copy can look and read the same
+AUTO_REUSE_CLASSIFICATIONS = TEMPLATE_REUSE_CLASSIFICATIONS
+
+_dct_matrix = None
+
+
+def _dct(size: int = 32):
+    global _dct_matrix
+    if _dct_matrix is None:
+        k = np.arange(size)[:, None]
+        i = np.arange(size)[None, :]
+        _dct_matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * size))
+    return _dct_matrix
+
+
+def _pack(bits) -> int:
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+
+def phash(image: Image.Image) -> int:
+    """
+    64-bit DCT hash: the 8x8 lowest frequencies of a 32x32 grayscale
+    thumbnail, each compared with their median. Survives re-encoding,
+    rescaling and small edits.
+    """
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    matrix = _dct()
+    low = (matrix @ pixels @ matrix.T)[:8, :8].flatten()
+    return _pack(low > np.median(low[1:]))
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    64-bit gradient hash: whether each pixel of a 9x8 thumbnail is brighter
+    than its left neighbour. Confirms pHash matches before a verdict is reused.
+    """
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _pack(pixels[:, 1:] > pixels[:, :-1])
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def _unsigned(value: int) -> int:
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def _chunks(value: int) -> list:
+    mask = (1 << CHUNK_BITS) - 1
+    return [(value >> (CHUNK_BITS * (CHUNKS - 1 - index))) & mask for index in range(CHUNKS)]
+
+
+def _within(value: int, radius: int) -> list:
+    """
+    Every CHUNK_BITS-wide value within `radius` bit flips of `value`.
+    """
+    values = [value]
+    for flips in range(1, radius + 1):
+        for positions in combinations(range(CHUNK_BITS), flips):
+            flipped = value
+            for position in positions:
+                flipped ^= 1 << position
+            values.append(flipped)
+    return values
+
+
+def text_fingerprint(text: str) -> str:
+    """
+    SHA-256 of the whitespace-normalised text; "" when there is no text,
+    which never matches (a blank page says nothing about being the same document).
+    """
+    normalized = re.sub(r"\s+", " ", text or "").strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest() if normalized else ""
+
+
+def metadata_fingerprint(metadata: dict) -> str:
+    return hashlib.sha256(json.dumps(metadata or {}, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class DocumentHashes:
+    """
+    Perceptual hashes of a document's first pages plus fingerprints of its
+    text and metadata: what the index stores and searches with.
+    """
+
+    __slots__ = ("pages", "text_sha", "metadata_sha")
+
+    def __init__(self, pages: list, text_sha: str, metadata_sha: str = ""):
+        self.pages = pages  # [(page number, pHash, dHash)]
+        self.text_sha = text_sha
+        self.metadata_sha = metadata_sha
+
+
+def document_hashes(ctx, max_pages: int = None) -> DocumentHashes:
+    """
+    Hashes the first `max_pages` pages of a DocumentContext, rendered at
+    RASTER_DPI_PREVIEW (enough for a 32x32 thumbnail).
+    """
+    max_pages = max_pages or settings.PHASH_MAX_PAGES
+    pages = []
+    for number, image in ctx.iter_page_rasters(dpi=settings.RASTER_DPI_PREVIEW,
+                                               pages=range(min(ctx.page_count, max_pages))):
+        pages.append((number, phash(image), dhash(image)))
+    return DocumentHashes(pages, text_fingerprint(ctx.text), metadata_fingerprint(ctx.metadata))
+
+
+class PerceptualIndex:
+    """
+    Page hashes of every analysed document, with its verdict, in SQLite.
+
+    Lookups by Hamming distance use multi-index hashing: each pHash is
+    stored as four indexed 16-bit chunks. Two hashes within distance r agree
+    to within r // 4 bits on at least one chunk, so a query probes each
+    chunk index with every value that close (17 per chunk at r = 6) and
+    checks the handful of candidates exactly; the cost grows with the
+    number of near matches, not with the size of the index.
+
+    Like the result cache, entries expire after `ttl_seconds`, and past
+    `max_documents` the oldest documents are dropped (None for no limit);
+    both are enforced on write, with expired entries skipped on read.
+    """
+
+    def __init__(self, db_path: str, max_distance: int, neighbours: int, reuse_distance: int,
+                 ttl_seconds: float = None, max_documents: int = None):
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.neighbours = neighbours
+        self.reuse_distance = reuse_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "candidates": 0, "matches": 0, "reused": 0, "added": 0, "evictions": 0}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " document TEXT PRIMARY KEY,"
+            " pages INTEGER NOT NULL,"
+            " text_sha TEXT NOT NULL,"
+            " classification TEXT NOT NULL,"
+            " confidence INTEGER NOT NULL,"
+            " analysis TEXT NOT NULL,"
+            " analyzed_at REAL NOT NULL,"
+            " metadata_sha TEXT NOT NULL DEFAULT '')"
+        )
+        # Indexes created before metadata was fingerprinted
+        if "metadata_sha" not in {row[1] for row in self._db.execute("PRAGMA table_info(documents)")}:
+            self._db.execute("ALTER TABLE documents ADD COLUMN metadata_sha TEXT NOT NULL DEFAULT ''")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS page_hashes ("
+            " document TEXT NOT NULL,"
+            " page INTEGER NOT NULL,"
+            " phash INTEGER NOT NULL,"
+            " dhash INTEGER NOT NULL,"
+            + ",".join(f" c{index} INTEGER NOT NULL" for index in range(CHUNKS)) + ")"
+        )
+        for index in range(CHUNKS):
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS page_hashes_c{index} ON page_hashes(c{index})")
+        self._db.execute("CREATE INDEX IF NOT EXISTS page_hashes_document ON page_hashes(document)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS documents_analyzed_at ON documents(analyzed_at)")
+        self._db.commit()
+        self._documents = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def add(self, document: str, hashes: DocumentHashes, analysis: ForgeryAnalysis):
+        """
+        Indexes `document` (its result cache key) with its verdict, replacing
+        any earlier entry for it.
+        """
+        self.add_many([(document, hashes, analysis)])
+
+    def add_many(self, entries: list):
+        """
+        [(document, hashes, analysis)] in one transaction, for backfills.
+        """
+        entries = list({entry[0]: entry for entry in entries if entry[1].pages}.values())
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            replaced = 0
+            for offset in range(0, len(entries), 500):
+                batch = [document for document, _, _ in entries[offset:offset + 500]]
+                replaced += self._db.execute(
+                    f"SELECT COUNT(*) FROM documents WHERE document IN ({','.join('?' * len(batch))})", batch
+                ).fetchone()[0]
+            self._db.executemany("DELETE FROM page_hashes WHERE document = ?",
+                                 [(document,) for document, _, _ in entries])
+            self._db.executemany(
+                f"INSERT INTO page_hashes VALUES (?, ?, ?, ?, {', '.join('?' * CHUNKS)})",
+                [(document, number, _signed(p_hash), _signed(d_hash), *_chunks(p_hash))
+                 for document, hashes, _ in entries for number, p_hash, d_hash in hashes.pages]
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(document, len(hashes.pages), hashes.text_sha, analysis.final_classification,
+                  analysis.final_confidence, analysis.model_dump_json(), now, hashes.metadata_sha)
+                 for document, hashes, analysis in entries]
+            )
+            self._documents += len(entries) - replaced
+            self._evict(now)
+            self._db.commit()
+            self._stats["added"] += len(entries)
+
+    def _evict(self, now: float):
+        # Expired documents first, then the oldest until back under max_documents
+        if self.ttl_seconds is not None:
+            self._drop("SELECT document FROM documents WHERE analyzed_at < ?", (now - self.ttl_seconds,))
+        if self.max_documents is not None and self._documents > self.max_documents:
+            self._drop("SELECT document FROM documents ORDER BY analyzed_at LIMIT ?",
+                       (self._documents - self.max_documents,))
+
+    def _drop(self, select: str, params: tuple):
+        self._db.execute(f"DELETE FROM page_hashes WHERE document IN ({select})", params)
+        dropped = self._db.execute(f"DELETE FROM documents WHERE document IN ({select})", params).rowcount
+        self._documents -= dropped
+        self._stats["evictions"] += dropped
+
+    def _candidates(self, p_hash: int, radius: int) -> list:
+        chunk_radius = radius // CHUNKS
+        rows = []
+        for index, chunk in enumerate(_chunks(p_hash)):
+            values = _within(chunk, chunk_radius)
+            rows += self._db.execute(
+                f"SELECT document, page, phash FROM page_hashes WHERE c{index} IN ({','.join('?' * len(values))})",
+                values
+            ).fetchall()
+        return rows
+
+    def nearest(self, hashes: DocumentHashes, limit: int = None, max_distance: int = None) -> list:
+        """
+        Prior documents with a page within `max_distance` bits of one of
+        ours, closest first: [{"document", "distance", "page", "matched_page",
+        "classification", "confidence", "analyzed_at"}].
+        """
+        limit = limit or self.neighbours
+        max_distance = self.max_distance if max_distance is None else max_distance
+        best = {}  # document -> (distance, our page, their page)
+        with self._lock:
+            self._stats["lookups"] += 1
+            for number, p_hash, _ in hashes.pages:
+                candidates = self._candidates(p_hash, max_distance)
+                self._stats["candidates"] += len(candidates)
+                for document, page, stored in candidates:
+                    distance = hamming(p_hash, _unsigned(stored))
+                    if distance <= max_distance and distance < best.get(document, (HASH_BITS + 1,))[0]:
+                        best[document] = (distance, number, page)
+            closest = sorted(best.items(), key=lambda item: item[1][0])[:limit]
+            verdicts = {}
+            if closest:
+                documents = [document for document, _ in closest]
+                verdicts = {row[0]: row[1:] for row in self._db.execute(
+                    "SELECT document, classification, confidence, analyzed_at FROM documents"
+                    f" WHERE document IN ({','.join('?' * len(documents))}) AND analyzed_at >= ?",
+                    (*documents, self._oldest_live())
+                )}
+            self._stats["matches"] += len(verdicts)
+        return [
+            {"document": document, "distance": distance, "page": page, "matched_page": matched_page,
+             "classification": verdicts[document][0], "confidence": verdicts[document][1],
+             "analyzed_at": verdicts[document][2]}
+            for document, (distance, page, matched_page) in closest if document in verdicts
+        ]
+
+    def _oldest_live(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds is not None else 0.0
+
+    def reusable(self, hashes: DocumentHashes, neighbours: list, findings: list = ()) -> Optional[ForgeryAnalysis]:
+        """
+        The verdict of a neighbour that is the same document re-encoded: the
+        same page count, every page within `reuse_distance` on both pHash and
+        dHash, and identical, non-empty extracted text. A changed field
+        changes the text, so template reuse never inherits a verdict.
+
+        FORGED/SUSPICIOUS verdicts are inherited on that alone; any other
+        verdict also needs identical metadata and no screening `findings`,
+        because the same text over an edited photo or signature, saved by
+        an editor, passes every visual and text check.
+        """
+        if not hashes.text_sha:
+            return None
+        for neighbour in neighbours:
+            if neighbour["distance"] > self.reuse_distance:
+                break
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT pages, text_sha, analysis, classification, metadata_sha FROM documents WHERE document = ?",
+                    (neighbour["document"],)
+                ).fetchone()
+                if row is None or row[0] != len(hashes.pages) or row[1] != hashes.text_sha:
+                    continue
+                if row[3] not in AUTO_REUSE_CLASSIFICATIONS and (findings or row[4] != hashes.metadata_sha):
+                    continue
+                stored = {page: (_unsigned(p_hash), _unsigned(d_hash)) for page, p_hash, d_hash in self._db.execute(
+                    "SELECT page, phash, dhash FROM page_hashes WHERE document = ?", (neighbour["document"],)
+                )}
+            if all(number in stored
+                   and hamming(p_hash, stored[number][0]) <= self.reuse_distance
+                   and hamming(d_hash, stored[number][1]) <= self.reuse_distance
+                   for number, p_hash, d_hash in hashes.pages):
+                with self._lock:
+                    self._stats["reused"] += 1
+                return ForgeryAnalysis.model_validate_json(row[2])
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents, = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()
+            pages, = self._db.execute("SELECT COUNT(*) FROM page_hashes").fetchone()
+            return {**self._stats, "documents": documents, "pages": pages,
+                    "max_distance": self.max_distance, "reuse_distance": self.reuse_distance,
+                    "ttl_seconds": self.ttl_seconds, "max_documents": self.max_documents}
+
+
+def public_neighbours(neighbours: list) -> list:
+    """
+    Neighbours as shown to the uploader: without "document", the other
+    upload's result cache key, which would tell them what else was submitted.
+    """
+    return [{key: value for key, value in neighbour.items() if key != "document"} for neighbour in neighbours]
+
+
+def template_findings(neighbours: list) -> list:
+    """
+    Rule-engine style findings for near-duplicates of documents already
+    judged FORGED or SUSPICIOUS; handed to Gemini as evidence.
+    """
+    findings = []
+    for neighbour in neighbours:
+        if neighbour["classification"] not in TEMPLATE_REUSE_CLASSIFICATIONS:
+            continue
+        findings.append({
+            "rule": "template_reuse",
+            "reason": (f"Template reuse: page {neighbour['page']} is a near-duplicate "
+                       f"({neighbour['distance']}/{HASH_BITS} bits differ) of page {neighbour['matched_page']} "
+                       f"of a document previously judged {neighbour['classification']}."),
+            "confidence": TEMPLATE_REUSE_CONFIDENCE,
+            "category": "visual",
+        })
+    return findings
+
+
+phash_index = PerceptualIndex(
+    db_path=settings.PHASH_DB_PATH,
+    max_distance=settings.PHASH_MAX_DISTANCE,
+    neighbours=settings.PHASH_NEIGHBOURS,
+    reuse_distance=settings.PHASH_REUSE_DISTANCE,
+    ttl_seconds=settings.PHASH_TTL_SECONDS,
+    max_documents=settings.PHASH_MAX_DOCUMENTS,
+) if settings.PHASH_ENABLED else None
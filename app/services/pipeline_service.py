@@ -0,0 +1,412 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app.services.file_service import DocumentContext, warmup_document, warm_ocr_pool, shutdown_ocr_pool
+from app.services.lazy_imports import preload_heavy_modules
+from app.services.prompt_service import (
+    build_forgery_prompt,
+    get_system_instruction,
+    DOCUMENT_TYPE_LABELS
+)
+from app.services.classifier_service import classify_document
+from app.services.rule_service import rule_engine, conclusive_findings
+from app.services.arithmetic_service import verify_arithmetic, arithmetic_findings, describe_arithmetic
+from app.services.llm_service import (
+    call_gemini_forensics_async,
+    stream_gemini_forensics_async,
+    close_client,
+    warm_up_client
+)
+from app.services.quota_service import INTERACTIVE
+from app.services.cache_service import result_cache, make_cache_key, sha256_hex
+from app.services.singleflight_service import analysis_flights
+from app.services.cascade_service import model_cascade, TIER_RULES, TIER_NEAR_DUPLICATE, TIER_PRIMARY
+from app.services.phash_service import phash_index, document_hashes, public_neighbours, template_findings
+from app.services.metrics_service import (
+    stage_seconds,
+    cache_lookups,
+    results_total,
+    overrides_total,
+    decisions_total,
+    escalations_total
+)
+from app.services.response_service import (
+    ForgeryAnalysis,
+    NearDuplicate,
+    HARD_STOP_MARKER,
+    parse_llm_response,
+    enforce_phase_discipline,
+    rule_verdict,
+    StreamingAnalysisDecoder
+)
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# PyMuPDF parsing, PIL work, hashing, SQLite lookups and waits on the OCR
+# process pool are blocking, so they run on a bounded thread pool instead of
+# the event loop.
+_cpu_executor = ThreadPoolExecutor(
+    max_workers=settings.CPU_WORKERS,
+    thread_name_prefix="forensics-cpu"
+)
+
+# Caps how many analyses run at once in this process; extra requests wait here
+# instead of piling more OCR jobs and Gemini calls on top of each other.
+_analysis_slots = asyncio.Semaphore(settings.MAX_CONCURRENT_ANALYSES)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking stage on the CPU pool and awaits its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_cpu_executor, partial(func, *args, **kwargs))
+
+
+async def _lookup_cache(content, content_hash: str = None):
+    """
+    Returns (cache_key, cached result or None). The key also identifies the
+    analysis in flight, so it is computed even when caching is off.
+    """
+    content_hash = content_hash or await run_blocking(sha256_hex, content)
+    cache_key = make_cache_key(content_hash, model=model_cascade.cache_signature())
+    if result_cache is None:
+        return cache_key, None
+    cached = await run_blocking(result_cache.get, cache_key)
+    cache_lookups.inc("miss" if cached is None else "hit")
+    return cache_key, cached
+
+
+def _timed(stage: str, func, *args):
+    # Times the work itself, inside the CPU pool, not the wait for a pool thread
+    with stage_seconds.time(stage):
+        return func(*args)
+
+
+def _apply_discipline(raw_llm_response: str, document_text: str) -> ForgeryAnalysis:
+    # 4. Parse JSON
+    with stage_seconds.time("parse"):
+        analysis_obj = parse_llm_response(raw_llm_response)
+
+    # 5. Apply Forensic Discipline with "Hard-Stop" Text Override
+    with stage_seconds.time("discipline"):
+        analysis_obj = enforce_phase_discipline(analysis_obj, document_text)
+    if analysis_obj.summary.startswith(HARD_STOP_MARKER):
+        overrides_total.inc("hard_stop", analysis_obj.final_classification)
+    return analysis_obj
+
+
+def _escalation_reason(analysis_obj: ForgeryAnalysis, tier: str) -> str:
+    # The primary model has the last word
+    if tier == TIER_PRIMARY:
+        return None
+    reason = model_cascade.escalation_reason(analysis_obj)
+    if reason is not None:
+        escalations_total.inc(reason)
+    return reason
+
+
+async def _complete(analysis_obj: ForgeryAnalysis, document_type: str, cache_key: str, tier: str,
+              hashes=None, neighbours=None) -> ForgeryAnalysis:
+    # 6. Final confidence verification
+    analysis_obj = analysis_obj.verify_confidence(threshold=90)
+    if analysis_obj.document_type is None:
+        analysis_obj.document_type = DOCUMENT_TYPE_LABELS.get(document_type)
+    analysis_obj.decision_tier = tier
+    if neighbours is not None:
+        analysis_obj.near_duplicates = [NearDuplicate(**neighbour) for neighbour in public_neighbours(neighbours)]
+    results_total.inc(analysis_obj.final_classification)
+    decisions_total.inc(tier)
+
+    # Parsing failures are not verdicts; let the next upload retry them
+    if analysis_obj.final_classification != "ERROR":
+        if result_cache is not None:
+            await run_blocking(result_cache.set, cache_key, analysis_obj)
+        # A reused verdict is already indexed under the document it came from
+        if hashes is not None and tier != TIER_NEAR_DUPLICATE:
+            await run_blocking(phash_index.add, cache_key, hashes, analysis_obj)
+    return analysis_obj
+
+
+def _log_payload(payload_report: dict, llm_seconds: float):
+    if payload_report.get("action") == "normalized" or "tamper_flags" in payload_report:
+        logger.info(
+            "LLM payload %s: %s -> %s bytes (saved %s) in %.3fs, Gemini call %.3fs",
+            payload_report["action"], payload_report["original_bytes"], payload_report["sent_bytes"],
+            payload_report["bytes_saved"], payload_report["seconds"], llm_seconds
+        )
+
+
+def _match(ctx: DocumentContext):
+    """
+    Perceptual hashes of the rendered pages and the nearest documents
+    analysed before: (hashes, neighbours), or (None, None) with the index off.
+    """
+    if phash_index is None:
+        return None, None
+    hashes = document_hashes(ctx)
+    return hashes, phash_index.nearest(hashes)
+
+
+def _reuse(hashes, neighbours: list, findings: list):
+    """
+    The verdict of a neighbour this document is a re-encoded copy of, or
+    None. Runs after _screen, so hard-stop and metadata rules always see the
+    document; see PerceptualIndex.reusable for when a verdict carries over.
+    """
+    if hashes is None:
+        return None
+    return phash_index.reusable(hashes, neighbours, findings)
+
+
+def _screen(ctx: DocumentContext, neighbours: list = None):
+    """
+    Pre-classify the document, run the deterministic rules for its type and
+    verify its arithmetic locally; near-duplicates of documents judged
+    FORGED/SUSPICIOUS add template-reuse findings. Returns (document_type,
+    findings, arithmetic report, verdict); verdict is set when the findings
+    are conclusive and the Gemini call can be skipped.
+    """
+    with stage_seconds.time("classify"):
+        document_type = classify_document(ctx.text, ctx.metadata)
+    with stage_seconds.time("arithmetic"):
+        arithmetic = verify_arithmetic(ctx, document_type)
+    with stage_seconds.time("rules"):
+        findings = rule_engine.evaluate(ctx.text, ctx.metadata, document_type)
+    findings += arithmetic_findings(arithmetic) + template_findings(neighbours or [])
+    findings.sort(key=lambda finding: finding["confidence"], reverse=True)
+    conclusive = conclusive_findings(findings)
+    verdict = rule_verdict(conclusive) if conclusive and settings.RULE_SHORT_CIRCUIT else None
+    return document_type, findings, arithmetic, verdict
+
+
+def _route_prompt(document_text: str, metadata: dict, document_type: str, findings: list, arithmetic: dict):
+    """
+    Build the forensic prompt with only the shared phases plus the rules for
+    `document_type`, and the rule findings and arithmetic checks as extra evidence.
+    """
+    with stage_seconds.time("prompt"):
+        prompt = build_forgery_prompt(document_text, metadata, document_type, findings, describe_arithmetic(arithmetic))
+    return prompt, get_system_instruction(document_type)
+
+
+def _warm_local_stages() -> dict:
+    started = time.perf_counter()
+    with DocumentContext(warmup_document(), "application/pdf") as ctx:
+        _screen(ctx)
+        document_hashes(ctx)
+    return {"local_stages_seconds": round(time.perf_counter() - started, 4)}
+
+
+async def warm_up_pipeline() -> dict:
+    """
+    Pays every first-use cost up front: the lazily imported libraries,
+    parsing/rules code paths, the OCR worker processes, and the Gemini client
+    and connection pool (plus context caches).
+    """
+    report = {"imports_seconds": await run_blocking(preload_heavy_modules)}
+    report.update(await run_blocking(_warm_local_stages))
+    started = time.perf_counter()
+    report["ocr_workers"] = await run_blocking(warm_ocr_pool)
+    report["ocr_pool_seconds"] = round(time.perf_counter() - started, 4)
+    report["gemini"] = await warm_up_client(model_cascade.models())
+    return report
+
+
+async def stop_pipeline():
+    await close_client()
+    if result_cache is not None:
+        await run_blocking(result_cache.flush)
+    shutdown_ocr_pool()
+
+
+async def analyze_content(content, content_type: str, content_hash: str = None,
+                          priority: int = INTERACTIVE) -> ForgeryAnalysis:
+    """
+    Full forensic pipeline for one upload:
+    metadata -> OCR -> perceptual-hash lookup -> rules + arithmetic -> verdict reuse -> prompt -> Gemini -> parse -> hard-stop override -> confidence check.
+
+    Repeat uploads of the same bytes are answered from the result cache without
+    touching OCR or Gemini. `content` may be bytes or a memoryview from
+    ingest_upload, whose SHA-256 can be passed in to skip re-hashing.
+    `priority` orders the Gemini call in the quota scheduler (BATCH for
+    batch and background work). With the model cascade on, the fast model
+    answers first and only ambiguous answers reach the primary model; the
+    result's decision_tier says which tier decided it.
+
+    near_duplicates lists the closest documents analysed before (perceptual
+    hashes of the rendered pages) with their verdicts; once the rules have
+    run, a re-encoded copy of one of them reuses its verdict without Gemini
+    (see PerceptualIndex.reusable).
+
+    Identical uploads analysed concurrently (double submits, client retries,
+    duplicates within a batch or the job queue) share one run: the first does
+    the work and the others await its result (see singleflight_service).
+    """
+    cache_key, cached = await _lookup_cache(content, content_hash)
+    if cached is not None:
+        return cached
+    if analysis_flights is None:
+        return await _analyze(content, content_type, cache_key, priority)
+    return await analysis_flights.do(cache_key, lambda: _analyze(content, content_type, cache_key, priority))
+
+
+async def _analyze(content, content_type: str, cache_key: str, priority: int) -> ForgeryAnalysis:
+    queued = time.perf_counter()
+    async with _analysis_slots:
+        stage_seconds.observe("queue", value=time.perf_counter() - queued)
+        # 1. Gather Metadata and OCR text from a single parse (off the event loop)
+        with DocumentContext(content, content_type) as ctx:
+            metadata = await run_blocking(_timed, "metadata", lambda: ctx.metadata)
+            document_text = await run_blocking(_timed, "ocr", lambda: ctx.text)
+
+            # Look the rendered pages up in the perceptual-hash index
+            hashes, neighbours = await run_blocking(_timed, "phash", _match, ctx)
+
+            # 2. Pre-classify, run the rule engine and the arithmetic verifier;
+            # conclusive evidence skips Gemini
+            document_type, findings, arithmetic, verdict = await run_blocking(_screen, ctx, neighbours)
+            if verdict is not None:
+                overrides_total.inc("rules", verdict.final_classification)
+                return await _complete(verdict, document_type, cache_key, TIER_RULES, hashes, neighbours)
+
+            # A re-encoded copy of an analysed document reuses its verdict
+            reused = await run_blocking(_reuse, hashes, neighbours, findings)
+            if reused is not None:
+                return await _complete(reused, document_type, cache_key, TIER_NEAR_DUPLICATE, neighbours=neighbours)
+
+            # Oriented, downscaled image for Gemini (PDFs pass through untouched)
+            payload, payload_type, payload_report = await run_blocking(_timed, "payload", lambda: ctx.llm_payload)
+            page_count = await run_blocking(lambda: ctx.page_count)
+
+        prompt, system_instruction = _route_prompt(document_text, metadata, document_type, findings, arithmetic)
+
+        # 3. Call Gemini through the async client, down the model cascade until
+        # an answer is unambiguous (or the primary model has answered)
+        for tier, model in model_cascade.tiers():
+            started = time.perf_counter()
+            with stage_seconds.time("llm"):
+                raw_llm_response = await call_gemini_forensics_async(
+                    prompt, payload, payload_type, system_instruction=system_instruction,
+                    priority=priority, pages=page_count, model=model
+                )
+            _log_payload(payload_report, time.perf_counter() - started)
+
+            analysis_obj = _apply_discipline(raw_llm_response, document_text)
+            if _escalation_reason(analysis_obj, tier) is None:
+                break
+
+    return await _complete(analysis_obj, document_type, cache_key, tier, hashes, neighbours)
+
+
+async def analyze_content_events(content, content_type: str, content_hash: str = None):
+    """
+    Same pipeline as analyze_content, as an async generator of (event, data)
+    pairs emitted as each stage completes. The last event is always "result"
+    carrying the final ForgeryAnalysis. A stream for an upload already being
+    analysed emits "coalesced" and then that analysis' result.
+    """
+    cache_key, cached = await _lookup_cache(content, content_hash)
+    if cached is not None:
+        yield "cache_hit", {}
+        yield "result", cached
+        return
+    if analysis_flights is None:
+        async for event, data in _analysis_events(content, content_type, cache_key):
+            yield event, data
+        return
+
+    joined = await analysis_flights.wait(cache_key)
+    if joined is not None:
+        yield "coalesced", {}
+        yield "result", joined
+        return
+    with analysis_flights.lead(cache_key) as flight:
+        async for event, data in _analysis_events(content, content_type, cache_key):
+            if event == "result":
+                flight.land(data)
+            yield event, data
+
+
+async def _analysis_events(content, content_type: str, cache_key: str):
+    queued = time.perf_counter()
+    async with _analysis_slots:
+        stage_seconds.observe("queue", value=time.perf_counter() - queued)
+        with DocumentContext(content, content_type) as ctx:
+            metadata = await run_blocking(_timed, "metadata", lambda: ctx.metadata)
+            yield "metadata", {"metadata": metadata}
+
+            document_text = await run_blocking(_timed, "ocr", lambda: ctx.text)
+            page_count = await run_blocking(lambda: ctx.page_count)
+            page_timings = [
+                {key: page[key] for key in ("page", "method", "seconds")}
+                for page in ctx.page_texts
+            ]
+            yield "ocr", {"page_count": page_count, "characters": len(document_text), "pages": page_timings}
+
+            hashes, neighbours = await run_blocking(_timed, "phash", _match, ctx)
+
+            document_type, findings, arithmetic, verdict = await run_blocking(_screen, ctx, neighbours)
+            yield "rules", {"findings": findings, "arithmetic": arithmetic, "short_circuit": verdict is not None}
+            if verdict is not None:
+                overrides_total.inc("rules", verdict.final_classification)
+                yield "override", {
+                    "classification": verdict.final_classification,
+                    "summary": verdict.summary
+                }
+                yield "result", await _complete(verdict, document_type, cache_key, TIER_RULES, hashes, neighbours)
+                return
+
+            reused = await run_blocking(_reuse, hashes, neighbours, findings)
+            if neighbours is not None:
+                yield "near_duplicates", {"neighbours": public_neighbours(neighbours), "reused": reused is not None}
+            if reused is not None:
+                yield "result", await _complete(reused, document_type, cache_key, TIER_NEAR_DUPLICATE,
+                                                neighbours=neighbours)
+                return
+
+            payload, payload_type, payload_report = await run_blocking(_timed, "payload", lambda: ctx.llm_payload)
+
+        prompt, system_instruction = _route_prompt(document_text, metadata, document_type, findings, arithmetic)
+        for tier, model in model_cascade.tiers():
+            yield "llm_started", {
+                "model": model,
+                "tier": tier,
+                "document_type": DOCUMENT_TYPE_LABELS.get(document_type, "Unknown"),
+                "payload": payload_report
+            }
+
+            decoder = StreamingAnalysisDecoder()
+            started = time.perf_counter()
+            async for chunk in stream_gemini_forensics_async(
+                prompt, payload, payload_type, system_instruction=system_instruction, pages=page_count, model=model
+            ):
+                yield "llm_partial", {"text": chunk}
+                for field, value in decoder.feed(chunk):
+                    yield "llm_field", {"field": field, "value": value}
+            llm_seconds = time.perf_counter() - started
+            stage_seconds.observe("llm", value=llm_seconds)
+            _log_payload(payload_report, llm_seconds)
+
+            analysis_obj = _apply_discipline(decoder.text, document_text)
+            reason = _escalation_reason(analysis_obj, tier)
+            if reason is None:
+                break
+            # The next llm_started restarts llm_partial/llm_field with the stronger model's answer
+            yield "llm_escalated", {
+                "reason": reason,
+                "classification": analysis_obj.final_classification,
+                "confidence": analysis_obj.final_confidence
+            }
+
+    if analysis_obj.summary.startswith(HARD_STOP_MARKER):
+        yield "override", {
+            "classification": analysis_obj.final_classification,
+            "summary": analysis_obj.summary
+        }
+
+    yield "result", await _complete(analysis_obj, document_type, cache_key, tier, hashes, neighbours)
@@ -1,5 +1,26 @@
-def build_forgery_prompt(document_text: str, metadata: dict) -> str:
-    return f"""
+import hashlib
+
+BANK_STATEMENT = "bank_statement"
+IDENTITY = "identity"
+PAYSLIP = "payslip"
+INVOICE = "invoice"
+UNKNOWN = "unknown"
+DOCUMENT_TYPES = (BANK_STATEMENT, IDENTITY, PAYSLIP, INVOICE, UNKNOWN)
+
+DOCUMENT_TYPE_LABELS = {
+    BANK_STATEMENT: "Bank Statement",
+    IDENTITY: "Identity Document",
+    PAYSLIP: "Payslip",
+    INVOICE: "Invoice",
+}
+
+# Static forensic rules. They never change between requests, so they are built
+# once at import time and sent as the system instruction (or a cached-content
+# handle, see llm_service) instead of being re-rendered into every prompt.
+#
+# Lines between "##[type, ...]" and "##[end]" only apply to those document
+# types; everything else is shared. UNKNOWN documents get every section.
+_FORENSIC_RULES_TEMPLATE = """
 You are a Senior Forensic Document Examiner specializing in digital forgery detection.
 Your mission: Identify INTENTIONAL digital tampering while minimizing false positives from natural artifacts.
 
@@ -173,6 +194,7 @@ F. TEXT CORRUPTION (Critical for forgery detection - APPLIES TO ALL DOCUMENTS):
 PHASE 2.5: DOCUMENT-SPECIFIC VISUAL ARTIFACTS - ENHANCED FOR IDENTITY DOCS
 ================================================================================
 
+##[identity]
 FOR IDENTITY DOCUMENTS (PAN, Aadhaar, Passport, Voter ID, Driver License, etc.):
 
 REDACTION & TAMPERING DETECTION (NEW - CRITICAL):
@@ -215,6 +237,7 @@ PHOTO TAMPERING DETECTION:
 - Validity dates: Dates appear layered on top, have different font/color than other fields, or are scribbled over
 - ID number field: Digits appear pasted, have hard edges, are obscured with marks, or scribbled over
 
+##[end]
 FOR BANK STATEMENTS, INVOICES, RECEIPTS, AND ALL DOCUMENTS:
 
 REDACTION & TAMPERING DETECTION (APPLIES TO ALL):
@@ -271,6 +294,7 @@ EXECUTION PRIORITY FOR ALL DOCUMENTS:
 3. Complete Phase 4 (Metadata Analysis) FULLY
 4. Only THEN proceed to Phase 5 (Convergence)
 
+##[bank_statement]
 For bank statements specifically:
 - D.1: Arithmetic MUST be checked for MULTIPLE transactions
 - D.2: Institutional contradiction MUST be checked (header vs footer bank)
@@ -279,6 +303,8 @@ For bank statements specifically:
 
 DO NOT SKIP ANY OF THESE CHECKS FOR ANY REASON
 
+##[end]
+##[identity]
 ABSOLUTE IDENTITY RULE (NON-NEGOTIABLE):
 
 For GOVERNMENT IDENTITY DOCUMENTS:
@@ -288,6 +314,7 @@ Identity numbers are machine-issued, checksum-bound, and immutable.
 They CANNOT be partially correct, truncated, extended, or misordered.
 No tolerance, no rounding, no OCR excuse applies.
 
+##[end]
 Analyze document content for structural and logical errors:
 
 A. FORMAT VIOLATIONS (ALL DOCUMENTS):
@@ -304,6 +331,7 @@ B. CONTENT LOGIC ERRORS (ALL DOCUMENTS):
 
 C. DOCUMENT-SPECIFIC VALIDATION:
 
+##[identity]
    ===== DRIVING LICENSE RULES (INDIA) =====
    
    C.1 DRIVING LICENSE FORMAT VALIDATION:
@@ -366,6 +394,8 @@ C. DOCUMENT-SPECIFIC VALIDATION:
    - Date logic: Issue date before expiry date
    - Field integrity: NO redactions, scribbles, or marks on critical identity fields
    
+##[end]
+##[bank_statement]
    ===== BANK STATEMENT RULES =====
    D.1 BALANCE ARITHMETIC VALIDATION (Impossible Physics - High Severity - CRITICAL):
    
@@ -514,15 +544,21 @@ Previous Balance + Credit − Debit ≠ New Balance
 If you cannot show the exact failed equation,
 you MUST conclude that NO balance inconsistency exists.
 
+##[end]
 CRITICAL:
 Logical errors ALONE do not confirm forgery
 — EXCEPT where explicitly overridden (e.g., Phase 3.5 Identity, Phase 3.6 Payslips).
 
 Combine with visual evidence for higher confidence.
 
+##[bank_statement, payslip, invoice]
 CRITICAL FOR FINANCIAL DOCUMENTS: Minor numeric discrepancies (rounding, formatting variations, OCR errors) are NOT logical errors that support SUSPICIOUS or FORGED classification. Only mathematical impossibilities or severe discrepancies (>5%) count as logical errors requiring convergent evidence.
+##[end]
 
+##[bank_statement]
 CRITICAL FOR BANK STATEMENTS: The three fraud detection rules above (D.1, D.2, D.3, D.4) are TIER 1 CRITICAL errors and ARE sufficient alone to trigger FORGED classification if convergent (multiple rules triggered).
+##[end]
+##[identity]
 ================================================================================
 PHASE 3.5: ABSOLUTE IDENTITY FORMAT ENFORCEMENT (CRITICAL)
 ================================================================================
@@ -656,6 +692,8 @@ classification MUST be FORGED with ≥95% confidence.
 If an identity document has ANY redaction marks, scribbles, or obscuration on critical fields,
 classification MUST be FORGED with ≥95% confidence.
 
+##[end]
+##[payslip]
 ================================================================================
 PHASE 3.6: PAYSLIP LOGICAL FORENSICS (TIER 1 CRITICAL)
 ================================================================================
@@ -742,10 +780,11 @@ classification MUST be FORGED with ≥95% confidence.
 If earnings components differ by naming,
 use ALL numeric rows under "Earnings" section regardless of label.
 
+##[end]
 ================================================================================
 PHASE 4: METADATA FORENSICS
 ================================================================================
-Metadata: {metadata}
+Metadata: provided per document in the "DOCUMENT METADATA" block that accompanies it.
 
 CRITICAL RULE 4.1: PDF METADATA UNRELIABILITY FOR FINANCIAL DOCUMENTS
 For bank statements, invoices, receipts, and scanned financial documents:
@@ -821,6 +860,7 @@ Validate visual evidence:
    - Confirm marks are on top of printed text (indicate tampering)
    - DO NOT confuse security features with redaction marks
 
+##[bank_statement]
 3. VALIDATE D.1 ERRORS (Balance Arithmetic):
    - Manually verify: Previous Balance + Credit - Debit = Reported New Balance
    - If formula works for ALL checked transactions = NO D.1 error
@@ -831,6 +871,8 @@ Validate visual evidence:
    - Always apply tolerance: ±₹1.00 = normal, >±₹5.00 = error
    - If summary reconciliation passes (variance ≤±₹1.00), DO NOT report D.3 error
 
+##[end]
+##[identity]
 5. VALIDATE IDENTITY FIELD INTEGRITY (For identity documents):
    - Check if name field is completely readable (no redactions/scribbles)
    - Check if ID numbers are fully visible (no obscuration)
@@ -843,16 +885,19 @@ Validate visual evidence:
    - If Validity(NT) appears after Validity(TR) = FORGED
    - If Issue Date appears after both validity dates = FORGED
 
+##[end]
 STEP 3: CONVERGENT EVIDENCE SYNTHESIS
 - Single rule failing (one indicator) = May be false positive, requires manual review
 - Two rules failing (multiple indicators) = Stronger evidence of forgery
 - Three+ rules failing (visual + logical + metadata) = FORGED with 95%+ confidence
 
+##[identity]
 SPECIAL CONVERGENCE RULE FOR IDENTITY DOCUMENTS:
 - Redaction marks on name/ID field (Visual Phase 2) = AUTOMATIC FORGED (95%+)
 - NO CONVERGENCE REQUIRED for redaction/scribbling on critical fields
 - Redaction is DEFINITIVE evidence of tampering on identity documents
 
+##[end]
 CRITICAL CONSISTENCY RULE:
 - If document shows PERFECT reconciliation + correct identity format + no text corruption + no visual overlays
 - THEN classify as ORIGINAL regardless of other observations
@@ -920,36 +965,40 @@ CLASSIFICATION RULES:
 ================================================================================
 PHASE 6: FINAL DECISION & OUTPUT
 ================================================================================
+##[payslip]
 PAYSLIP OVERRIDE:
 Phase 3.6 arithmetic violations override all visual and metadata observations.
 
+##[end]
+##[identity]
 IDENTITY DOCUMENT REDACTION OVERRIDE:
 If ANY identity document has redaction marks, scribbles, or pen marks on critical fields,
 MUST classify as FORGED with ≥95% confidence.
 NO convergence required for redaction.
 
+##[end]
 CRITICAL - OUTPUT FORMAT IS JSON ONLY. NO OTHER TEXT BEFORE OR AFTER JSON.
 
 YOU MUST OUTPUT ONLY THE JSON STRUCTURE BELOW WITH NO ADDITIONAL TEXT, PREAMBLE, OR COMMENTARY.
 
 Strictly output ONLY valid JSON:
 
-{{
+{
   "classification": "ORIGINAL | SUSPICIOUS | FORGED",
   "confidence": <0-100>,
   "document_type": "Bank Statement | Identity Document | Driving License | Aadhaar Card | Invoice | Payslip | Other",
   "visual_evidence": [
-    {{"type": "artifact_category", "description": "specific observation", "severity": "high|medium|low"}}
+    {"type": "artifact_category", "description": "specific observation", "severity": "high|medium|low"}
   ],
   "logical_evidence": [
-    {{"type": "error_type", "description": "specific logical issue", "severity": "high|medium|low", "tier": "TIER 1|TIER 2|TIER 3"}}
+    {"type": "error_type", "description": "specific logical issue", "severity": "high|medium|low", "tier": "TIER 1|TIER 2|TIER 3"}
   ],
   "metadata_evidence": [
-    {{"type": "metadata_issue", "description": "specific finding", "severity": "high|medium|low"}}
+    {"type": "metadata_issue", "description": "specific finding", "severity": "high|medium|low"}
   ],
   "summary": "2-3 sentence executive summary explaining the classification",
   "reasoning": "Detailed explanation of how phases contributed to final decision"
-}}
+}
 
 ================================================================================
 EXECUTION CHECKLIST
@@ -959,6 +1008,7 @@ Before outputting JSON:
 [ ] For identity documents: Did I check for redaction marks or scribbles on name/ID fields?
 [ ] Did I detect text corruption in headers/footers?
 [ ] Did I apply document-type specific validation rules?
+##[identity]
 [ ] FOR IDENTITY DOCS: Did I validate ID format (PAN=10 chars, Driving License state code, etc.)?
 [ ] FOR DRIVING LICENSE: Did I verify state code validity (MH, DL, KA, TN, etc.)?
 [ ] FOR DRIVING LICENSE: Did I check date order (Issue < NT Validity < TR Validity)?
@@ -967,9 +1017,12 @@ Before outputting JSON:
 [ ] FOR AADHAAR: Did I check if name field is completely visible and readable?
 [ ] FOR IDENTITY DOCS: Did I check for redaction marks, scribbles, or pen marks on critical fields?
 [ ] FOR IDENTITY DOCS: Did I check for photo tampering/uniform backgrounds/scribbles?
+##[end]
+##[bank_statement]
 [ ] FOR BANK STATEMENTS: Did I validate balance arithmetic (Rule D.1)?
 [ ] FOR BANK STATEMENTS: Did I verify bank identity consistency (Rule D.2)?
 [ ] FOR BANK STATEMENTS: Did I apply D.3 tolerance correctly (≤±₹1.00 = normal)?
+##[end]
 [ ] Did I perform BOTH visual and logical analysis independently?
 [ ] Did I apply convergence validation before classification?
 [ ] Is my classification supported by multiple evidence types?
@@ -977,18 +1030,24 @@ Before outputting JSON:
 [ ] Did I check for text corruption in ALL official headers/footers?
 [ ] Did I check for spelling errors in auto-generated sections?
 [ ] Did I check for character duplication or unusual spacing in official text?
+##[bank_statement]
 [ ] For bank statements: Did I verify bank IFSC code matches stated bank?
 [ ] For bank statements: Did I verify bank MICR code matches stated bank?
 [ ] For bank statements: Did I verify registered office belongs to stated bank?
 [ ] For bank statements: Did I check for institutional contradiction (header vs footer)?
 [ ] Did I check if footer/disclaimers reference same bank as header?
 [ ] Did I check customer service numbers match the stated bank?
+##[end]
 [ ] Did I check for ANY redaction/scribbling on ANY critical fields?
 [ ] Did I check for visual overlays, marks, or scribbles on ANY document area?
+##[bank_statement]
 [ ] Did I verify arithmetic for at least 5 transactions (not just opening/closing)?
 [ ] Did I explicitly show which transaction(s) fail the arithmetic formula?
+##[end]
 [ ] Did I converge text corruption + visual evidence properly?
+##[bank_statement]
 [ ] Did I apply D.2 institutional contradiction check?
+##[end]
 Remember: 
 - Redaction/scribbling on identity fields = AUTOMATIC FORGED (95%+)
 - Text corruption = HIGH severity indicator of document tampering
@@ -996,6 +1055,7 @@ Remember:
 - One indicator alone may be false positive - require convergence (except redaction/scribbling)
 - ALWAYS perform logical analysis even if visual tampering detected
 
+##[identity]
 DRIVING LICENSE CRITICAL: 
 - Validity dates in wrong order = IMMEDIATE FORGED (95%+ confidence)
 - Invalid state code = IMMEDIATE FORGED (95%+ confidence)
@@ -1003,4 +1063,83 @@ DRIVING LICENSE CRITICAL:
 
 AADHAAR CRITICAL:
 - Name field obscured/redacted/scribbled = IMMEDIATE FORGED (95%+ confidence)
+##[end]
 """
+
+
+def _compile_instruction(template: str, document_type: str) -> str:
+    """
+    Keeps the shared lines plus the sections tagged for `document_type`.
+    """
+    kept = []
+    section_types = None
+    for line in template.split("\n"):
+        if line.startswith("##[end]"):
+            section_types = None
+        elif line.startswith("##["):
+            section_types = {t.strip() for t in line[3:line.index("]")].split(",")}
+        elif section_types is None or document_type == UNKNOWN or document_type in section_types:
+            kept.append(line)
+    return "\n".join(kept)
+
+
+SYSTEM_INSTRUCTIONS = {
+    document_type: _compile_instruction(_FORENSIC_RULES_TEMPLATE, document_type)
+    for document_type in DOCUMENT_TYPES
+}
+FORENSIC_SYSTEM_INSTRUCTION = SYSTEM_INSTRUCTIONS[UNKNOWN]
+
+
+def get_system_instruction(document_type: str = UNKNOWN) -> str:
+    return SYSTEM_INSTRUCTIONS.get(document_type, FORENSIC_SYSTEM_INSTRUCTION)
+
+
+def build_forgery_prompt(document_text: str, metadata: dict, document_type: str = UNKNOWN,
+                         rule_findings: list = None, arithmetic_checks: list = None) -> str:
+    """
+    Per-request part of the prompt: the Phase 4 metadata block, plus any
+    non-conclusive findings of the local rule engine and the results of the
+    local arithmetic verification.
+    The rules themselves travel as the system instruction for `document_type`.
+    """
+    type_hint = ""
+    if document_type in DOCUMENT_TYPE_LABELS:
+        type_hint = (
+            f"\nPRE-CLASSIFIED DOCUMENT TYPE: {DOCUMENT_TYPE_LABELS[document_type]} "
+            "(your instructions contain only the rules for this type).\n"
+        )
+    findings_block = ""
+    if rule_findings:
+        lines = "\n".join(f"- {f['reason']} (rule {f['rule']}, confidence {f['confidence']})" for f in rule_findings)
+        findings_block = (
+            "\nPRE-SCREEN FINDINGS (deterministic local checks; verify each against the document):\n"
+            f"{lines}\n"
+        )
+    if arithmetic_checks:
+        lines = "\n".join(f"- {line}" for line in arithmetic_checks)
+        findings_block += (
+            "\nLOCAL ARITHMETIC VERIFICATION (every row recomputed exactly; use these results "
+            "for Rules D.1 / D.3 and Phase 3.6 instead of recomputing by hand):\n"
+            f"{lines}\n"
+        )
+    return f"""{type_hint}
+DOCUMENT METADATA (input for PHASE 4: METADATA FORENSICS):
+{metadata}
+{findings_block}
+Examine the attached document following every phase of your instructions and return the JSON verdict.
+"""
+
+
+def build_full_prompt(document_text: str, metadata: dict, document_type: str = UNKNOWN) -> str:
+    """
+    Rules and per-request block in a single string, for clients that cannot
+    take a system instruction.
+    """
+    return get_system_instruction(document_type) + build_forgery_prompt(document_text, metadata, document_type)
+
+
+# Fingerprint of the rules above. Cached results are keyed on it, so editing
+# the prompt automatically invalidates every stored analysis.
+PROMPT_TEMPLATE_HASH = hashlib.sha256(
+    "".join(build_full_prompt("", {}, t) for t in DOCUMENT_TYPES).encode("utf-8")
+).hexdigest()
@@ -0,0 +1,255 @@
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from config import settings
+
+# Admission priorities: lower goes first
+INTERACTIVE = 0
+BATCH = 1
+
+# Gemini bills every image (and every PDF page) as a flat block of input tokens
+TOKENS_PER_PAGE = 258
+
+
+def estimate_tokens(prompt: str, system_instruction: str = None, pages: int = 1) -> int:
+    """
+    Expected token cost of one call: ~4 characters per text token, a flat
+    TOKENS_PER_PAGE per page or image, plus the expected answer length.
+    A cached system instruction still counts towards TPM, so it is included.
+    """
+    text = len(prompt) + len(system_instruction or "")
+    return text // 4 + TOKENS_PER_PAGE * max(1, pages or 1) + settings.GEMINI_EXPECTED_OUTPUT_TOKENS
+
+
+class MemoryBucketStore:
+    """
+    Token buckets for this process only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # name -> (tokens, updated)
+
+    def take(self, requests: list) -> float:
+        """
+        `requests` is [(name, capacity, refill per second, amount)]. Takes all
+        amounts atomically and returns 0, or takes nothing and returns the
+        seconds until every bucket could cover its amount.
+        """
+        with self._lock:
+            now = time.monotonic()
+            levels = {}
+            wait = 0.0
+            for name, capacity, rate, amount in requests:
+                tokens, updated = self._buckets.get(name, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                levels[name] = tokens
+                if tokens < amount:
+                    wait = max(wait, (amount - tokens) / rate)
+            if wait == 0.0:
+                for name, capacity, rate, amount in requests:
+                    levels[name] -= amount
+            for name in levels:
+                self._buckets[name] = (levels[name], now)
+            return wait
+
+    def adjust(self, name: str, capacity: float, rate: float, delta: float, drain: bool = False):
+        """
+        Adds `delta` tokens (negative to charge more), or empties the bucket.
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(name, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            self._buckets[name] = (0.0 if drain else min(capacity, tokens + delta), now)
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets shared by every worker process on the host through one
+    SQLite file; BEGIN IMMEDIATE makes each take atomic across processes.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _level(self, name: str, capacity: float, rate: float, now: float) -> float:
+        row = self._db.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return capacity
+        return min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+
+    def _store(self, name: str, tokens: float, now: float):
+        self._db.execute(
+            "INSERT INTO buckets (name, tokens, updated) VALUES (?, ?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+            (name, tokens, now)
+        )
+
+    def take(self, requests: list) -> float:
+        with self._lock:
+            # Wall clock: monotonic clocks are not comparable between processes
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                levels = {name: self._level(name, capacity, rate, now) for name, capacity, rate, _ in requests}
+                wait = max([(amount - levels[name]) / rate for name, _, rate, amount in requests
+                            if levels[name] < amount] or [0.0])
+                for name, _, _, amount in requests:
+                    self._store(name, levels[name] - (amount if wait == 0.0 else 0), now)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return wait
+
+    def adjust(self, name: str, capacity: float, rate: float, delta: float, drain: bool = False):
+        with self._lock:
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                level = self._level(name, capacity, rate, now)
+                self._store(name, 0.0 if drain else min(capacity, level + delta), now)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+
+class QuotaScheduler:
+    """
+    Admits Gemini calls through a requests-per-minute and a tokens-per-minute
+    bucket. Calls that do not fit wait in a priority queue (INTERACTIVE before
+    BATCH, FIFO within a priority); only the head of the queue may take
+    tokens, so a large document is not starved by a stream of small ones.
+
+    A limit of 0 disables that bucket. Gemini enforces its limits over a
+    rolling `window` (a minute); each bucket holds `burst_seconds` worth of
+    quota and refills slightly below the limit, so that burst plus refill
+    never exceeds the limit within any window.
+    """
+
+    def __init__(self, rpm: int, tpm: int, burst_seconds: float, store=None, window: float = 60.0):
+        self.store = store or MemoryBucketStore()
+        self.window = window
+        self._buckets = []
+        for name, limit in (("requests", rpm), ("tokens", tpm)):
+            if limit > 0:
+                capacity = max(1.0, limit * min(burst_seconds, window) / window)
+                rate = max(limit - capacity, 1.0) / window
+                self._buckets.append((name, capacity, rate))
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._changed = None
+        self.stats = {"admitted": 0, "queued": 0, "wait_seconds": 0.0, "throttled": 0,
+                      "estimated_tokens": 0, "actual_tokens": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._buckets)
+
+    def _wake(self):
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def _sleep(self, timeout):
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _take(self, tokens: int) -> float:
+        requests = []
+        for name, capacity, rate in self._buckets:
+            # A call larger than the whole bucket would never fit; let it drain the bucket instead
+            amount = 1 if name == "requests" else min(tokens, capacity)
+            requests.append((name, capacity, rate, amount))
+        return self.store.take(requests)
+
+    async def acquire(self, tokens: int, priority: int = INTERACTIVE):
+        """
+        Waits until the call may go out, then charges its estimated cost.
+        """
+        if not self.enabled:
+            return
+        started = time.monotonic()
+        entry = [priority, next(self._sequence), tokens]
+        heapq.heappush(self._waiting, entry)
+        waited = False
+        try:
+            while True:
+                wait = None
+                if self._waiting[0] is entry:
+                    wait = self._take(tokens)
+                    if wait == 0.0:
+                        heapq.heappop(self._waiting)
+                        break
+                waited = True
+                # Other processes may free tokens without waking us: poll at least once a second
+                await self._sleep(min(wait, 1.0) if wait is not None else None)
+        except BaseException:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+            raise
+        finally:
+            self._wake()
+
+        self.stats["admitted"] += 1
+        self.stats["estimated_tokens"] += tokens
+        if waited:
+            self.stats["queued"] += 1
+            self.stats["wait_seconds"] += time.monotonic() - started
+
+    def settle(self, estimated: int, actual: int):
+        """
+        Corrects the token bucket once usage_metadata tells us the real cost.
+        """
+        if not actual:
+            return
+        self.stats["actual_tokens"] += actual
+        for name, capacity, rate in self._buckets:
+            if name == "tokens":
+                self.store.adjust(name, capacity, rate, estimated - actual)
+        self._wake()
+
+    def throttled(self):
+        """
+        Gemini answered 429 anyway (another client, a lower real quota):
+        empty the buckets so queued calls back off until they refill.
+        """
+        self.stats["throttled"] += 1
+        for name, capacity, rate in self._buckets:
+            self.store.adjust(name, capacity, rate, 0.0, drain=True)
+
+    def snapshot(self) -> dict:
+        waiting = [entry[0] for entry in self._waiting]
+        return {
+            "enabled": self.enabled,
+            "limits": {name: round(capacity + rate * self.window) for name, capacity, rate in self._buckets},
+            "waiting": {"interactive": waiting.count(INTERACTIVE), "batch": waiting.count(BATCH)},
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()},
+        }
+
+
+gemini_quota = QuotaScheduler(
+    rpm=settings.GEMINI_RPM,
+    tpm=settings.GEMINI_TPM,
+    burst_seconds=settings.QUOTA_BURST_SECONDS,
+    store=SQLiteBucketStore(settings.QUOTA_DB_PATH) if settings.QUOTA_DB_PATH else None,
+)
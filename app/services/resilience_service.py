@@ -0,0 +1,294 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# HTTP statuses worth another attempt: timeouts, rate limits and upstream trouble
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Retryable, but a sign of quota backpressure rather than upstream ill health: never trips the breaker
+BACKPRESSURE_STATUS = {429}
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised without calling upstream while the circuit breaker is open.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Gemini is unavailable (circuit open); retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class LLMTimeoutError(TimeoutError):
+    """
+    Every attempt ran past its per-attempt deadline.
+    """
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    # httpx transport failures (connect/read errors) carry no status
+    return type(error).__module__.startswith(("httpx", "httpcore"))
+
+
+def is_backpressure(error: BaseException) -> bool:
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return status in BACKPRESSURE_STATUS
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent successful call latencies.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, q: float):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and fails
+    fast for `reset_seconds`; then lets a single probe through (half-open)
+    and closes again on its success.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.state = CLOSED
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError if the call must not go out.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(max(remaining, 1.0))
+
+    def release(self):
+        """
+        Gives back a half-open probe slot without judging upstream health.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self.state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResiliencePolicy:
+    """
+    Per-attempt deadline, jittered exponential backoff on retryable errors,
+    optional hedged second request after the recent p-th percentile latency,
+    and a circuit breaker shared by every call going through the policy.
+    """
+
+    def __init__(self, timeout: float, max_retries: int, backoff_base: float, backoff_max: float,
+                 hedge: bool, hedge_percentile: float, hedge_min_samples: int, breaker: CircuitBreaker):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker
+        self.latency = LatencyTracker()
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                         "timeouts": 0, "failures": 0, "throttled": 0, "rejected": 0}
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter": spreads retries out so clients do not retry in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def hedge_delay(self):
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    async def call(self, make_call, before_attempt=None):
+        """
+        Awaits `make_call()` (a coroutine factory) under the policy.
+        `before_attempt()` is awaited ahead of every attempt, hedges included,
+        outside the deadline (e.g. waiting for quota).
+        """
+        self.counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self.counters["rejected"] += 1
+                raise
+            try:
+                result = await self._hedged(make_call, before_attempt)
+            except asyncio.CancelledError:
+                self.breaker.release()  # our cancellation says nothing about upstream health
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # Upstream answered (e.g. 400 for a bad request): it is healthy, the call is not
+                    self.breaker.record_success()
+                    raise
+                self._record_retryable(e)
+                if attempt == self.max_retries:
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise LLMTimeoutError(
+                            f"Gemini did not answer within {self.timeout:.0f}s ({attempt + 1} attempts)"
+                        ) from e
+                    raise
+                self.counters["retries"] += 1
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def call_sync(self, make_call):
+        """
+        Blocking variant of `call` for the sync client: retries, backoff and
+        the breaker apply; the deadline is the client's own HTTP timeout.
+        """
+        self.counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self.counters["rejected"] += 1
+                raise
+            started = time.perf_counter()
+            self.counters["attempts"] += 1
+            try:
+                result = make_call()
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()
+                    raise
+                self._record_retryable(e)
+                if attempt == self.max_retries:
+                    raise
+                self.counters["retries"] += 1
+                time.sleep(self.backoff(attempt))
+                continue
+            self.breaker.record_success()
+            self.latency.record(time.perf_counter() - started)
+            return result
+
+    def _record_retryable(self, error: BaseException):
+        if is_backpressure(error):
+            # Out of quota: upstream is up and answering, so back off without opening the circuit
+            self.breaker.release()
+            self.counters["throttled"] += 1
+        else:
+            self.breaker.record_failure()
+            self.counters["failures"] += 1
+
+    async def _attempt(self, make_call, before_attempt=None):
+        if before_attempt is not None:
+            await before_attempt()
+        self.counters["attempts"] += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(make_call(), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise
+        self.latency.record(time.perf_counter() - started)
+        return result
+
+    async def _hedged(self, make_call, before_attempt):
+        delay = self.hedge_delay()
+        # Admission first, so time spent queueing never triggers a hedge
+        if before_attempt is not None:
+            await before_attempt()
+        primary = asyncio.ensure_future(self._attempt(make_call))
+        if delay is None:
+            return await primary
+
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                # Straggler: race a second request against it, first answer wins
+                self.counters["hedges"] += 1
+                tasks.add(asyncio.ensure_future(self._attempt(make_call, before_attempt)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def snapshot(self) -> dict:
+        percentiles = {f"p{q}": self.latency.percentile(q) for q in (50, 95, 99)}
+        return {
+            "circuit": self.breaker.state,
+            "latency_seconds": {name: round(value, 3) if value is not None else None
+                                for name, value in percentiles.items()},
+            "hedge_delay_seconds": self.hedge_delay(),
+            **self.counters,
+        }
+
+
+gemini_resilience = ResiliencePolicy(
+    timeout=settings.GEMINI_TIMEOUT_SECONDS,
+    max_retries=settings.GEMINI_MAX_RETRIES,
+    backoff_base=settings.GEMINI_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.GEMINI_BACKOFF_MAX_SECONDS,
+    hedge=settings.GEMINI_HEDGE,
+    hedge_percentile=settings.GEMINI_HEDGE_PERCENTILE,
+    hedge_min_samples=settings.GEMINI_HEDGE_MIN_SAMPLES,
+    breaker=CircuitBreaker(settings.GEMINI_BREAKER_FAILURES, settings.GEMINI_BREAKER_RESET_SECONDS),
+)
@@ -0,0 +1,182 @@
+import re
+from functools import lru_cache
+from app.services.prompt_service import BANK_STATEMENT, PAYSLIP, INVOICE
+from config import settings
+
+# Rules that apply whatever the pre-classifier decided
+ANY_TYPE = "*"
+
+
+class Rule:
+    """
+    A deterministic forgery check.
+
+    The rule fires when every pattern in `all_of` occurs in the text, none of
+    `none_of` does, and `metadata_check` (if given) returns True for the
+    document metadata. Patterns are plain regexes; use scoped flags such as
+    "(?i:april)" for case-insensitive parts. `category` says what kind of
+    evidence a finding is ("date", "format", "metadata"; arithmetic findings
+    are "math").
+    """
+
+    def __init__(self, name: str, reason: str, confidence: int, document_types=(ANY_TYPE,),
+                 all_of=(), none_of=(), metadata_check=None, category: str = "logic"):
+        self.name = name
+        self.reason = reason
+        self.confidence = confidence
+        self.category = category
+        self.document_types = tuple(document_types)
+        self.all_of = tuple(all_of)
+        self.none_of = tuple(none_of)
+        self.metadata_check = metadata_check
+
+    def applies_to(self, document_type: str) -> bool:
+        return ANY_TYPE in self.document_types or document_type in self.document_types
+
+    def fires(self, seen: set, metadata: dict) -> bool:
+        if not all(pattern in seen for pattern in self.all_of):
+            return False
+        if any(pattern in seen for pattern in self.none_of):
+            return False
+        if self.metadata_check is not None:
+            return bool(metadata) and bool(self.metadata_check(metadata))
+        return True
+
+    def finding(self) -> dict:
+        return {"rule": self.name, "reason": self.reason, "confidence": self.confidence, "category": self.category}
+
+
+class RuleEngine:
+    """
+    Registry of rules, evaluated over OCR text and metadata before the LLM.
+
+    Every distinct pattern across all rules becomes one named group of a
+    single alternation, so a document is scanned in one left-to-right pass
+    however many rules are registered.
+    """
+
+    def __init__(self):
+        self._rules = []
+        self._groups = {}
+
+    def register(self, rule: Rule) -> Rule:
+        self._rules.append(rule)
+        for pattern in rule.all_of + rule.none_of:
+            if pattern not in self._groups:
+                self._groups[pattern] = f"p{len(self._groups)}"
+        self._scanner.cache_clear()
+        return rule
+
+    @property
+    def rules(self) -> list:
+        return list(self._rules)
+
+    @lru_cache(maxsize=256)
+    def _scanner(self, patterns: frozenset):
+        parts = [f"(?P<{self._groups[p]}>{p})" for p in sorted(patterns, key=self._groups.get)]
+        return re.compile("|".join(parts)), {self._groups[p]: p for p in patterns}
+
+    def scan(self, text: str, patterns) -> set:
+        """
+        Returns the subset of `patterns` (all registered by some rule) that
+        occur anywhere in `text`.
+
+        An alternation reports only one group per position, so once a pattern
+        has been seen the scanner is rebuilt without it and resumes at that
+        match's start: patterns sharing a position are still found, and the
+        text is still read once.
+        """
+        pending = frozenset(pattern for pattern in patterns if pattern in self._groups)
+        seen = set()
+        position = 0
+        while pending and text:
+            scanner, names = self._scanner(pending)
+            match = scanner.search(text, position)
+            if match is None:
+                break
+            pattern = names[match.lastgroup]
+            seen.add(pattern)
+            pending = pending - {pattern}
+            position = match.start()
+        return seen
+
+    def evaluate(self, text: str, metadata: dict = None, document_type: str = ANY_TYPE) -> list:
+        """
+        Findings of every rule registered for `document_type` that fires, most
+        confident first. With the default type only type-independent rules run.
+        """
+        rules = [rule for rule in self._rules if rule.applies_to(document_type)]
+        patterns = {pattern for rule in rules for pattern in rule.all_of + rule.none_of}
+        seen = self.scan(text or "", patterns)
+        findings = [rule.finding() for rule in rules if rule.fires(seen, metadata)]
+        return sorted(findings, key=lambda finding: finding["confidence"], reverse=True)
+
+
+def conclusive_findings(findings: list, threshold: int = None) -> list:
+    """
+    Findings strong enough to decide the verdict without the LLM.
+    """
+    threshold = settings.RULE_CONCLUSIVE_CONFIDENCE if threshold is None else threshold
+    return [finding for finding in findings if finding["confidence"] >= threshold]
+
+
+rule_engine = RuleEngine()
+register_rule = rule_engine.register
+
+
+# --- Hard-stop rules (formerly inlined in enforce_phase_discipline) ---
+
+# Standard bank systems do not allow future-dated reference strings.
+# Payment date: 02 April 2025. Reference: Johan v Rhyn 24 Mei.
+register_rule(Rule(
+    "april_mei_reference",
+    "Temporal Contradiction: Reference to 'Mei' in an 'April' document.",
+    confidence=99,
+    all_of=(r"(?i:april)|04", r"(?i:mei)|may"),
+    category="date",
+))
+
+# Absa notices always include 'R' before the amount; '3 400.00' has the
+# suspicious space and no Rand symbol.
+register_rule(Rule(
+    "missing_rand_symbol",
+    "Currency Violation: Missing Rand (R) symbol and non-standard amount spacing.",
+    confidence=99,
+    all_of=(r"\d\s\d{3}\.\d{2}",),
+    none_of=("R",),
+    category="format",
+))
+
+
+# --- Metadata rules: evidence for the LLM, not conclusive on their own ---
+
+_EDITOR_PRODUCERS = ("photoshop", "illustrator", "gimp", "canva", "ilovepdf", "smallpdf", "sejda", "pdfescape", "foxit phantom")
+
+
+def _edited_with(metadata: dict) -> bool:
+    tools = " ".join(str(metadata.get(key, "")) for key in ("producer", "creator")).lower()
+    return any(name in tools for name in _EDITOR_PRODUCERS)
+
+
+def _modified_before_created(metadata: dict) -> bool:
+    # PDF dates are "D:YYYYMMDDHHmmSS..."; the fixed-width prefix compares as text
+    created, modified = metadata.get("creationDate") or "", metadata.get("modDate") or ""
+    return len(created) >= 16 and len(modified) >= 16 and modified[:16] < created[:16]
+
+
+register_rule(Rule(
+    "editor_in_pdf_metadata",
+    "Metadata Warning: PDF producer/creator is an editing or online conversion tool.",
+    confidence=70,
+    document_types=(BANK_STATEMENT, PAYSLIP, INVOICE),
+    metadata_check=_edited_with,
+    category="metadata",
+))
+
+register_rule(Rule(
+    "modified_before_created",
+    "Metadata Contradiction: modification date is earlier than the creation date.",
+    confidence=85,
+    metadata_check=_modified_before_created,
+    category="metadata",
+))
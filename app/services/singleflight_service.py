@@ -0,0 +1,103 @@
+import asyncio
+from app.services.metrics_service import flights_total
+from config import settings
+
+
+class FlightAbandonedError(RuntimeError):
+    """
+    The caller doing the work was cancelled before it finished; whoever was
+    waiting on it goes and does the work itself.
+    """
+
+
+class Flight:
+    """
+    Handle held by the caller doing the work for a key; `land` publishes the
+    result to everyone waiting. Leaving the block without landing passes the
+    error on to the waiters, or abandons the flight if the leader was
+    cancelled (or its generator closed).
+    """
+
+    def __init__(self, flights: dict, key: str):
+        self._flights = flights
+        self.key = key
+        self.future = asyncio.get_running_loop().create_future()
+
+    def land(self, result):
+        self.future.set_result(result)
+        return result
+
+    def __enter__(self):
+        self._flights[self.key] = self.future
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._flights.get(self.key) is self.future:
+            del self._flights[self.key]
+        if not self.future.done():
+            if exc is None or isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+                exc = FlightAbandonedError(f"Analysis {self.key[:16]}… was abandoned")
+            self.future.set_exception(exc)
+            # Marks the exception retrieved, so a flight nobody joined is not logged
+            self.future.exception()
+
+
+class SingleFlight:
+    """
+    In-flight request coalescing: the first caller for a key does the work
+    and concurrent callers with the same key await its result instead of
+    repeating it. Nothing is kept once the work finishes (that is the result
+    cache's job). Followers get `copy(result)`, so each caller can mutate
+    its own; errors reach every waiter. Results must not be None.
+
+    The work runs in the leader's own task, on the leader's own input; a
+    cancelled leader hands the work over to the next waiter.
+    """
+
+    def __init__(self, copy=None):
+        self._copy = copy
+        self._flights = {}  # key -> Future of the leader's result
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._flights
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def wait(self, key: str):
+        """
+        Result of the flight for `key` once it lands, or None when nothing is
+        (or is any longer) in flight for it.
+        """
+        while (future := self._flights.get(key)) is not None:
+            try:
+                # Shielded: a follower giving up must not cancel the others' result
+                result = await asyncio.shield(future)
+            except FlightAbandonedError:
+                continue
+            flights_total.inc("follower")
+            return self._copy(result) if self._copy else result
+        return None
+
+    def lead(self, key: str) -> Flight:
+        """
+        `with flights.lead(key) as flight: ... flight.land(result)`, for
+        callers that cannot hand their work over as a coroutine (event
+        streams). Only call it right after `wait(key)` returned None.
+        """
+        flights_total.inc("leader")
+        return Flight(self._flights, key)
+
+    async def do(self, key: str, make_call):
+        """
+        Awaits `make_call()` unless an identical call is already in flight,
+        in which case its result is awaited instead.
+        """
+        result = await self.wait(key)
+        if result is not None:
+            return result
+        with self.lead(key) as flight:
+            return flight.land(await make_call())
+
+
+analysis_flights = SingleFlight(copy=lambda result: result.model_copy(deep=True)) if settings.SINGLE_FLIGHT else None
@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from config import settings
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+# How replay paces its answers: not at all, as the recorded call took, or
+# drawn from every recorded call's latency (the empirical distribution)
+LATENCY_NONE = "none"
+LATENCY_RECORDED = "recorded"
+LATENCY_SAMPLED = "sampled"
+
+_USAGE_FIELDS = ("prompt_token_count", "cached_content_token_count", "candidates_token_count")
+
+
+class RecordingNotFoundError(LookupError):
+    """
+    Replay mode met a request that was never recorded.
+    """
+
+    def __init__(self, fingerprint: str):
+        super().__init__(f"No recorded Gemini response for request {fingerprint[:16]}…; record it first")
+        self.fingerprint = fingerprint
+
+
+def request_fingerprint(document, prompt: str, model: str, config: dict) -> str:
+    """
+    Identifies a Gemini request: document hash, prompt hash, model and the
+    generation config (which carries the system instruction).
+    """
+    key = {
+        "document": hashlib.sha256(document).hexdigest(),
+        "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        "model": model,
+        "config": config,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _usage(response) -> dict:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    return {field: getattr(usage, field, None) or 0 for field in _USAGE_FIELDS}
+
+
+def _replayed(text: str, usage: dict = None) -> SimpleNamespace:
+    # Just the attributes llm_service reads from a GenerateContentResponse
+    return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(**usage) if usage else None)
+
+
+class RecordingStore:
+    """
+    One JSON file per request fingerprint; a later recording of the same
+    request replaces the earlier one. Loaded entries stay in memory, so a
+    replayed load test does not read the disk on every call.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._latencies = None
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.directory, f"{fingerprint}.json")
+
+    def load(self, fingerprint: str) -> dict:
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            try:
+                with open(self._path(fingerprint), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except FileNotFoundError:
+                raise RecordingNotFoundError(fingerprint) from None
+            self._entries[fingerprint] = entry
+        return entry
+
+    def save(self, fingerprint: str, entry: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(fingerprint)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(temporary, path)
+        self._entries[fingerprint] = entry
+        with self._lock:
+            if self._latencies is not None:
+                self._latencies.append(entry["latency_seconds"])
+
+    def latencies(self) -> list:
+        with self._lock:
+            if self._latencies is None:
+                self._latencies = []
+                if os.path.isdir(self.directory):
+                    for name in os.listdir(self.directory):
+                        if name.endswith(".json"):
+                            with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                                self._latencies.append(json.load(f)["latency_seconds"])
+            return list(self._latencies)
+
+
+class LLMTransport:
+    """
+    What actually answers a Gemini request: Gemini itself ("live"), Gemini
+    with every response saved by request fingerprint ("record"), or the saved
+    responses without any network ("replay").
+
+    Callers hand over the live call as a zero-argument factory, so retries,
+    hedging and quota admission in llm_service apply in every mode.
+    """
+
+    def __init__(self, mode: str, store: RecordingStore, replay_latency: str = LATENCY_NONE,
+                 latency_scale: float = 1.0, seed: int = None):
+        if mode not in (LIVE, RECORD, REPLAY):
+            raise ValueError(f"Unknown LLM transport mode: {mode!r}")
+        if replay_latency not in (LATENCY_NONE, LATENCY_RECORDED, LATENCY_SAMPLED):
+            raise ValueError(f"Unknown replay latency mode: {replay_latency!r}")
+        self.mode = mode
+        self.store = store
+        self.replay_latency = replay_latency
+        self.latency_scale = latency_scale
+        self._rng = random.Random(seed)
+        self.counters = {"recorded": 0, "replayed": 0, "missing": 0}
+
+    @property
+    def offline(self) -> bool:
+        return self.mode == REPLAY
+
+    @property
+    def keyed(self) -> bool:
+        """
+        Whether calls need a request fingerprint; live calls skip hashing.
+        """
+        return self.mode != LIVE
+
+    def _replay_entry(self, fingerprint: str) -> dict:
+        try:
+            entry = self.store.load(fingerprint)
+        except RecordingNotFoundError:
+            self.counters["missing"] += 1
+            raise
+        self.counters["replayed"] += 1
+        return entry
+
+    def _delay(self, entry: dict) -> float:
+        if self.replay_latency == LATENCY_RECORDED:
+            return entry["latency_seconds"] * self.latency_scale
+        if self.replay_latency == LATENCY_SAMPLED:
+            latencies = self.store.latencies()
+            return self._rng.choice(latencies) * self.latency_scale if latencies else 0.0
+        return 0.0
+
+    def _record(self, fingerprint: str, model: str, text: str, usage: dict, latency: float, **extra):
+        entry = {"fingerprint": fingerprint, "model": model, "text": text, "usage": usage,
+                 "latency_seconds": round(latency, 4), "recorded_at": time.time(), **extra}
+        self.store.save(fingerprint, entry)
+        self.counters["recorded"] += 1
+
+    async def generate(self, fingerprint: str, model: str, make_call):
+        """
+        Awaits `make_call()` (live/record) or answers from the recording (replay).
+        """
+        if self.mode == REPLAY:
+            entry = self._replay_entry(fingerprint)
+            delay = self._delay(entry)
+            if delay:
+                await asyncio.sleep(delay)
+            return _replayed(entry["text"], entry["usage"])
+        started = time.perf_counter()
+        response = await make_call()
+        if self.mode == RECORD:
+            self._record(fingerprint, model, response.text, _usage(response), time.perf_counter() - started)
+        return response
+
+    def generate_sync(self, fingerprint: str, model: str, make_call):
+        if self.mode == REPLAY:
+            entry = self._replay_entry(fingerprint)
+            delay = self._delay(entry)
+            if delay:
+                time.sleep(delay)
+            return _replayed(entry["text"], entry["usage"])
+        started = time.perf_counter()
+        response = make_call()
+        if self.mode == RECORD:
+            self._record(fingerprint, model, response.text, _usage(response), time.perf_counter() - started)
+        return response
+
+    async def open_stream(self, fingerprint: str, model: str, make_call):
+        """
+        Returns an async iterator of response chunks; recorded chunks are
+        replayed with the recorded share of time-to-first-chunk.
+        """
+        if self.mode == REPLAY:
+            return self._replay_stream(self._replay_entry(fingerprint))
+        started = time.perf_counter()
+        stream = await make_call()
+        if self.mode == RECORD:
+            return self._recording_stream(fingerprint, model, stream, started)
+        return stream
+
+    async def _recording_stream(self, fingerprint: str, model: str, stream, started: float):
+        chunks, last, first_chunk = [], None, None
+        async for chunk in stream:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            chunks.append(chunk.text or "")
+            last = chunk
+            yield chunk
+        self._record(fingerprint, model, "".join(chunks), _usage(last), time.perf_counter() - started,
+                     chunks=chunks, first_chunk_seconds=round(first_chunk or 0.0, 4))
+
+    async def _replay_stream(self, entry: dict):
+        chunks = entry.get("chunks") or [entry["text"]]
+        delay = self._delay(entry)
+        recorded = entry["latency_seconds"] or 1.0
+        first_share = min(1.0, entry.get("first_chunk_seconds", recorded) / recorded)
+        for index, text in enumerate(chunks):
+            if delay:
+                if index == 0:
+                    await asyncio.sleep(delay * first_share)
+                else:
+                    await asyncio.sleep(delay * (1 - first_share) / max(1, len(chunks) - 1))
+            # Usage totals arrive on the final chunk, as from Gemini
+            yield _replayed(text, entry["usage"] if index == len(chunks) - 1 else None)
+
+    def snapshot(self) -> dict:
+        return {"mode": self.mode, "replay_latency": self.replay_latency, **self.counters}
+
+
+llm_transport = LLMTransport(
+    mode=settings.LLM_TRANSPORT,
+    store=RecordingStore(settings.LLM_RECORDINGS_DIR),
+    replay_latency=settings.LLM_REPLAY_LATENCY,
+    latency_scale=settings.LLM_REPLAY_LATENCY_SCALE,
+)
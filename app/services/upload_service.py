@@ -0,0 +1,162 @@
+import hashlib
+import io
+import mmap
+import os
+from typing import Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from config import settings
+
+# Room for multipart boundaries, part headers and small form fields on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+def request_body_limit(path: str) -> int:
+    """
+    Largest request body accepted on `path`: one upload, or BATCH_MAX_FILES
+    of them for the batch endpoint.
+    """
+    files = settings.BATCH_MAX_FILES if path.endswith("/analyze-batch") else 1
+    return settings.MAX_UPLOAD_BYTES * files + MULTIPART_OVERHEAD_BYTES
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Enforces request_body_limit on the raw request stream, before the
+    multipart parser spools anything: a declared Content-Length over the
+    limit is refused outright, and a chunked (or lying) body is cut off with
+    413 as soon as the bytes received pass it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = request_body_limit(scope["path"])
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            response = JSONResponse(status_code=413, content={"detail": f"Request body exceeds the {limit} byte limit"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing instead of turning them into 400s
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds the {limit} byte limit")
+            return message
+
+        await self.app(scope, counting_receive, send)
+
+class IngestedUpload:
+    """
+    An upload hashed and size-checked on the way in, held either in one
+    in-memory buffer or (past the spool threshold) as a read-only mmap of
+    the file the multipart parser already spooled it to.
+
+    `content` is a memoryview over that storage: downstream stages read it
+    without another full copy. Close the upload (or use it as a context
+    manager) once every stage is done with it.
+    """
+
+    def __init__(self, filename: str, content_type: str):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self.sha256 = None
+        self.content = memoryview(b"")
+        self._mmap = None
+
+    @property
+    def spooled(self) -> bool:
+        return self._mmap is not None
+
+    def close(self):
+        try:
+            self.content.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            # A parser still holds a view; the map is released with it
+            pass
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _map_spooled(spooled) -> Optional[mmap.mmap]:
+    """
+    Read-only map of the file behind a parser-spooled upload, or None when
+    there is no file to map (in-memory streams, empty uploads).
+    """
+    try:
+        spooled.flush()
+        fd = spooled.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    if os.fstat(fd).st_size == 0:
+        return None
+    return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+
+
+async def ingest_upload(file: UploadFile, max_bytes: int = None, spool_threshold: int = None) -> IngestedUpload:
+    """
+    Reads `file` once in UPLOAD_CHUNK_BYTES chunks, computing SHA-256 as it
+    goes. Raises UploadTooLargeError as soon as the upload passes `max_bytes`.
+
+    By now the multipart parser has already spooled the whole request body
+    (RequestSizeLimitMiddleware bounds how much that can be), so nothing is
+    written again: an upload over `spool_threshold` is mapped straight from
+    the parser's temp file, and only smaller ones are kept in memory. The
+    mapping outlives the request's form files, which are closed once the
+    endpoint returns, while SSE and batch responses still read it.
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    spool_threshold = spool_threshold or settings.UPLOAD_SPOOL_BYTES
+
+    # The multipart parser already knows the size; refuse without reading anything
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(f"File exceeds the {max_bytes} byte upload limit")
+
+    upload = IngestedUpload(file.filename, file.content_type)
+    hasher = hashlib.sha256()
+    buffer = bytearray()
+    try:
+        if file.size is None or file.size > spool_threshold:
+            upload._mmap = await run_in_threadpool(_map_spooled, file.file)
+        await file.seek(0)
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            upload.size += len(chunk)
+            if upload.size > max_bytes:
+                raise UploadTooLargeError(f"File exceeds the {max_bytes} byte upload limit")
+            hasher.update(chunk)
+            if upload._mmap is None:
+                buffer += chunk
+    except BaseException:
+        upload.close()
+        raise
+
+    upload.sha256 = hasher.hexdigest()
+    upload.content = memoryview(upload._mmap if upload._mmap is not None else buffer)
+    return upload
@@ -0,0 +1,100 @@
+"""
+Benchmark for the local arithmetic verifier.
+
+Builds an N-row bank statement PDF (optionally with tampered balances),
+extracts the ledger positionally and checks every running balance plus the
+Opening + Credits - Debits = Closing reconciliation.
+
+    python -m benchmarks.arithmetic_benchmark --rows 2000 --tamper 3
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+import fitz  # PyMuPDF
+
+from app.services.arithmetic_service import extract_ledger, verify_arithmetic, verify_ledger
+from app.services.file_service import DocumentContext
+from app.services.prompt_service import BANK_STATEMENT
+
+
+def statement_pdf(rows: int, tamper: int = 0, seed: int = 7) -> tuple:
+    """
+    Returns (pdf bytes, 1-based rows whose printed balance was altered).
+    """
+    rng = random.Random(seed)
+    tampered = set(rng.sample(range(1, rows + 1), tamper)) if tamper else set()
+    balance = opening = 15000.00
+    credits = debits = 0.0
+
+    doc = fitz.open()
+    page, y = None, 0
+    for number in range(1, rows + 1):
+        if page is None or y > 800:
+            page = doc.new_page()
+            if doc.page_count == 1:
+                page.insert_text((40, 40), "ABSA BANK ACCOUNT STATEMENT", fontsize=12)
+                page.insert_text((40, 58), f"Opening Balance R {opening:,.2f}", fontsize=9)
+            y = 80
+            for x, title in ((40, "Date"), (110, "Description"), (330, "Debit"), (410, "Credit"), (490, "Balance")):
+                page.insert_text((x, y), title, fontsize=9)
+            y += 14
+        amount = round(rng.uniform(10, 2500), 2)
+        if rng.random() < 0.4:
+            credits += amount
+            balance += amount
+            columns = ((410, amount),)
+        else:
+            debits += amount
+            balance -= amount
+            columns = ((330, amount),)
+        printed = balance + (250.0 if number in tampered else 0.0)
+        page.insert_text((40, y), f"2025-04-{number % 28 + 1:02d}", fontsize=8)
+        page.insert_text((110, y), f"PAYMENT REF {number:05d}", fontsize=8)
+        for x, value in columns + ((490, printed),):
+            page.insert_text((x, y), f"{value:,.2f}", fontsize=8)
+        y += 12
+    page.insert_text((40, y + 20), f"Closing Balance R {opening + credits - debits:,.2f}", fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data, sorted(tampered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--tamper", type=int, default=3)
+    args = parser.parse_args()
+
+    content, tampered = statement_pdf(args.rows, args.tamper)
+    with DocumentContext(content, "application/pdf") as ctx:
+        _ = ctx.text  # text extraction is shared with the rest of the pipeline
+
+        started = time.perf_counter()
+        rows = extract_ledger(ctx.pdf)
+        extract_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ledger = verify_ledger(rows)
+        verify_seconds = time.perf_counter() - started
+
+        report = verify_arithmetic(ctx, BANK_STATEMENT)
+
+    print(json.dumps({
+        "rows": args.rows,
+        "extracted_rows": len(rows),
+        "extract_ms": round(extract_seconds * 1000, 2),
+        "verify_ms": round(verify_seconds * 1000, 3),
+        "end_to_end_ms": round(report["seconds"] * 1000, 2),
+        "tampered_rows": tampered,
+        "flagged_rows": [failure["row"] for failure in ledger["failures"]],
+        "reconciliation": report["reconciliation"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Model cascade against the primary model alone, offline.
+
+Sends --documents distinct payslips through analyze_content twice: once with
+every document going to the primary model, once through the cascade, where
+the fast model answers first and only ambiguous answers (an --ambiguous-rate
+share of documents) are escalated. TieredGeminiClient gives each model its
+own latency. Reports mean/p50/p95 latency, calls per model, the tier that
+decided each result and relative spend (--fast-price per fast call, 1.0 per
+primary call).
+
+    python -m benchmarks.cascade_benchmark --documents 200 --ambiguous-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+# Every document must reach the (fake) LLM, and quota admission would only measure the configured limits
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("PHASH_ENABLED", "false")
+os.environ.setdefault("GEMINI_RPM", "0")
+os.environ.setdefault("GEMINI_TPM", "0")
+
+from app.services import llm_service, pipeline_service
+from app.services.cascade_service import ModelCascade
+from benchmarks.corpus import payslip_pdf
+from benchmarks.stub_llm import TieredGeminiClient
+from benchmarks.timing import percentile
+from config import settings
+
+
+async def run(documents: list, cascade: ModelCascade, client: TieredGeminiClient, concurrency: int) -> dict:
+    pipeline_service.model_cascade = cascade
+    llm_service.client = client
+    slots = asyncio.Semaphore(concurrency)
+    latencies, tiers = [], {}
+
+    async def one(content):
+        async with slots:
+            started = time.perf_counter()
+            analysis = await pipeline_service.analyze_content(content, "application/pdf")
+            latencies.append(time.perf_counter() - started)
+        tiers[analysis.decision_tier] = tiers.get(analysis.decision_tier, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(content) for content in documents))
+    wall = time.perf_counter() - started
+    return {
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "throughput_per_s": round(len(documents) / wall, 2),
+        "calls": dict(client.calls),
+        "decided_by": tiers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ambiguous-rate", type=float, default=0.2, help="share of documents the fast model is unsure of")
+    parser.add_argument("--fast-latency", type=float, default=0.15, help="fake fast-model latency (s)")
+    parser.add_argument("--primary-latency", type=float, default=0.6, help="fake primary-model latency (s)")
+    parser.add_argument("--fast-price", type=float, default=0.1, help="cost of a fast call relative to a primary one")
+    args = parser.parse_args()
+
+    fast_model, primary_model = settings.GEMINI_FAST_MODEL, settings.GEMINI_MODEL
+    latencies = {fast_model: args.fast_latency, primary_model: args.primary_latency}
+    documents = [payslip_pdf(employee_number) for employee_number in range(args.documents)]
+
+    report = {"documents": args.documents, "ambiguous_rate": args.ambiguous_rate, "models": latencies}
+    for name, enabled in (("primary_only", False), ("cascade", True)):
+        cascade = ModelCascade(enabled, fast_model, primary_model, settings.CASCADE_CONFIDENCE_LOW,
+                               settings.CASCADE_CONFIDENCE_HIGH, settings.CASCADE_ESCALATE_CLASSIFICATIONS)
+        client = TieredGeminiClient(latencies, primary_model, args.ambiguous_rate)
+        report[name] = asyncio.run(run(documents, cascade, client, args.concurrency))
+        calls = report[name]["calls"]
+        report[name]["relative_spend"] = round(
+            (calls.get(fast_model, 0) * args.fast_price + calls.get(primary_model, 0)) / args.documents, 3)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
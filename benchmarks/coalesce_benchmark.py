@@ -0,0 +1,116 @@
+"""
+Duplicate submissions with and without single-flight coalescing, offline.
+
+Every one of --documents distinct payslips is submitted --copies times, the
+copies a random 0..--spread seconds apart, through three paths:
+POST /api/analyze-document, one POST /api/analyze-batch holding all copies
+(each document's copies side by side), and the background job queue. The
+result cache is off, so the only deduplication is coalescing (and, for
+the batch, analysing repeated files once per request whatever SINGLE_FLIGHT
+says). Reports Gemini calls (upstream) against unique documents, plus wall
+time, per path with SINGLE_FLIGHT off and on.
+
+    python -m benchmarks.coalesce_benchmark --documents 12 --copies 3 --spread 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("PHASH_ENABLED", "false")
+os.environ.setdefault("GEMINI_RPM", "0")
+os.environ.setdefault("GEMINI_TPM", "0")
+
+import httpx
+
+from app.main import app
+from app.services import llm_service, pipeline_service
+from app.services.job_service import JobManager, JobStore
+from app.services.singleflight_service import SingleFlight
+from benchmarks.corpus import payslip_pdf
+from benchmarks.stub_llm import FaultyGeminiClient
+
+
+async def via_endpoint(documents: list, copies: int, spread: float, rng: random.Random):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=None) as client:
+        async def one(index, content):
+            await asyncio.sleep(rng.uniform(0, spread))
+            response = await client.post("/api/analyze-document",
+                                         files={"file": (f"doc{index}.pdf", content, "application/pdf")})
+            response.raise_for_status()
+
+        await asyncio.gather(*(one(index, content) for index, content in enumerate(documents)
+                               for _ in range(copies)))
+
+
+async def via_batch(documents: list, copies: int, spread: float, rng: random.Random):
+    files = [("files", (f"doc{index}.pdf", content, "application/pdf"))
+             for index, content in enumerate(documents) for _ in range(copies)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=None) as client:
+        response = await client.post("/api/analyze-batch", files=files)
+        response.raise_for_status()
+        if any(json.loads(line)["status"] != "ok" for line in response.text.splitlines()):
+            raise RuntimeError(f"batch had failures: {response.text[:200]}")
+
+
+async def via_jobs(documents: list, copies: int, spread: float, rng: random.Random):
+    directory = tempfile.mkdtemp(prefix="coalesce-jobs-")
+    manager = JobManager(JobStore(os.path.join(directory, "jobs.sqlite3"), os.path.join(directory, "uploads")),
+                         workers=len(documents) * copies)
+    await manager.start()
+    try:
+        async def one(index, content):
+            await asyncio.sleep(rng.uniform(0, spread))
+            await manager.submit(f"doc{index}.pdf", "application/pdf", content)
+
+        await asyncio.gather(*(one(index, content) for index, content in enumerate(documents)
+                               for _ in range(copies)))
+        total = len(documents) * copies
+        while manager.store.counts().get("done", 0) + manager.store.counts().get("failed", 0) < total:
+            await asyncio.sleep(0.02)
+    finally:
+        await manager.stop()
+
+
+async def run(path, documents: list, copies: int, spread: float, latency: float, coalesce: bool) -> dict:
+    pipeline_service.analysis_flights = (SingleFlight(copy=lambda result: result.model_copy(deep=True))
+                                         if coalesce else None)
+    upstream = FaultyGeminiClient(latency=latency, straggler_rate=0.0, error_rate=0.0)
+    llm_service.client = upstream
+    started = time.perf_counter()
+    await path(documents, copies, spread, random.Random(7))
+    return {"submissions": len(documents) * copies, "unique_documents": len(documents),
+            "upstream_calls": upstream.calls, "wall_s": round(time.perf_counter() - started, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=12)
+    parser.add_argument("--copies", type=int, default=3)
+    parser.add_argument("--spread", type=float, default=0.1, help="max seconds between copies of a document")
+    parser.add_argument("--latency", type=float, default=0.3, help="median fake Gemini latency (s)")
+    args = parser.parse_args()
+
+    documents = [payslip_pdf(employee_number) for employee_number in range(args.documents)]
+
+    # One event loop throughout: the pipeline's admission semaphore binds to the first it runs on
+    async def run_all():
+        report = {}
+        for name, path in (("analyze_document", via_endpoint), ("analyze_batch", via_batch), ("jobs", via_jobs)):
+            report[name] = {}
+            for mode, coalesce in (("single_flight_off", False), ("single_flight_on", True)):
+                report[name][mode] = await run(path, documents, args.copies, args.spread, args.latency, coalesce)
+        return report
+
+    print(json.dumps(asyncio.run(run_all()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Throughput benchmark for POST /api/analyze-document with a stubbed LLM.
+
+Fires N concurrent uploads at the ASGI app and compares the async pipeline
+against the old inline (event-loop blocking) chain.
+
+    python -m benchmarks.concurrency_benchmark --requests 8 --latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+# Every upload must reach the (stub) LLM for the numbers to mean anything
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("PHASH_ENABLED", "false")
+os.environ.setdefault("SINGLE_FLIGHT", "false")
+
+import fitz  # PyMuPDF
+import httpx
+
+from app.main import app
+from app.services import pipeline_service
+from app.services.file_service import extract_text_from_bytes, extract_metadata
+from app.services.prompt_service import build_forgery_prompt
+from app.services.response_service import parse_llm_response, enforce_phase_discipline
+from benchmarks.stub_llm import make_async_stub, make_blocking_stub
+
+
+def sample_pdf() -> bytes:
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "ABSA Bank Statement\nOpening balance R 1,000.00\nClosing balance R 900.00")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def legacy_analyze(blocking_llm):
+    async def analyze(content, content_type, *args, **kwargs):
+        metadata = extract_metadata(content, content_type)
+        document_text = extract_text_from_bytes(content, content_type)
+        prompt = build_forgery_prompt(document_text, metadata)
+        analysis_obj = parse_llm_response(blocking_llm(prompt, content, content_type))
+        analysis_obj = enforce_phase_discipline(analysis_obj, document_text)
+        return analysis_obj.verify_confidence(threshold=90)
+    return analyze
+
+
+async def fire(n: int, content: bytes) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            files = {"file": (f"doc_{i}.pdf", content, "application/pdf")}
+            response = await client.post("/api/analyze-document", files=files)
+            response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n)))
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=1.0, help="stubbed LLM latency in seconds")
+    args = parser.parse_args()
+
+    content = sample_pdf()
+    original = pipeline_service.analyze_content
+
+    async_stub = make_async_stub(args.latency)
+    pipeline_service.call_gemini_forensics_async = async_stub
+    async_seconds = asyncio.run(fire(args.requests, content))
+
+    from app.routes import analyze
+    blocking_stub = make_blocking_stub(args.latency)
+    analyze.analyze_content = legacy_analyze(blocking_stub)
+    try:
+        blocking_seconds = asyncio.run(fire(args.requests, content))
+    finally:
+        analyze.analyze_content = original
+
+    for stub in (async_stub, blocking_stub):
+        if stub.calls["count"] != args.requests:
+            raise SystemExit(f"expected {args.requests} LLM calls, got {stub.calls['count']}")
+
+    print(json.dumps({
+        "requests": args.requests,
+        "llm_latency_s": args.latency,
+        "max_concurrent_analyses": pipeline_service.settings.MAX_CONCURRENT_ANALYSES,
+        "llm_calls": {"async": async_stub.calls["count"], "blocking": blocking_stub.calls["count"]},
+        "blocking_wall_s": round(blocking_seconds, 3),
+        "async_wall_s": round(async_seconds, 3),
+        "speedup": round(blocking_seconds / async_seconds, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
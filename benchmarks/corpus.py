@@ -0,0 +1,105 @@
+"""
+Synthetic, deterministic document corpus for the benchmark suite.
+
+Covers every input shape the service sees: short text PDFs, multi-page bank
+statements of varying length, scanned (image-only) PDFs and JPEG/PNG ID
+cards, with and without planted anomalies (the April/Mei reference, the
+missing Rand symbol, tampered running balances).
+"""
+import random
+from io import BytesIO
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+
+from benchmarks.arithmetic_benchmark import statement_pdf
+from benchmarks.ocr_benchmark import scanned_pdf
+
+# Kinds whose text only comes out of Tesseract
+OCR_KINDS = ("scanned_pdf", "id_image")
+
+
+class Document:
+    def __init__(self, name: str, kind: str, content: bytes, content_type: str, anomalies=()):
+        self.name = name
+        self.kind = kind
+        self.content = content
+        self.content_type = content_type
+        self.anomalies = tuple(anomalies)
+
+    def describe(self) -> dict:
+        return {"name": self.name, "kind": self.kind, "content_type": self.content_type,
+                "bytes": len(self.content), "anomalies": list(self.anomalies)}
+
+
+def _text_pdf(lines: list) -> bytes:
+    with fitz.open() as doc:
+        page = doc.new_page()
+        for row, line in enumerate(lines):
+            page.insert_text((60, 80 + row * 18), line, fontsize=10)
+        return doc.tobytes()
+
+
+def payment_notice_pdf(anomaly: str = None) -> bytes:
+    """
+    One-page Absa payment notification. `anomaly` is None, "april_mei"
+    (a May reference on an April payment) or "missing_rand" (amount printed
+    as "3 400.00" and no Rand symbol anywhere).
+    """
+    if anomaly == "missing_rand":
+        # No capital R may appear anywhere for the currency rule to apply
+        return _text_pdf(["ABSA payment notification", "payment date: 02 April 2025",
+                          "amount paid: 3 400.00", "beneficiary: J v Vuuren", "status: successful"])
+    reference = "Johan v Rhyn 24 Mei" if anomaly == "april_mei" else "Johan v Rhyn 02 April"
+    return _text_pdf(["ABSA PAYMENT NOTIFICATION", "Payment date: 02 April 2025",
+                      "Amount: R 3,400.00", f"Reference: {reference}", "Status: Successful"])
+
+
+def payslip_pdf(employee_number: int = 417) -> bytes:
+    return _text_pdf(["PAYSLIP  April 2025", f"Employee: T. Nkosi   Employee No: {employee_number:05d}",
+                      "Basic Salary R 42,000.00", "Travel Allowance R 8,000.00",
+                      "Total Earnings R 50,000.00", "PAYE R 1,500.00", "UIF R 500.00",
+                      "Total Deductions R 2,000.00", "Net Pay R 48,000.00"])
+
+
+def id_card_image(image_format: str, seed: int = 3) -> bytes:
+    """
+    ID-card-sized image (85.6 x 54 mm at 300 DPI) with a portrait block and text.
+    """
+    rng = random.Random(seed)
+    image = Image.new("RGB", (1011, 638), (226, 236, 230))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((40, 120, 320, 560), fill=(150, 150, 160))
+    lines = ["REPUBLIC OF SOUTH AFRICA", "IDENTITY CARD", "Surname: NKOSI", "Names: THANDI",
+             f"Identity No: {rng.randrange(10 ** 12, 10 ** 13)}", "Date of Birth: 12 APR 1990"]
+    for row, line in enumerate(lines):
+        draw.text((360, 80 + row * 60), line, fill=(20, 20, 20))
+    buffer = BytesIO()
+    options = {"quality": 90} if image_format == "JPEG" else {}
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def build_corpus(statement_rows=(40, 400, 2000), scanned_pages=(1, 4), include_ocr: bool = True) -> list:
+    """
+    The benchmark corpus; identical bytes on every call.
+    """
+    corpus = [
+        Document("notice_clean", "text_pdf", payment_notice_pdf(), "application/pdf"),
+        Document("notice_april_mei", "text_pdf", payment_notice_pdf("april_mei"), "application/pdf", ("april_mei",)),
+        Document("notice_missing_rand", "text_pdf", payment_notice_pdf("missing_rand"), "application/pdf",
+                 ("missing_rand",)),
+        Document("payslip_clean", "text_pdf", payslip_pdf(), "application/pdf"),
+    ]
+    for rows in statement_rows:
+        content, _ = statement_pdf(rows)
+        corpus.append(Document(f"statement_{rows}", "statement", content, "application/pdf"))
+    tampered, _ = statement_pdf(statement_rows[-1], tamper=3)
+    corpus.append(Document(f"statement_{statement_rows[-1]}_tampered", "statement", tampered, "application/pdf",
+                           ("balance_tamper",)))
+    if include_ocr:
+        for pages in scanned_pages:
+            corpus.append(Document(f"scanned_{pages}p", "scanned_pdf", scanned_pdf(pages), "application/pdf"))
+        corpus.append(Document("id_card_jpeg", "id_image", id_card_image("JPEG"), "image/jpeg"))
+        corpus.append(Document("id_card_png", "id_image", id_card_image("PNG"), "image/png"))
+    return corpus
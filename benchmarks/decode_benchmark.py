@@ -0,0 +1,99 @@
+"""
+Measures decoding of Gemini's JSON answer.
+
+1. CPU per response: the regex + json.loads + ForgeryAnalysis(**data) path
+   against ForgeryAnalysis.model_validate_json, for the stub answer and for a
+   long one (many artifacts, long reasoning).
+2. Streaming: the stub answer streamed in --chunks pieces over --latency
+   seconds through StreamingAnalysisDecoder, reporting when each top-level
+   field became available against when the full answer did.
+
+    python -m benchmarks.decode_benchmark --iterations 2000 --latency 2.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+from app.services.response_service import ForgeryAnalysis, StreamingAnalysisDecoder, parse_llm_response
+from benchmarks.stub_llm import STUB_RESPONSE, make_stream_stub
+
+
+def long_response() -> str:
+    answer = json.loads(STUB_RESPONSE)
+    answer["visual_analysis"]["specific_artifacts"] = [
+        f"Font metrics differ from the surrounding text in line {line}" for line in range(200)
+    ]
+    answer["logical_analysis"]["math_errors"] = [
+        f"Row {row}: balance does not follow from the previous row" for row in range(200)
+    ]
+    answer["reasoning"] = "Layout, fonts and arithmetic were checked page by page. " * 400
+    return json.dumps(answer)
+
+
+def regex_decode(raw: str) -> ForgeryAnalysis:
+    # The decoder parse_llm_response used before model_validate_json
+    data = json.loads(re.search(r"\{.*\}", raw, re.DOTALL).group(0))
+    return ForgeryAnalysis(**data)
+
+
+def per_call_us(func, raw: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func(raw)
+    return round((time.perf_counter() - started) / iterations * 1e6, 2)
+
+
+def decode_cpu(iterations: int) -> dict:
+    report = {}
+    for name, raw in (("stub", STUB_RESPONSE), ("long", long_response())):
+        assert regex_decode(raw) == ForgeryAnalysis.model_validate_json(raw)
+        regex_us = per_call_us(regex_decode, raw, iterations)
+        validate_us = per_call_us(ForgeryAnalysis.model_validate_json, raw, iterations)
+        report[name] = {"bytes": len(raw), "regex_loads_us": regex_us, "model_validate_json_us": validate_us,
+                        "speedup": round(regex_us / validate_us, 2)}
+    return report
+
+
+async def decode_stream(latency: float, chunks: int) -> dict:
+    stream = make_stream_stub(latency=latency, chunks=chunks)
+    decoder = StreamingAnalysisDecoder()
+    fields, feed_seconds = {}, 0.0
+    started = time.perf_counter()
+    async for chunk in stream(None, None, None):
+        feed_started = time.perf_counter()
+        emitted = decoder.feed(chunk)
+        feed_seconds += time.perf_counter() - feed_started
+        for field, _ in emitted:
+            fields[field] = round((time.perf_counter() - started) * 1000, 1)
+    analysis = parse_llm_response(decoder.text)
+    complete_ms = round((time.perf_counter() - started) * 1000, 1)
+    return {
+        "latency_s": latency,
+        "chunks": chunks,
+        "field_available_ms": fields,
+        "first_field_ms": min(fields.values()) if fields else None,
+        "complete_ms": complete_ms,
+        "feed_cpu_ms_total": round(feed_seconds * 1000, 3),
+        "classification": analysis.final_classification,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=2.0, help="stub stream duration (s)")
+    parser.add_argument("--chunks", type=int, default=16)
+    args = parser.parse_args()
+
+    report = {"decode_cpu": decode_cpu(args.iterations),
+              "stream": asyncio.run(decode_stream(args.latency, args.chunks))}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
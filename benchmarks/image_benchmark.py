@@ -0,0 +1,118 @@
+"""
+Checks what forensic-mode image normalization does to clean and tampered
+uploads, offline.
+
+Clean inputs (a text document as PNG and JPEG, the corpus ID cards, a
+4000x3000 phone-style photo) must pass the tamper pre-check and go out
+normalized (small ones may still go out as-is when re-encoding would not
+shrink them); tampered JPEGs (a field re-typed or pasted in, then re-saved)
+must be sent as the original. Reports bytes sent and saved per input and
+exits non-zero if the pre-check fired on a clean input, a clean input over
+LLM_IMAGE_MAX_EDGE was not downscaled, or a tampered one was.
+
+    python -m benchmarks.image_benchmark
+"""
+import argparse
+import json
+import os
+import random
+from io import BytesIO
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+from PIL import Image, ImageDraw
+
+from app.services.file_service import DocumentContext
+from benchmarks.corpus import id_card_image
+from config import settings
+
+# The re-typed ID number sits here on id_card_image
+ID_NUMBER_BOX = (350, 310, 820, 360)
+
+
+def encoded(image: Image.Image, image_format: str, quality: int = 90) -> bytes:
+    buffer = BytesIO()
+    options = {"quality": quality} if image_format == "JPEG" else {}
+    image.convert("RGB").save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def text_document(seed: int = 1) -> Image.Image:
+    # A4 at 200 DPI: dark text on a flat, near-white page
+    rng = random.Random(seed)
+    image = Image.new("RGB", (1654, 2339), (250, 250, 248))
+    draw = ImageDraw.Draw(image)
+    for row in range(60):
+        draw.text((100, 100 + row * 34), "  ".join(f"R {rng.randrange(10 ** 6):,}.00" for _ in range(6)),
+                  fill=(10, 10, 10))
+    return image
+
+
+def phone_photo(seed: int = 2) -> Image.Image:
+    # 12 MP shot of a card on a textured surface, with sensor noise
+    rng = random.Random(seed)
+    image = Image.effect_noise((4000, 3000), 24).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((800, 600, 3200, 2400), fill=(235, 235, 228))
+    for row in range(30):
+        draw.text((900, 700 + row * 55), f"IDENTITY NUMBER {rng.randrange(10 ** 12, 10 ** 13)}", fill=(20, 20, 20))
+    return image
+
+
+def id_card_edited(base_quality: int, final_quality: int) -> bytes:
+    """
+    The corpus ID card, received as a JPEG at `base_quality`, with a new ID
+    number typed over the original and the result saved at `final_quality`.
+    """
+    original = Image.open(BytesIO(id_card_image("PNG"))).convert("RGB")
+    edited = original.copy()
+    draw = ImageDraw.Draw(edited)
+    draw.rectangle((360, 320, 800, 350), fill=(226, 236, 230))
+    draw.text((362, 322), "Identity No: 9999999999999", fill=(20, 20, 20))
+    received = Image.open(BytesIO(encoded(original, "JPEG", base_quality))).convert("RGB")
+    received.paste(edited.crop(ID_NUMBER_BOX), ID_NUMBER_BOX[:2])
+    return encoded(received, "JPEG", final_quality)
+
+
+def samples() -> list:
+    document, photo = text_document(), phone_photo()
+    card = Image.open(BytesIO(id_card_image("PNG")))
+    return [
+        ("document_png", encoded(document, "PNG"), "image/png", False),
+        ("document_jpeg", encoded(document, "JPEG", 85), "image/jpeg", False),
+        ("id_card_png", id_card_image("PNG"), "image/png", False),
+        ("id_card_jpeg", id_card_image("JPEG"), "image/jpeg", False),
+        ("id_card_resaved", encoded(Image.open(BytesIO(encoded(card, "JPEG", 70))), "JPEG", 95), "image/jpeg", False),
+        ("photo_jpeg", encoded(photo, "JPEG", 92), "image/jpeg", False),
+        ("id_card_edited_q75", id_card_edited(90, 75), "image/jpeg", True),
+        ("id_card_pasted_q95", id_card_edited(70, 95), "image/jpeg", True),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.parse_args()
+
+    report, wrong = {}, []
+    for name, content, content_type, tampered in samples():
+        with DocumentContext(content, content_type) as ctx:
+            _, _, result = ctx.llm_payload
+        report[name] = {key: result.get(key) for key in
+                        ("action", "reason", "tamper_flags", "original_bytes", "sent_bytes", "bytes_saved")}
+        report[name]["tampered"] = tampered
+        oversized = max(result["original_size"]) > settings.LLM_IMAGE_MAX_EDGE
+        if tampered:
+            misrouted = result["action"] != "original"
+        else:
+            misrouted = "tamper_flags" in result or (oversized and result["action"] != "normalized")
+        if misrouted:
+            wrong.append(name)
+
+    print(json.dumps({"mode": settings.LLM_IMAGE_MODE, "ela_ratio": settings.LLM_IMAGE_ELA_RATIO,
+                      "inputs": report, "misrouted": wrong}, indent=2))
+    if wrong:
+        raise SystemExit(f"misrouted: {', '.join(wrong)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Cold-start benchmark: what importing the app costs, module by module.
+
+Runs `python -X importtime -c "import app.main"` in fresh processes and
+reports the total, the most expensive top-level packages and app modules,
+and any lazily imported heavy library that was loaded at import time anyway
+(which is the regression to look for). Then measures what warm-up pays to
+load each heavy library.
+
+    python -m benchmarks.import_benchmark --repeat 5 --budget-ms 1000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+PRELOAD = ("import json; from app.services.lazy_imports import preload_heavy_modules; import app.main; "
+           "print(json.dumps(preload_heavy_modules()))")
+HEAVY_CHECK = ("import json, sys; import app.main; from app.services.lazy_imports import HEAVY_MODULES; "
+               "print(json.dumps([m._name for m in HEAVY_MODULES if m._name in sys.modules]))")
+
+
+def _python(code: str, *flags) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], capture_output=True, text=True, check=True)
+
+
+def _json_output(code: str):
+    # PyMuPDF prints a deprecation notice on stdout; the JSON is the last line
+    return json.loads(_python(code).stdout.strip().splitlines()[-1])
+
+
+def import_times(module: str) -> dict:
+    """
+    Cumulative microseconds per module from one -X importtime run.
+    """
+    stderr = _python(f"import {module}", "-X", "importtime").stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            depth = len(name) - len(name.lstrip())
+            times[name.strip()] = (int(cumulative), depth)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, help="exit non-zero if the median import exceeds this")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    total_ms = statistics.median(run[args.module][0] for run in runs) / 1000
+
+    def median_ms(name):
+        return round(statistics.median(run.get(name, (0, 0))[0] for run in runs) / 1000, 1)
+
+    last = runs[-1]
+    # -X importtime indents two spaces per nesting level; direct imports sit one level under the module
+    module_depth = last[args.module][1]
+    packages = {name for name, (_, depth) in last.items() if depth == module_depth + 2}
+    app_modules = {name for name in last if name.startswith("app.") and name != args.module}
+
+    report = {
+        "module": args.module,
+        "repeat": args.repeat,
+        "import_ms_median": round(total_ms, 1),
+        "top_packages_ms": dict(sorted(((name, median_ms(name)) for name in packages),
+                                       key=lambda item: item[1], reverse=True)[:args.top]),
+        "app_modules_ms": dict(sorted(((name, median_ms(name)) for name in app_modules),
+                                      key=lambda item: item[1], reverse=True)[:args.top]),
+        "heavy_modules_loaded_at_import": _json_output(HEAVY_CHECK),
+        "warmup_preload_seconds": _json_output(PRELOAD),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        sys.exit(f"import of {args.module} took {total_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Peak-RSS benchmark for upload ingestion.
+
+Each mode runs in a fresh subprocess on the same large scanned-style PDF:
+"legacy" does `await file.read()` and hashes/parses the resulting bytes,
+"ingest" goes through ingest_upload (chunked, hashed on the fly, and
+mapped with mmap from the file the parser spooled it to). Reported numbers are the growth of
+peak RSS over the process baseline.
+
+    python -m benchmarks.ingest_benchmark --size-mb 50
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+
+def build_pdf(path: str, size_mb: int):
+    import fitz  # PyMuPDF
+    doc = fitz.open()
+    # Incompressible noise pages, ~4 MB each
+    for _ in range(max(1, size_mb // 4)):
+        pixmap = fitz.Pixmap(fitz.csRGB, 1200, 1150, os.urandom(1200 * 1150 * 3), 0)
+        page = doc.new_page()
+        page.insert_image(page.rect, pixmap=pixmap)
+    doc.save(path, deflate=False)
+    doc.close()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+async def run_mode(mode: str, path: str) -> dict:
+    from fastapi import UploadFile
+    from app.services.file_service import DocumentContext
+    from app.services.upload_service import ingest_upload
+
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)  # what starlette hands us
+    with open(path, "rb") as src:
+        while chunk := src.read(1024 * 1024):
+            spooled.write(chunk)
+    size = spooled.tell()
+    spooled.seek(0)
+    file = UploadFile(spooled, size=size, filename="big.pdf", headers={"content-type": "application/pdf"})
+
+    baseline = current_rss_mb()
+    if mode == "legacy":
+        content = await file.read()
+        digest = hashlib.sha256(content).hexdigest()
+        with DocumentContext(content, "application/pdf") as ctx:
+            pages = ctx.page_count
+    else:
+        with await ingest_upload(file) as upload:
+            digest = upload.sha256
+            with DocumentContext(upload.content, "application/pdf") as ctx:
+                pages = ctx.page_count
+    return {
+        "mode": mode,
+        "upload_mb": round(size / (1024 * 1024), 1),
+        "pages": pages,
+        "sha256": digest[:12],
+        "peak_rss_growth_mb": round(peak_rss_mb() - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--child", choices=["legacy", "ingest"], help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_mode(args.child, args.pdf))))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.pdf")
+        build_pdf(path, args.size_mb)
+        runs = []
+        for mode in ("legacy", "ingest"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.ingest_benchmark", "--child", mode, "--pdf", path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+    print(json.dumps(runs, indent=2))
+
+
+if __name__ == "__main__":
+    main()
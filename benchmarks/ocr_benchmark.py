@@ -0,0 +1,76 @@
+"""
+Scaling benchmark for page-parallel OCR on a scanned (image-only) PDF.
+
+Builds an N-page scanned statement and extracts its text with 1..K OCR
+worker processes. Needs the tesseract binary on PATH.
+
+    python -m benchmarks.ocr_benchmark --pages 100 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import time
+from io import BytesIO
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+
+from app.services import file_service
+from app.services.file_service import DocumentContext
+from config import settings
+
+
+def scanned_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for number in range(pages):
+        image = Image.new("L", (1240, 1754), 255)  # A4 at 150 DPI
+        draw = ImageDraw.Draw(image)
+        for row in range(40):
+            draw.text((80, 80 + row * 40), f"2025-04-{row % 28 + 1:02d}  PAYMENT REF {number:03d}-{row:02d}  R 1,{row:03d}.00", fill=0)
+        buf = BytesIO()
+        image.save(buf, format="PNG")
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=buf.getvalue())
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    content = scanned_pdf(args.pages)
+    report = {"pages": args.pages, "cpu_count": os.cpu_count(), "runs": []}
+    baseline = None
+    for workers in sorted(set(args.workers)):
+        settings.OCR_WORKERS = workers
+        if file_service._ocr_pool is not None:
+            file_service._ocr_pool.shutdown()
+        file_service._ocr_pool = None
+        file_service._get_ocr_pool()  # start-up cost is not part of the measurement
+
+        started = time.perf_counter()
+        with DocumentContext(content, "application/pdf") as ctx:
+            pages = ctx.page_texts
+        seconds = time.perf_counter() - started
+        baseline = baseline or seconds
+
+        report["runs"].append({
+            "workers": workers,
+            "wall_s": round(seconds, 3),
+            "pages_per_s": round(args.pages / seconds, 2),
+            "speedup": round(baseline / seconds, 2),
+            "ocr_pages": sum(1 for page in pages if page["method"] == "ocr"),
+            "failed_pages": sum(1 for page in pages if "error" in page),
+            "mean_page_s": round(sum(page["seconds"] for page in pages) / len(pages), 4),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
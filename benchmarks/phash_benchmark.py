@@ -0,0 +1,156 @@
+"""
+Measures the perceptual-hash index, offline.
+
+1. Robustness: pHash/dHash distance between a document's first page and
+   variants of it (same document re-rendered, re-encoded as JPEG, rescaled,
+   cropped, one field edited) and unrelated documents, at RASTER_DPI_PREVIEW.
+2. Lookup at scale: --entries random page hashes, plus --planted hashes at
+   known distances from the probes, loaded into a PerceptualIndex in a
+   temporary directory. Reports nearest() latency at PHASH_MAX_DISTANCE
+   against an exact numpy scan over every hash, and how many planted
+   neighbours each found.
+
+    python -m benchmarks.phash_benchmark --entries 200000 --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+import numpy as np
+from PIL import Image
+
+from app.services.file_service import DocumentContext
+from app.services.phash_service import DocumentHashes, PerceptualIndex, dhash, hamming, phash
+from app.services.response_service import ForgeryAnalysis
+from benchmarks.corpus import id_card_image, payment_notice_pdf, payslip_pdf
+from benchmarks.stub_llm import STUB_RESPONSE
+from config import settings
+
+
+def first_page(content: bytes, content_type: str) -> Image.Image:
+    with DocumentContext(content, content_type) as ctx:
+        _, image = next(ctx.iter_page_rasters(dpi=settings.RASTER_DPI_PREVIEW, pages=range(1)))
+        return image.copy()
+
+
+def reencoded(image: Image.Image, quality: int) -> Image.Image:
+    buffer = BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=quality)
+    return Image.open(BytesIO(buffer.getvalue()))
+
+
+def cropped(image: Image.Image, fraction: float) -> Image.Image:
+    dx, dy = int(image.width * fraction), int(image.height * fraction)
+    return image.crop((dx, dy, image.width - dx, image.height - dy)).resize(image.size)
+
+
+def robustness() -> dict:
+    payslip = first_page(payslip_pdf(417), "application/pdf")
+    card = Image.open(BytesIO(id_card_image("PNG")))
+    variants = {
+        "payslip": (payslip, {
+            "re_rendered": first_page(payslip_pdf(417), "application/pdf"),
+            "jpeg_q50": reencoded(payslip, 50),
+            "rescaled_50pct": payslip.resize((payslip.width // 2, payslip.height // 2)),
+            "cropped_2pct": cropped(payslip, 0.02),
+            "employee_no_edited": first_page(payslip_pdf(418), "application/pdf"),
+            "unrelated_notice": first_page(payment_notice_pdf(), "application/pdf"),
+        }),
+        "id_card": (card, {
+            "jpeg_q90": Image.open(BytesIO(id_card_image("JPEG"))),
+            "jpeg_q30": reencoded(card, 30),
+            "rescaled_50pct": card.resize((card.width // 2, card.height // 2)),
+            "cropped_2pct": cropped(card, 0.02),
+            "id_number_edited": Image.open(BytesIO(id_card_image("PNG", seed=4))),
+            "unrelated_payslip": payslip,
+        }),
+    }
+    report = {}
+    for name, (original, others) in variants.items():
+        p_hash, d_hash = phash(original), dhash(original)
+        report[name] = {variant: {"phash": hamming(p_hash, phash(image)), "dhash": hamming(d_hash, dhash(image))}
+                        for variant, image in others.items()}
+    return report
+
+
+def flipped(value: int, bits: int, rng: random.Random) -> int:
+    for position in rng.sample(range(64), bits):
+        value ^= 1 << position
+    return value
+
+
+def lookup(entries: int, queries: int, planted: int, batch: int) -> dict:
+    rng = random.Random(11)
+    radius = settings.PHASH_MAX_DISTANCE
+    verdict = ForgeryAnalysis.model_validate_json(STUB_RESPONSE)
+
+    probes = [rng.getrandbits(64) for _ in range(queries)]
+    # Planted neighbours sit at distances spread over 0..radius + 2, so some must not be found
+    plants = [(query, distance, flipped(probes[query], distance, rng))
+              for query in range(queries) for distance in rng.sample(range(radius + 3), min(planted, radius + 3))]
+    hashes = [rng.getrandbits(64) for _ in range(entries)] + [value for _, _, value in plants]
+
+    directory = tempfile.mkdtemp(prefix="phash-bench-")
+    index = PerceptualIndex(os.path.join(directory, "phash.sqlite3"), max_distance=radius,
+                            neighbours=len(plants) + 10, reuse_distance=settings.PHASH_REUSE_DISTANCE)
+    started = time.perf_counter()
+    for offset in range(0, len(hashes), batch):
+        index.add_many([(f"doc{offset + position}", DocumentHashes([(0, value, value)], "x"), verdict)
+                        for position, value in enumerate(hashes[offset:offset + batch])])
+    load_s = time.perf_counter() - started
+
+    def indexed(query):
+        return {match["document"] for match in index.nearest(DocumentHashes([(0, probes[query], 0)], "y"))}
+
+    array = np.array(hashes, dtype=np.uint64)
+
+    def scanned(query):
+        distances = np.unpackbits((array ^ np.uint64(probes[query])).view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        return {f"doc{position}" for position in np.flatnonzero(distances <= radius)}
+
+    report = {"entries": len(hashes), "radius": radius, "load_s": round(load_s, 2)}
+    for name, search in (("index", indexed), ("linear_scan", scanned)):
+        timings, found = [], []
+        for query in range(queries):
+            started = time.perf_counter()
+            found.append(search(query))
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        report[name] = {"p50_ms": round(statistics.median(timings), 3),
+                        "p99_ms": round(timings[int(len(timings) * 0.99) - 1], 3)}
+        report[name]["found"] = found
+    planted_documents = {(query, distance): f"doc{entries + position}"
+                         for position, (query, distance, _) in enumerate(plants)}
+    within = [key for key in planted_documents if key[1] <= radius]
+    report["planted_within_radius"] = len(within)
+    for name in ("index", "linear_scan"):
+        found = report[name].pop("found")
+        report[name]["planted_found"] = sum(planted_documents[key] in found[key[0]] for key in within)
+        report[name]["planted_beyond_radius_found"] = sum(
+            planted_documents[key] in found[key[0]] for key in planted_documents if key[1] > radius)
+    report["speedup_p50"] = round(report["linear_scan"]["p50_ms"] / report["index"]["p50_ms"], 1)
+    report["index_stats"] = index.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=200000, help="random page hashes in the index")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--planted", type=int, default=4, help="near neighbours planted per query")
+    parser.add_argument("--batch", type=int, default=20000, help="documents per add_many transaction")
+    args = parser.parse_args()
+
+    report = {"robustness": robustness(), "lookup": lookup(args.entries, args.queries, args.planted, args.batch)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Per-request input tokens before and after splitting the static forensic rules
+out of the prompt, and with the rules routed by document type, measured
+against a local fake Gemini client.
+
+    python -m benchmarks.prompt_tokens_benchmark --requests 20
+"""
+import argparse
+import asyncio
+import json
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+from app.services import llm_service
+from app.services.prompt_service import (
+    build_forgery_prompt,
+    build_full_prompt,
+    get_system_instruction,
+    DOCUMENT_TYPES,
+    UNKNOWN
+)
+from benchmarks.stub_llm import FakeGeminiClient
+
+METADATA = {"producer": "Absa Statement Engine", "creator": "Absa", "creationDate": "D:20250402"}
+
+
+async def run(mode: str, requests: int, document_type: str = UNKNOWN) -> dict:
+    llm_service.client = FakeGeminiClient()
+    llm_service.token_usage.reset()
+    llm_service.prompt_cache.invalidate()
+    llm_service.settings.GEMINI_CONTEXT_CACHE = mode == "context_cache"
+
+    for _ in range(requests):
+        if mode == "inline_prompt":
+            # Pre-split behaviour: every rule re-rendered into the user prompt
+            await llm_service.call_gemini_forensics_async(
+                build_full_prompt("", METADATA), b"%PDF", "application/pdf", system_instruction=None
+            )
+        else:
+            await llm_service.call_gemini_forensics_async(
+                build_forgery_prompt("", METADATA, document_type), b"%PDF", "application/pdf",
+                system_instruction=get_system_instruction(document_type)
+            )
+
+    usage = llm_service.token_usage.snapshot()
+    return {
+        "avg_prompt_tokens": usage["avg_prompt_tokens"],
+        "avg_uncached_prompt_tokens": usage["avg_uncached_prompt_tokens"],
+        "cache_creations": llm_service.client.caches_created,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    report = {
+        mode: asyncio.run(run(mode, args.requests))
+        for mode in ("inline_prompt", "system_instruction", "context_cache")
+    }
+    report["routed_system_instruction"] = {
+        document_type: asyncio.run(run("system_instruction", args.requests, document_type))["avg_prompt_tokens"]
+        for document_type in DOCUMENT_TYPES
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Throughput benchmark for the RPM/TPM quota scheduler.
+
+Sends a burst of interactive and batch calls through call_gemini_forensics_async
+to QuotaLimitedGeminiClient, once with the scheduler disabled (429s answered
+by retry/backoff only) and once with it enabled, and reports 429s, wasted
+upstream requests, completed calls and per-priority latency.
+
+Quota windows are scaled down (--window seconds instead of a minute) so the
+run takes seconds; limits are still given per minute.
+
+    python -m benchmarks.quota_benchmark --calls 100 --rpm 600 --tpm 6000000 --window 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+from app.services import llm_service
+from app.services.quota_service import QuotaScheduler, INTERACTIVE, BATCH
+from app.services.resilience_service import CircuitBreaker, ResiliencePolicy
+from benchmarks.stub_llm import QuotaLimitedGeminiClient
+from benchmarks.timing import percentile
+
+
+async def run(scheduled: bool, args) -> dict:
+    fake = QuotaLimitedGeminiClient(rpm=args.rpm, tpm=args.tpm, window=args.window)
+    llm_service.client = fake
+    llm_service.gemini_resilience = ResiliencePolicy(
+        timeout=30, max_retries=args.retries, backoff_base=0.05, backoff_max=args.window,
+        hedge=False, hedge_percentile=95, hedge_min_samples=20,
+        breaker=CircuitBreaker(failure_threshold=10 ** 6, reset_seconds=1.0),
+    )
+    # The same limits over the same (compressed) window as the fake upstream
+    window_share = args.window / 60.0
+    llm_service.gemini_quota = QuotaScheduler(
+        rpm=int(args.rpm * window_share) if scheduled else 0,
+        tpm=int(args.tpm * window_share) if scheduled else 0,
+        burst_seconds=args.window / 6,
+        window=args.window,
+    )
+
+    latencies = {INTERACTIVE: [], BATCH: []}
+    failed = 0
+
+    async def one(index: int):
+        nonlocal failed
+        priority = INTERACTIVE if index % 4 == 0 else BATCH
+        started = time.perf_counter()
+        try:
+            await llm_service.call_gemini_forensics_async(
+                "prompt " * 200, b"%PDF-1.4", "application/pdf", priority=priority, pages=2
+            )
+        except Exception:
+            failed += 1
+            return
+        latencies[priority].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(args.calls)))
+    wall = time.perf_counter() - started
+    completed = args.calls - failed
+    # Every call can fail without the scheduler, leaving no latencies
+    p95 = {priority: percentile(samples, 95) for priority, samples in latencies.items()}
+    return {
+        "scheduler": scheduled,
+        "completed": completed,
+        "failed": failed,
+        "upstream_requests": fake.calls,
+        "rate_limited_429": fake.rejected,
+        "wall_s": round(wall, 2),
+        "completed_per_window": round(completed / wall * args.window, 1),
+        "interactive_p95_s": round(p95[INTERACTIVE], 3) if p95[INTERACTIVE] is not None else None,
+        "batch_p95_s": round(p95[BATCH], 3) if p95[BATCH] is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--tpm", type=int, default=6000000)
+    parser.add_argument("--window", type=float, default=2.0)
+    parser.add_argument("--retries", type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps([asyncio.run(run(False, args)), asyncio.run(run(True, args))], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Peak-RSS benchmark for page rasterization.
+
+"eager" renders every page at forensic DPI into a list (the old
+convert_pdf_to_images behaviour); "lazy" streams the same pages through
+DocumentContext.iter_page_rasters straight to JPEG. Each mode runs in a
+fresh subprocess; reported numbers are peak RSS growth over baseline.
+
+    python -m benchmarks.raster_benchmark --pages 10 20 40
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+
+def statement_pdf(pages: int) -> bytes:
+    import fitz  # PyMuPDF
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        for row in range(45):
+            page.insert_text((40, 40 + row * 16), f"2025-04-{row % 28 + 1:02d}  PAYMENT {number:03d}-{row:02d}  R 1,{row:03d}.00")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def run_mode(mode: str, pages: int) -> dict:
+    import fitz  # PyMuPDF
+    from PIL import Image
+    from app.services.file_service import DocumentContext
+    from config import settings
+
+    content = statement_pdf(pages)
+    baseline = current_rss_mb()
+    jpeg_bytes = 0
+    if mode == "eager":
+        with fitz.open(stream=content, filetype="pdf") as doc:
+            images = []
+            for page in doc:
+                pixmap = page.get_pixmap(dpi=settings.RASTER_DPI_FORENSIC)
+                images.append(Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples))
+    else:
+        with DocumentContext(content, "application/pdf") as ctx:
+            for _, jpeg in ctx.iter_page_rasters(as_jpeg=True):
+                jpeg_bytes += len(jpeg)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"mode": mode, "pages": pages, "peak_rss_growth_mb": round(peak - baseline, 1), "jpeg_bytes": jpeg_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 20, 40])
+    parser.add_argument("--child", choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.pages[0])))
+        return
+
+    runs = []
+    for pages in args.pages:
+        for mode in ("eager", "lazy"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.raster_benchmark", "--child", mode, "--pages", str(pages)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+    print(json.dumps(runs, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Offline load test of the FastAPI app through the record/replay LLM transport.
+
+Phase 1 (skipped with --skip-record) sends the synthetic corpus through
+POST /api/analyze-document in "record" mode, so every Gemini answer is saved
+under --recordings. Without --live the upstream is FaultyGeminiClient
+(log-normal latency, occasional stragglers); with --live it is Gemini itself
+and needs GEMINI_API_KEY.
+
+Phase 2 replays --requests uploads at --concurrency with no network at all,
+pacing answers from the recorded latency distribution (--latency sampled) or
+not at all (--latency none, which isolates post-LLM throughput). Reports
+throughput and p50/p95/p99 per phase, and the upstream calls made during
+replay (always 0).
+
+    python -m benchmarks.replay_benchmark --requests 400 --concurrency 32 --latency sampled
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+# Every upload must reach the transport for the numbers to mean anything
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("PHASH_ENABLED", "false")
+os.environ.setdefault("SINGLE_FLIGHT", "false")
+os.environ.setdefault("WARMUP_ENABLED", "false")
+# Replay makes no upstream calls, so quota admission would only measure the configured
+# RPM/TPM; export GEMINI_RPM/GEMINI_TPM to load-test with it
+os.environ.setdefault("GEMINI_RPM", "0")
+os.environ.setdefault("GEMINI_TPM", "0")
+
+import httpx
+
+from app.main import app
+from app.services import llm_service
+from app.services.transport_service import LLMTransport, RecordingStore, RECORD, REPLAY
+from benchmarks.corpus import build_corpus
+from benchmarks.stub_llm import FaultyGeminiClient
+from benchmarks.timing import percentile
+
+
+async def drive(corpus: list, requests: int, concurrency: int) -> dict:
+    slots = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            nonlocal failures
+            document = corpus[i % len(corpus)]
+            async with slots:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/analyze-document",
+                    files={"file": (f"{document.name}.bin", document.content, document.content_type)}
+                )
+                latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        wall = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "failures": failures,
+        "throughput_per_s": round(requests / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", choices=("none", "recorded", "sampled"), default="sampled")
+    parser.add_argument("--recordings", help="recordings directory (default: a temporary one)")
+    parser.add_argument("--skip-record", action="store_true", help="replay existing --recordings only")
+    parser.add_argument("--live", action="store_true", help="record against Gemini instead of the fake client")
+    parser.add_argument("--fake-latency", type=float, default=0.3, help="median fake Gemini latency (s)")
+    args = parser.parse_args()
+
+    recordings = args.recordings or tempfile.mkdtemp(prefix="llm-recordings-")
+    corpus = build_corpus(statement_rows=(40, 400), include_ocr=shutil.which("tesseract") is not None)
+    report = {"recordings": recordings, "corpus_documents": len(corpus)}
+
+    if not args.skip_record:
+        fake = None
+        if not args.live:
+            fake = FaultyGeminiClient(latency=args.fake_latency, error_rate=0.0)
+            llm_service.client = fake
+        llm_service.llm_transport = LLMTransport(RECORD, RecordingStore(recordings))
+        report["record"] = asyncio.run(drive(corpus, len(corpus), args.concurrency))
+        report["record"]["recorded"] = llm_service.llm_transport.counters["recorded"]
+
+    upstream = FaultyGeminiClient(latency=args.fake_latency, error_rate=0.0)
+    llm_service.client = upstream  # any call reaching it would be counted below
+    llm_service.llm_transport = LLMTransport(REPLAY, RecordingStore(recordings), replay_latency=args.latency, seed=1)
+    report["replay"] = asyncio.run(drive(corpus, args.requests, args.concurrency))
+    report["replay"].update({"latency": args.latency, "upstream_calls": upstream.calls,
+                             **llm_service.llm_transport.counters})
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Deterministic stand-in for Gemini so the pipeline can be measured offline.
+"""
+import asyncio
+import json
+import random
+import time
+import zlib
+from collections import deque
+from types import SimpleNamespace
+
+from app.services.lazy_imports import lazy_module
+
+# Loaded on first use, as in llm_service, so cold-start benchmarks still pay for google-genai
+types = lazy_module("google.genai.types")
+errors = lazy_module("google.genai.errors")
+
+STUB_RESPONSE = json.dumps({
+    "visual_analysis": {
+        "is_tampered": False,
+        "confidence_score": 10,
+        "specific_artifacts": [],
+        "quality_check": "High quality scan"
+    },
+    "logical_analysis": {
+        "has_contradictions": False,
+        "confidence_score": 10,
+        "math_errors": [],
+        "date_issues": []
+    },
+    "classification": "ORIGINAL",
+    "confidence": 95,
+    "summary": "Stub analysis",
+    "reasoning": "Deterministic benchmark response"
+})
+
+
+def make_async_stub(latency: float = 1.0, response: str = STUB_RESPONSE):
+    """
+    Async replacement for call_gemini_forensics_async that sleeps for `latency`.
+    """
+    calls = {"count": 0}
+
+    async def stub(prompt, file_content, mime_type, *args, **kwargs):
+        calls["count"] += 1
+        await asyncio.sleep(latency)
+        return response
+
+    stub.calls = calls
+    return stub
+
+
+def make_stream_stub(latency: float = 1.0, response: str = STUB_RESPONSE, chunks: int = 8):
+    """
+    Replacement for stream_gemini_forensics_async: `response` split into
+    `chunks` pieces spread evenly over `latency`.
+    """
+    calls = {"count": 0}
+    size = max(1, len(response) // chunks)
+
+    async def stub(prompt, file_content, mime_type, *args, **kwargs):
+        calls["count"] += 1
+        pieces = [response[i:i + size] for i in range(0, len(response), size)]
+        for piece in pieces:
+            await asyncio.sleep(latency / len(pieces))
+            yield piece
+
+    stub.calls = calls
+    return stub
+
+
+def make_blocking_stub(latency: float = 1.0, response: str = STUB_RESPONSE):
+    """
+    Sync replacement mirroring the old genai.Client call, which blocks its thread.
+    """
+    calls = {"count": 0}
+
+    def stub(prompt, file_content, mime_type, *args, **kwargs):
+        calls["count"] += 1
+        time.sleep(latency)
+        return response
+
+    stub.calls = calls
+    return stub
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough Gemini ratio for English prose: ~4 characters per token
+    return max(1, len(text) // 4)
+
+
+class FakeGeminiClient:
+    """
+    Local stand-in for genai.Client that reports usage_metadata the way Gemini
+    does: system instruction and prompt text count as input tokens, and tokens
+    served from a cached-content handle are reported as cached.
+    Documents are counted as a flat 258 tokens per part.
+
+    `connect_latency` models a keep-alive pool: a call that finds no idle
+    connection pays it (DNS + TCP + TLS) before the request itself.
+    """
+
+    def __init__(self, latency: float = 0.0, response: str = STUB_RESPONSE, connect_latency: float = 0.0):
+        self.latency = latency
+        self.response = response
+        self.connect_latency = connect_latency
+        self.connections_opened = 0
+        self._idle_connections = 0
+        self.caches_created = 0
+        self._caches = {}
+        self.models = SimpleNamespace(generate_content=self._generate_sync)
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(generate_content=self._generate, get=self._get_model,
+                                   generate_content_stream=self._generate_stream),
+            caches=SimpleNamespace(create=self._create_cache, update=self._update_cache),
+        )
+
+    def _usage(self, contents, config, text: str = None):
+        prompt_tokens = 0
+        for part in contents:
+            prompt_tokens += estimate_tokens(part) if isinstance(part, str) else 258
+        cached_tokens = 0
+        if config is not None and config.cached_content:
+            cached_tokens = self._caches[config.cached_content]
+        elif config is not None and config.system_instruction:
+            prompt_tokens += estimate_tokens(config.system_instruction)
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens + cached_tokens,
+            cached_content_token_count=cached_tokens,
+            candidates_token_count=estimate_tokens(text or self.response),
+        )
+
+    def _response(self, contents, config):
+        return SimpleNamespace(text=self.response, usage_metadata=self._usage(contents, config))
+
+    def _generate_sync(self, model, contents, config=None):
+        time.sleep(self.latency)
+        return self._response(contents, config)
+
+    async def _checkout(self):
+        if self._idle_connections:
+            self._idle_connections -= 1
+        else:
+            self.connections_opened += 1
+            await asyncio.sleep(self.connect_latency)
+
+    async def _generate(self, model, contents, config=None):
+        await self._checkout()
+        await asyncio.sleep(self.latency)
+        self._idle_connections += 1
+        return self._response(contents, config)
+
+    async def _generate_stream(self, model, contents, config=None, chunks: int = 8):
+        response = await self._generate(model, contents, config)
+        size = max(1, len(response.text) // chunks)
+        pieces = [response.text[i:i + size] for i in range(0, len(response.text), size)]
+
+        async def stream():
+            for index, piece in enumerate(pieces):
+                last = index == len(pieces) - 1
+                yield SimpleNamespace(text=piece, usage_metadata=response.usage_metadata if last else None)
+        return stream()
+
+    async def _get_model(self, model, config=None):
+        await self._checkout()
+        self._idle_connections += 1
+        return SimpleNamespace(name=f"models/{model}")
+
+    async def _create_cache(self, model, config):
+        self.caches_created += 1
+        name = f"cachedContents/fake-{self.caches_created}"
+        self._caches[name] = estimate_tokens(config.system_instruction)
+        return SimpleNamespace(name=name)
+
+    async def _update_cache(self, name, config):
+        if name not in self._caches:
+            raise KeyError(name)
+
+
+class FaultyGeminiClient(FakeGeminiClient):
+    """
+    FakeGeminiClient with injected trouble: log-normal latency around
+    `latency`, a `straggler_rate` share of calls `straggler_factor` times
+    slower, and an `error_rate` share failing with a Gemini 503.
+    """
+
+    def __init__(self, latency: float = 0.05, straggler_rate: float = 0.05, straggler_factor: float = 20.0,
+                 error_rate: float = 0.03, seed: int = 11, response: str = STUB_RESPONSE):
+        super().__init__(latency=latency, response=response)
+        self.straggler_rate = straggler_rate
+        self.straggler_factor = straggler_factor
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    async def _generate(self, model, contents, config=None):
+        self.calls += 1
+        delay = self.latency * self._rng.lognormvariate(0, 0.25)
+        if self._rng.random() < self.straggler_rate:
+            delay *= self.straggler_factor
+        failing = self._rng.random() < self.error_rate
+        await asyncio.sleep(delay / 4 if failing else delay)
+        if failing:
+            raise errors.ServerError(503, {"error": {"code": 503, "message": "overloaded", "status": "UNAVAILABLE"}})
+        return self._response(contents, config)
+
+
+class QuotaLimitedGeminiClient(FakeGeminiClient):
+    """
+    FakeGeminiClient that enforces RPM/TPM like the Gemini API: calls over
+    either limit within the rolling `window` seconds fail with a 429.
+    Limits are per minute and scaled to the window, so a short window keeps
+    benchmarks fast.
+    """
+
+    def __init__(self, rpm: int, tpm: int, window: float = 60.0, latency: float = 0.05,
+                 response: str = STUB_RESPONSE):
+        super().__init__(latency=latency, response=response)
+        self.max_requests = rpm * window / 60.0
+        self.max_tokens = tpm * window / 60.0
+        self.window = window
+        self.accepted = deque()  # (timestamp, tokens)
+        self.calls = 0
+        self.rejected = 0
+
+    async def _generate(self, model, contents, config=None):
+        self.calls += 1
+        usage = self._usage(contents, config)
+        tokens = usage.prompt_token_count + usage.candidates_token_count
+        now = time.monotonic()
+        while self.accepted and now - self.accepted[0][0] > self.window:
+            self.accepted.popleft()
+        if (len(self.accepted) + 1 > self.max_requests
+                or sum(t for _, t in self.accepted) + tokens > self.max_tokens):
+            self.rejected += 1
+            raise errors.ClientError(429, {"error": {"code": 429, "message": "quota", "status": "RESOURCE_EXHAUSTED"}})
+        self.accepted.append((now, tokens))
+        await asyncio.sleep(self.latency)
+        return self._response(contents, config)
+
+
+AMBIGUOUS_RESPONSE = json.dumps({
+    "visual_analysis": {
+        "is_tampered": False,
+        "confidence_score": 40,
+        "specific_artifacts": ["Slight font weight change in the amount field"],
+        "quality_check": "High quality scan"
+    },
+    "logical_analysis": {
+        "has_contradictions": False,
+        "confidence_score": 30,
+        "math_errors": [],
+        "date_issues": []
+    },
+    "classification": "SUSPICIOUS",
+    "confidence": 60,
+    "summary": "Stub analysis (ambiguous)",
+    "reasoning": "Deterministic benchmark response"
+})
+
+
+class TieredGeminiClient(FakeGeminiClient):
+    """
+    FakeGeminiClient with one latency per model, for cascade benchmarks.
+    Models other than `primary_model` answer AMBIGUOUS_RESPONSE for an
+    `ambiguous_rate` share of documents (picked by a hash of the document
+    bytes, so the same documents every run) and STUB_RESPONSE otherwise;
+    the primary model always answers STUB_RESPONSE.
+    """
+
+    def __init__(self, latencies: dict, primary_model: str, ambiguous_rate: float = 0.2):
+        super().__init__()
+        self.latencies = latencies
+        self.primary_model = primary_model
+        self.ambiguous_rate = ambiguous_rate
+        self.calls = {}
+
+    def _answer(self, model, contents) -> str:
+        if model == self.primary_model:
+            return STUB_RESPONSE
+        document = next((part.inline_data.data for part in contents if not isinstance(part, str)), b"")
+        ambiguous = zlib.crc32(document) % 1000 < self.ambiguous_rate * 1000
+        return AMBIGUOUS_RESPONSE if ambiguous else STUB_RESPONSE
+
+    async def _generate(self, model, contents, config=None):
+        self.calls[model] = self.calls.get(model, 0) + 1
+        await asyncio.sleep(self.latencies.get(model, self.latency))
+        text = self._answer(model, contents)
+        return SimpleNamespace(text=text, usage_metadata=self._usage(contents, config, text))
@@ -0,0 +1,189 @@
+"""
+Benchmark suite: every stage and the full pipeline over a synthetic corpus,
+offline, against the deterministic FakeGeminiClient.
+
+Stages: extract_metadata, extract_text_from_bytes, build_forgery_prompt,
+parse_llm_response and enforce_phase_discipline, each run `--repeat` times
+per document; then analyze_content end to end (rules, arithmetic, quota and
+resilience layers included, Gemini replaced by the fake client). Reports
+throughput, p50/p95/p99 and peak memory as JSON; timings and memory come
+from separate passes because tracemalloc slows the code it traces.
+
+Scanned PDFs and ID images need the tesseract binary; without it they are
+left out and listed under "skipped".
+
+    python -m benchmarks.suite_benchmark --repeat 5 --output suite.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+# Every document must reach the (fake) LLM for the pipeline numbers to mean anything
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("PHASH_ENABLED", "false")
+
+from app.services import llm_service, pipeline_service
+from app.services.file_service import extract_metadata, extract_text_from_bytes
+from app.services.metrics_service import stage_seconds
+from app.services.prompt_service import build_forgery_prompt
+from app.services.response_service import parse_llm_response, enforce_phase_discipline
+from benchmarks.corpus import OCR_KINDS, build_corpus
+from benchmarks.stub_llm import STUB_RESPONSE, FakeGeminiClient
+from benchmarks.timing import percentile
+
+# Gemini sometimes wraps its JSON in a Markdown fence; the parser must cope with both
+FENCED_RESPONSE = f"```json\n{STUB_RESPONSE}\n```"
+
+
+def summarize(latencies: list, wall_seconds: float) -> dict:
+    return {
+        "calls": len(latencies),
+        "throughput_per_s": round(len(latencies) / wall_seconds, 2) if wall_seconds else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def traced_peak_mb(func) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        return round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+    finally:
+        tracemalloc.stop()
+
+
+def stage_inputs(corpus: list) -> dict:
+    """
+    Each stage's input per document, computed once so a stage is timed alone.
+    """
+    inputs = {}
+    for document in corpus:
+        text = extract_text_from_bytes(document.content, document.content_type)
+        metadata = extract_metadata(document.content, document.content_type)
+        inputs[document.name] = {"text": text, "metadata": metadata}
+    return inputs
+
+
+def stage_calls(corpus: list, inputs: dict) -> dict:
+    """
+    {stage: [(document, zero-argument call)]}
+    """
+    calls = {name: [] for name in ("extract_metadata", "extract_text_from_bytes", "build_forgery_prompt",
+                                   "parse_llm_response", "enforce_phase_discipline")}
+    for document in corpus:
+        text, metadata = inputs[document.name]["text"], inputs[document.name]["metadata"]
+        calls["extract_metadata"].append(
+            (document, lambda d=document: extract_metadata(d.content, d.content_type)))
+        calls["extract_text_from_bytes"].append(
+            (document, lambda d=document: extract_text_from_bytes(d.content, d.content_type)))
+        calls["build_forgery_prompt"].append(
+            (document, lambda t=text, m=metadata: build_forgery_prompt(t, m)))
+        calls["parse_llm_response"].append((document, lambda: parse_llm_response(STUB_RESPONSE)))
+        calls["parse_llm_response"].append((document, lambda: parse_llm_response(FENCED_RESPONSE)))
+        calls["enforce_phase_discipline"].append(
+            (document, lambda t=text: enforce_phase_discipline(parse_llm_response(STUB_RESPONSE), t)))
+    return calls
+
+
+def run_stage(calls: list, repeat: int) -> dict:
+    latencies, by_kind = [], {}
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for document, call in calls:
+            call_started = time.perf_counter()
+            call()
+            elapsed = time.perf_counter() - call_started
+            latencies.append(elapsed)
+            by_kind.setdefault(document.kind, []).append(elapsed)
+    report = summarize(latencies, time.perf_counter() - started)
+    report["p50_ms_by_kind"] = {kind: round(percentile(samples, 50) * 1000, 3) for kind, samples in by_kind.items()}
+    report["peak_traced_mb"] = traced_peak_mb(lambda: [call() for _, call in calls])
+    return report
+
+
+async def run_pipeline(corpus: list, repeat: int, concurrency: int) -> dict:
+    slots = asyncio.Semaphore(concurrency)
+    latencies, by_kind, verdicts = [], {}, {}
+
+    async def one(document):
+        async with slots:
+            started = time.perf_counter()
+            analysis = await pipeline_service.analyze_content(document.content, document.content_type)
+            elapsed = time.perf_counter() - started
+        latencies.append(elapsed)
+        by_kind.setdefault(document.kind, []).append(elapsed)
+        verdicts[document.name] = analysis.final_classification
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await asyncio.gather(*(one(document) for document in corpus))
+    report = summarize(latencies, time.perf_counter() - started)
+    report["p50_ms_by_kind"] = {kind: round(percentile(samples, 50) * 1000, 3) for kind, samples in by_kind.items()}
+    report["verdicts"] = verdicts
+    return report
+
+
+def pipeline_breakdown() -> dict:
+    """
+    Mean milliseconds per pipeline stage, from the forensics_stage_seconds histogram.
+    """
+    counts, sums = {}, {}
+    for name, labels, value, *_ in stage_seconds.samples():
+        if name.endswith("_count"):
+            counts[labels[0]] = value
+        elif name.endswith("_sum"):
+            sums[labels[0]] = value
+    return {stage: round(sums[stage] / counts[stage] * 1000, 3) for stage in sorted(counts) if counts[stage]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1, help="documents in flight in the pipeline run")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="fake Gemini latency (s)")
+    parser.add_argument("--statement-rows", type=int, nargs="+", default=[40, 400, 2000])
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    has_tesseract = shutil.which("tesseract") is not None
+    corpus = build_corpus(statement_rows=tuple(args.statement_rows), include_ocr=has_tesseract)
+    inputs = stage_inputs(corpus)
+
+    stages = {name: run_stage(calls, args.repeat) for name, calls in stage_calls(corpus, inputs).items()}
+
+    llm_service.client = FakeGeminiClient(latency=args.llm_latency)
+    pipeline = asyncio.run(run_pipeline(corpus, args.repeat, args.concurrency))
+    pipeline["stage_mean_ms"] = pipeline_breakdown()
+    pipeline["peak_traced_mb"] = traced_peak_mb(lambda: asyncio.run(run_pipeline(corpus, 1, args.concurrency)))
+
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count()},
+        "settings": vars(args),
+        "corpus": [document.describe() for document in corpus],
+        "skipped": [] if has_tesseract else [{"kinds": list(OCR_KINDS), "reason": "tesseract not on PATH"}],
+        "stages": stages,
+        "pipeline": pipeline,
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                            / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Helpers shared by the benchmarks.
+"""
+
+
+def percentile(samples: list, q: float):
+    """
+    Nearest-rank q-th percentile of `samples`, or None when there are none.
+    """
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
@@ -0,0 +1,85 @@
+"""
+Cold-start benchmark for the startup warm-up.
+
+Each mode runs in a fresh process (first-use costs are per process): the
+pipeline analyses a small statement `--requests` times against
+FakeGeminiClient, whose pooled connections cost `--connect-latency` to open.
+With warm-up, warm_up_pipeline() runs first, as the app lifespan does before
+/ready turns 200. Reports first-request latency against the steady state.
+
+    python -m benchmarks.warmup_benchmark --requests 20 --connect-latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("PHASH_ENABLED", "false")
+
+
+async def run(warm: bool, requests: int, latency: float, connect_latency: float) -> dict:
+    from app.services import llm_service, pipeline_service
+    from benchmarks.arithmetic_benchmark import statement_pdf
+    from benchmarks.stub_llm import FakeGeminiClient
+
+    fake = FakeGeminiClient(latency=latency, connect_latency=connect_latency)
+    llm_service.client = fake
+    content, _ = statement_pdf(40)
+
+    report = {"warm_up": warm}
+    if warm:
+        started = time.perf_counter()
+        report["warmup_report"] = await pipeline_service.warm_up_pipeline()
+        report["warmup_s"] = round(time.perf_counter() - started, 3)
+
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await pipeline_service.analyze_content(content, "application/pdf")
+        latencies.append(time.perf_counter() - started)
+    await pipeline_service.stop_pipeline()
+
+    steady = statistics.median(latencies[1:])
+    report.update({
+        "first_request_ms": round(latencies[0] * 1000, 1),
+        "steady_median_ms": round(steady * 1000, 1),
+        "first_over_steady": round(latencies[0] / steady, 2),
+        "connections_opened_by_requests": fake.connections_opened - (
+            report.get("warmup_report", {}).get("gemini", {}).get("connections", 0)),
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Gemini generation latency (s)")
+    parser.add_argument("--connect-latency", type=float, default=0.3, help="fake DNS+TCP+TLS cost (s)")
+    parser.add_argument("--mode", choices=("cold", "warm"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        report = asyncio.run(run(args.mode == "warm", args.requests, args.latency, args.connect_latency))
+        print(json.dumps(report))
+        return
+
+    runs = []
+    for mode in ("cold", "warm"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.warmup_benchmark", "--mode", mode,
+             "--requests", str(args.requests), "--latency", str(args.latency),
+             "--connect-latency", str(args.connect_latency)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(runs, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+
 import os
 from dotenv import load_dotenv
 
@@ -12,4 +13,132 @@ class Settings:
     #REASONING_EFFORT = "high"
     BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
 
+    # Gemini context caching for the static forensic rules (system instruction)
+    GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+    GEMINI_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "3600"))
+    GEMINI_CACHE_REFRESH_MARGIN_SECONDS = int(os.getenv("GEMINI_CACHE_REFRESH_MARGIN_SECONDS", "300"))
+
+    # Gemini call resilience: per-attempt deadline, retries with jittered exponential
+    # backoff, optional hedged request after the recent p-th percentile latency,
+    # and a circuit breaker that fails fast after consecutive upstream failures
+    GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))
+    GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+    GEMINI_BACKOFF_BASE_SECONDS = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", "1.0"))
+    GEMINI_BACKOFF_MAX_SECONDS = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "20"))
+    GEMINI_HEDGE = os.getenv("GEMINI_HEDGE", "false").lower() == "true"
+    GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+    GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+    GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+    GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+
+    # Gemini quota: requests and tokens per minute admitted by the local scheduler
+    # (0 disables a limit), bucket burst in seconds of quota, expected answer size
+    # for cost estimates, and an optional SQLite file shared by all worker processes
+    GEMINI_RPM = int(os.getenv("GEMINI_RPM", "1000"))
+    GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+    QUOTA_BURST_SECONDS = float(os.getenv("QUOTA_BURST_SECONDS", "10"))
+    GEMINI_EXPECTED_OUTPUT_TOKENS = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "1024"))
+    QUOTA_DB_PATH = os.getenv("QUOTA_DB_PATH", "")
+
+    # Model cascade: when on, GEMINI_FAST_MODEL answers first and only ambiguous answers
+    # (confidence in [LOW, HIGH) or one of the listed classifications) go on to GEMINI_MODEL
+    GEMINI_CASCADE = os.getenv("GEMINI_CASCADE", "false").lower() == "true"
+    GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash-lite")
+    CASCADE_CONFIDENCE_LOW = int(os.getenv("CASCADE_CONFIDENCE_LOW", "0"))
+    CASCADE_CONFIDENCE_HIGH = int(os.getenv("CASCADE_CONFIDENCE_HIGH", "90"))
+    CASCADE_ESCALATE_CLASSIFICATIONS = [
+        c.strip() for c in os.getenv("CASCADE_ESCALATE_CLASSIFICATIONS", "SUSPICIOUS,FORGED").split(",") if c.strip()
+    ]
+
+    # Concurrency: analyses admitted at once per process, and threads for OCR/parsing
+    MAX_CONCURRENT_ANALYSES = int(os.getenv("MAX_CONCURRENT_ANALYSES", "8"))
+    CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+    # Gemini HTTP connection pool (keep-alive, shared by every call; hedged
+    # requests can double the connections in use) and startup warm-up
+    GEMINI_HTTP_MAX_CONNECTIONS = int(os.getenv("GEMINI_HTTP_MAX_CONNECTIONS", str(max(16, 2 * MAX_CONCURRENT_ANALYSES))))
+    GEMINI_HTTP_KEEPALIVE_SECONDS = float(os.getenv("GEMINI_HTTP_KEEPALIVE_SECONDS", "120"))
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_MAX_ATTEMPTS = int(os.getenv("WARMUP_MAX_ATTEMPTS", "6"))
+    GEMINI_WARMUP_CONNECTIONS = int(os.getenv("GEMINI_WARMUP_CONNECTIONS", "2"))
+
+    # OCR: processes for scanned pages, raster DPI, and the text-layer size below
+    # which a PDF page is treated as scanned
+    OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+    OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+    OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", "16"))
+
+    # Upload ingestion: hard size limit, size past which an upload is mapped (mmap)
+    # from the multipart parser's temp file instead of copied into memory (keep it at or
+    # above the parser's 1 MiB in-memory limit, or mapping writes the file out), and read chunk size
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+    UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))
+    UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+    # Page rasters: DPI for cheap uses (classification, hashing) vs forensic detail,
+    # and how many rendered pages each document keeps in its LRU
+    RASTER_DPI_PREVIEW = int(os.getenv("RASTER_DPI_PREVIEW", "72"))
+    RASTER_DPI_FORENSIC = int(os.getenv("RASTER_DPI_FORENSIC", "300"))
+    RASTER_CACHE_PAGES = int(os.getenv("RASTER_CACHE_PAGES", "4"))
+
+    # Image normalization before Gemini: "optimize" always downscales/re-encodes,
+    # "forensic" keeps original pixels when the local tamper pre-check fires, "off" sends as-is.
+    # The ELA ratio is a JPEG's worst 16x16 cell over its typical textured cell
+    LLM_IMAGE_MODE = os.getenv("LLM_IMAGE_MODE", "forensic").lower()
+    LLM_IMAGE_MAX_EDGE = int(os.getenv("LLM_IMAGE_MAX_EDGE", "1536"))
+    LLM_IMAGE_QUALITY = int(os.getenv("LLM_IMAGE_QUALITY", "85"))
+    LLM_IMAGE_ELA_RATIO = float(os.getenv("LLM_IMAGE_ELA_RATIO", "6.0"))
+
+    # Deterministic rule engine run before Gemini: findings at or above the
+    # conclusive confidence force FORGED, and with short-circuit on skip the LLM call
+    RULE_CONCLUSIVE_CONFIDENCE = int(os.getenv("RULE_CONCLUSIVE_CONFIDENCE", "95"))
+    RULE_SHORT_CIRCUIT = os.getenv("RULE_SHORT_CIRCUIT", "true").lower() == "true"
+
+    # Batch endpoint: documents analysed in parallel per batch, and files accepted per batch
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+
+    # Local state (result cache, job queue, ...) lives under this directory
+    DATA_DIR = os.getenv("DATA_DIR", ".forensics_data")
+
+    # Result cache: in-memory LRU in front of a SQLite store
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(DATA_DIR, "result_cache.sqlite3"))
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    CACHE_MEMORY_ENTRIES = int(os.getenv("CACHE_MEMORY_ENTRIES", "256"))
+    CACHE_DISK_MAX_BYTES = int(os.getenv("CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    # Perceptual-hash index of rendered pages: prior documents within PHASH_MAX_DISTANCE
+    # bits (of 64) are reported with their verdicts, and a re-encoded copy (every page
+    # within PHASH_REUSE_DISTANCE, same text) reuses its verdict without Gemini
+    PHASH_ENABLED = os.getenv("PHASH_ENABLED", "true").lower() == "true"
+    PHASH_DB_PATH = os.getenv("PHASH_DB_PATH", os.path.join(DATA_DIR, "phash_index.sqlite3"))
+    PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+    PHASH_REUSE_DISTANCE = int(os.getenv("PHASH_REUSE_DISTANCE", "4"))
+    PHASH_NEIGHBOURS = int(os.getenv("PHASH_NEIGHBOURS", "5"))
+    PHASH_MAX_PAGES = int(os.getenv("PHASH_MAX_PAGES", "4"))
+    # Index entries expire with the cached results they point at, and the oldest go past the cap
+    PHASH_TTL_SECONDS = int(os.getenv("PHASH_TTL_SECONDS", str(CACHE_TTL_SECONDS)))
+    PHASH_MAX_DOCUMENTS = int(os.getenv("PHASH_MAX_DOCUMENTS", "500000"))
+
+    # Coalesce concurrent analyses of identical uploads into one run
+    SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+
+    # Background job queue for long-running analyses
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    # A RUNNING job whose worker process has not renewed its lease for this long is re-queued
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    # Finished jobs (and their results) are deleted this long after they finish
+    JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+    JOBS_UPLOAD_DIR = os.getenv("JOBS_UPLOAD_DIR", os.path.join(DATA_DIR, "job_uploads"))
+
+    # What answers Gemini requests: "live" (Gemini), "record" (Gemini, saving each
+    # response under LLM_RECORDINGS_DIR) or "replay" (the saved responses, offline).
+    # Replay pacing: none, recorded (each response's own latency) or sampled
+    LLM_TRANSPORT = os.getenv("LLM_TRANSPORT", "live").lower()
+    LLM_RECORDINGS_DIR = os.getenv("LLM_RECORDINGS_DIR", os.path.join(DATA_DIR, "llm_recordings"))
+    LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "none").lower()
+    LLM_REPLAY_LATENCY_SCALE = float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1.0"))
+
 settings = Settings()